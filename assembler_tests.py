@@ -0,0 +1,126 @@
+import pytest
+import io
+
+from mypl_error import *
+from mypl_iowrapper import *
+from mypl_lexer import *
+from mypl_ast_parser import *
+from mypl_semantic_checker import *
+from mypl_code_gen import *
+from mypl_vm import *
+from mypl_assembler import *
+
+
+def build(program):
+    vm = VM()
+    cg = CodeGenerator(vm)
+    ast = ASTParser(Lexer(FileWrapper(io.StringIO(program)))).parse()
+    ast.accept(SemanticChecker())
+    ast.accept(cg)
+    return vm
+
+
+def assemble(source):
+    return Assembler(VM()).assemble(source)
+
+
+def test_round_trip(capsys):
+    program = (
+        'void f(int x, string s) { \n'
+        '   print(s + itos(x)); \n'
+        '} \n'
+        'void main() { \n'
+        '   int i = 0; \n'
+        '   while (i < 3) { \n'
+        '      f(i, "a)  // \\n"); \n'
+        '      i = i + 1; \n'
+        '   } \n'
+        '} \n'
+    )
+    vm = assemble(str(build(program)))
+    assert vm.frame_templates['f_int_string'].arg_count == 2
+    vm.run()
+    captured = capsys.readouterr()
+    assert captured.out == 'a)  // \n0a)  // \n1a)  // \n2'
+
+def test_hand_written(capsys):
+    source = (
+        '// prints 42 \n'
+        'Frame main \n'
+        '   PUSH(40) \n'
+        '   PUSH(2)  // two \n'
+        '   ADD() \n'
+        '   WRITE() \n'
+        '   PUSH() \n'
+        '   RET() \n'
+    )
+    vm = assemble(source)
+    assert vm.frame_templates['main'].instructions[1].comment == 'two'
+    vm.run()
+    captured = capsys.readouterr()
+    assert captured.out == '42'
+
+def test_operand_literals():
+    source = (
+        'Frame main (args: 0) \n'
+        '  0: OpCode.PUSH(1.5) \n'
+        '  1: OpCode.PUSH(True) \n'
+        '  2: OpCode.PUSH() \n'
+        '  3: OpCode.PUSH("5") \n'
+        '  4: OpCode.GETF(x) \n'
+    )
+    instrs = assemble(source).frame_templates['main'].instructions
+    assert [i.operand for i in instrs] == [1.5, True, None, '5', 'x']
+
+def test_bad_index():
+    source = (
+        'Frame main \n'
+        '  0: OpCode.PUSH(1) \n'
+        '  2: OpCode.POP() \n'
+    )
+    with pytest.raises(MyPLError) as e:
+        assemble(source)
+    assert str(e.value).startswith('Assembler Error')
+
+def test_unknown_opcode():
+    with pytest.raises(MyPLError) as e:
+        assemble('Frame main \n  FOO() \n')
+    assert str(e.value).startswith('Assembler Error')
+
+def test_instruction_outside_frame():
+    with pytest.raises(MyPLError) as e:
+        assemble('PUSH(1) \n')
+    assert str(e.value).startswith('Assembler Error')
+
+def test_unresolved_call_target(capsys):
+    source = (
+        'Frame main \n'
+        '   PUSH("started") \n'
+        '   WRITE() \n'
+        '   CALL(missing_int) \n'
+        '   PUSH() \n'
+        '   RET() \n'
+    )
+    with pytest.raises(MyPLError) as e:
+        assemble(source).run()
+    assert 'missing_int' in str(e.value)
+    captured = capsys.readouterr()
+    assert captured.out == ''
+
+def test_linked_call_targets():
+    program = (
+        'int f(int x) { \n'
+        '   if (x < 1) { return 0; } \n'
+        '   return f(x - 1); \n'
+        '} \n'
+        'void main() { \n'
+        '   print(itos(f(3))); \n'
+        '} \n'
+    )
+    vm = build(program)
+    vm.link()
+    template = vm.frame_templates['f_int']
+    calls = [i for i in template.instructions
+             if i.opcode in [OpCode.CALL, OpCode.TAILCALL]]
+    assert calls[0].operand is template
+    assert 'CALL(f_int)' in str(vm)
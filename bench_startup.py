@@ -0,0 +1,98 @@
+"""Cold-start benchmark for the MyPL driver.
+
+Spawns fresh interpreters running mypl.py in --lex, --parse, and
+normal (execution) mode and reports the median wall-clock latency of
+each, along with a python -X importtime breakdown of the slowest
+imports. Usage:
+
+    python bench_startup.py [-n RUNS] [--top N] [filename]
+
+NAME: Jake VanZyverden
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+DEFAULT_PROGRAM = (
+    'void main() {\n'
+    '  int x = 1;\n'
+    '  print(itos(x + 1));\n'
+    '}\n'
+)
+
+MODES = [('--lex', ['--lex']), ('--parse', ['--parse']), ('run', [])]
+
+DRIVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mypl.py')
+
+
+def run_once(args, filename, import_time=False):
+    """Runs mypl.py once, returning (seconds, stderr text)."""
+    cmd = [sys.executable]
+    if import_time:
+        cmd += ['-X', 'importtime']
+    cmd += [DRIVER] + args + [filename]
+    start = time.perf_counter()
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                            text=True)
+    return time.perf_counter() - start, result.stderr
+
+
+def import_times(stderr):
+    """Parses -X importtime output into (module, self us, cumulative us)
+    triples.
+
+    """
+    times = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times.append((name.strip(), int(self_us), int(cumulative_us)))
+    return times
+
+
+def report(filename, runs, top):
+    """Benchmarks each mode and prints the report."""
+    print(f'{"mode":<10}{"median ms":>12}{"min ms":>10}{"mypl imports ms":>18}')
+    breakdowns = []
+    for label, args in MODES:
+        samples = [run_once(args, filename)[0] for _ in range(runs)]
+        _, stderr = run_once(args, filename, import_time=True)
+        times = import_times(stderr)
+        mypl_us = sum(t[1] for t in times if t[0].startswith('mypl_'))
+        print(f'{label:<10}{statistics.median(samples) * 1000:>12.1f}'
+              f'{min(samples) * 1000:>10.1f}{mypl_us / 1000:>18.1f}')
+        breakdowns.append((label, times))
+    for label, times in breakdowns:
+        print(f'\nslowest imports ({label}), cumulative us:')
+        for name, _, cumulative_us in sorted(times, key=lambda t: -t[2])[:top]:
+            print(f'  {cumulative_us:>8}  {name}')
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(prog='bench_startup',
+                                        description='MyPL startup benchmark')
+    argparser.add_argument('-n', '--runs', type=int, default=20,
+                           help='runs per mode (default 20)')
+    argparser.add_argument('--top', type=int, default=8,
+                           help='number of imports to list per mode')
+    argparser.add_argument('filename', nargs='?', help='mypl program to run')
+    args = argparser.parse_args()
+    if args.filename:
+        report(args.filename, args.runs, args.top)
+    else:
+        with tempfile.NamedTemporaryFile('w', suffix='.mypl', delete=False) as f:
+            f.write(DEFAULT_PROGRAM)
+        try:
+            report(f.name, args.runs, args.top)
+        finally:
+            os.remove(f.name)
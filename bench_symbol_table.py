@@ -0,0 +1,119 @@
+"""Benchmark of the SemanticChecker symbol table on synthetic, deeply
+nested MyPL programs.
+
+Each generated program declares a set of function-level variables and
+then nests if statements DEPTH deep, referencing the outermost
+variables from every level. The checker is timed with the current
+SymbolTable and with a list-of-environments table that walks the
+scopes innermost outward (the previous implementation). Usage:
+
+    python bench_symbol_table.py [-n RUNS] [DEPTH ...]
+
+NAME: Jake VanZyverden
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+import argparse
+import io
+import sys
+import time
+
+from mypl_iowrapper import FileWrapper
+from mypl_lexer import Lexer
+from mypl_ast_parser import ASTParser
+from mypl_semantic_checker import SemanticChecker
+from mypl_symbol_table import SymbolTable
+
+
+WIDTH = 8
+
+
+class ScopeListSymbolTable(SymbolTable):
+    """Symbol table that searches a list of per-scope dicts (innermost
+    last) on every lookup.
+
+    """
+
+    def __init__(self):
+        self.environments = []
+
+    def __repr__(self):
+        return str(self.environments)
+
+    def push_environment(self):
+        self.environments.append({})
+
+    def pop_environment(self):
+        if self.environments:
+            self.environments.pop()
+
+    def add(self, name, info):
+        if self.environments:
+            self.environments[-1][name] = info
+
+    def exists(self, name):
+        for env in reversed(self.environments):
+            if name in env:
+                return True
+        return False
+
+    def exists_in_curr_env(self, name):
+        return bool(self.environments) and name in self.environments[-1]
+
+    def get(self, name):
+        for env in reversed(self.environments):
+            if name in env:
+                return env[name]
+        return None
+
+
+def nested_program(depth):
+    """Returns a MyPL program whose main function nests depth if
+    statements, each referencing the outermost variables.
+
+    """
+    outer = [f'v{i}' for i in range(WIDTH)]
+    lines = ['void main() {']
+    lines += [f'int {v} = {i};' for i, v in enumerate(outer)]
+    for d in range(1, depth + 1):
+        prev = f'd{d - 1}' if d > 1 else 'v0'
+        lines.append(f'if ({prev} < {d}) {{')
+        lines.append(f'int d{d} = {" + ".join(outer)} + {prev};')
+        lines.append(f'{outer[d % WIDTH]} = d{d} - {outer[(d + 1) % WIDTH]};')
+    lines += ['}'] * depth
+    lines.append(f'print(itos({" + ".join(outer)}));')
+    lines.append('}')
+    return '\n'.join(lines)
+
+
+def time_check(program, table_class, runs):
+    """Returns the best time (in seconds) to check the program."""
+    ast = ASTParser(Lexer(FileWrapper(io.StringIO(program)))).parse()
+    best = None
+    for _ in range(runs):
+        checker = SemanticChecker()
+        checker.symbol_table = table_class()
+        start = time.perf_counter()
+        ast.accept(checker)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(prog='bench_symbol_table',
+                                        description='symbol table benchmark')
+    argparser.add_argument('-n', '--runs', type=int, default=5,
+                           help='runs per program (default 5)')
+    argparser.add_argument('depths', nargs='*', type=int,
+                           default=[10, 50, 100, 200], help='nesting depths')
+    args = argparser.parse_args()
+    sys.setrecursionlimit(10000)
+    print(f'{"depth":>6}{"scope list ms":>16}{"flattened ms":>15}{"speedup":>10}')
+    for depth in args.depths:
+        program = nested_program(depth)
+        old = time_check(program, ScopeListSymbolTable, args.runs)
+        new = time_check(program, SymbolTable, args.runs)
+        print(f'{depth:>6}{old * 1000:>16.2f}{new * 1000:>15.2f}{old / new:>9.1f}x')
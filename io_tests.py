@@ -0,0 +1,249 @@
+import pytest
+import io
+
+from mypl_error import *
+from mypl_iowrapper import *
+from mypl_lexer import *
+from mypl_ast_parser import *
+from mypl_semantic_checker import *
+from mypl_code_gen import *
+from mypl_output import *
+from mypl_input import *
+from mypl_vm import *
+import mypl_files
+
+
+def build(program, output=None, source=None):
+    vm = VM(output=output, source=source)
+    ast = ASTParser(Lexer(FileWrapper(io.StringIO(program)))).parse()
+    ast.accept(SemanticChecker())
+    ast.accept(CodeGenerator(vm))
+    return vm
+
+
+#----------------------------------------------------------------------
+# Buffered output
+#----------------------------------------------------------------------
+
+def test_output_to_sink():
+    program = (
+        'void main() { \n'
+        '   print("a\\tb\\n"); \n'
+        '   print(true); \n'
+        '   print(null); \n'
+        '} \n'
+    )
+    sink = io.StringIO()
+    build(program, output=sink).run()
+    assert sink.getvalue() == 'a\tb\ntruenull'
+
+class EchoSource:
+    """Input source whose one line is the output written so far."""
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.lines = None
+
+    def read(self, n=-1):
+        if self.lines is None:
+            self.lines = self.sink.getvalue() + '\n'
+            return self.lines.encode()
+        return b''
+
+def test_output_flushed_before_read():
+    program = (
+        'void main() { \n'
+        '   print("name: "); \n'
+        '   string s = input(); \n'
+        '   print(s); \n'
+        '} \n'
+    )
+    sink = io.StringIO()
+    # the prompt must be written by the time input is read
+    build(program, output=sink, source=EchoSource(sink)).run()
+    assert sink.getvalue() == 'name: name: '
+
+def test_output_flushed_on_error():
+    sink = io.StringIO()
+    vm = build('void main() { print("before"); int x = 1 / 0; }', output=sink)
+    with pytest.raises(MyPLError):
+        vm.run()
+    assert sink.getvalue() == 'before'
+
+class BrokenSource:
+    """Input source that always fails."""
+
+    def read(self, n=-1):
+        raise OSError('broken')
+
+def test_output_flushed_on_unexpected_exception():
+    program = 'void main() { print("before"); string s = input(); }'
+    sink = io.StringIO()
+    with pytest.raises(OSError):
+        build(program, output=sink, source=BrokenSource()).run()
+    assert sink.getvalue() == 'before'
+
+def test_output_buffer_threshold():
+    sink = io.StringIO()
+    output = OutputBuffer(sink, threshold=4)
+    output.write('ab')
+    assert sink.getvalue() == ''
+    output.write('cd')
+    assert sink.getvalue() == 'abcd'
+    output.write('e')
+    output.flush()
+    assert sink.getvalue() == 'abcde'
+
+
+#----------------------------------------------------------------------
+# Buffered input
+#----------------------------------------------------------------------
+
+def read_run(program, data):
+    sink = io.StringIO()
+    vm = build(program, output=sink)
+    vm.input = InputBuffer(io.BytesIO(data), chunk_size=4)
+    vm.run()
+    return sink.getvalue()
+
+def test_input_until_end():
+    program = (
+        'void main() { \n'
+        '   string s = input(); \n'
+        '   while (s != null) { \n'
+        '      print(itos(length(s)) + " "); \n'
+        '      s = input(); \n'
+        '   } \n'
+        '} \n'
+    )
+    assert read_run(program, b'hello\r\n\nworld!\nlast') == '5 0 6 4 '
+
+def test_input_lines_and_all():
+    program = (
+        'void main() { \n'
+        '   array string first = input_lines(2); \n'
+        '   array string rest = input_all(); \n'
+        '   print(itos(length(first)) + first[1] + itos(length(rest))); \n'
+        '   print(rest[length(rest) - 1] + itos(length(input_lines(5)))); \n'
+        '} \n'
+    )
+    assert read_run(program, b'a\nbb\nc\nd\nlast\n') == '2bb3last0'
+
+@pytest.mark.parametrize('call', ['input_all(1)', 'input_lines()',
+                                  'input_lines("2")'])
+def test_input_built_in_args(call):
+    program = f'void main() {{ array string xs = {call}; }}'
+    with pytest.raises(MyPLError):
+        build(program)
+
+
+#----------------------------------------------------------------------
+# File I/O
+#----------------------------------------------------------------------
+
+FILE_COPY = (
+    'int copy(string src, string mode, string dst) { \n'
+    '   file in = fopen(src, mode); \n'
+    '   file out = fopen(dst, "w"); \n'
+    '   int count = 0; \n'
+    '   string line = freadline(in); \n'
+    '   while (line != null) { \n'
+    '      fwrite(out, itos(length(line)) + ":" + line + "\\n"); \n'
+    '      count = count + 1; \n'
+    '      line = freadline(in); \n'
+    '   } \n'
+    '   fclose(in); \n'
+    '   fclose(out); \n'
+    '   return count; \n'
+    '} \n'
+)
+
+@pytest.mark.parametrize('mode', ['r', 'm'])
+def test_file_copy(tmp_path, capsys, mode):
+    src = tmp_path / 'in.txt'
+    dst = tmp_path / 'out.txt'
+    src.write_bytes(b'ab\r\n\nlast')
+    program = FILE_COPY + (
+        'void main() { \n'
+        f'   print(itos(copy("{src}", "{mode}", "{dst}"))); \n'
+        '} \n'
+    )
+    build(program).run()
+    assert capsys.readouterr().out == '3'
+    assert dst.read_text() == '2:ab\n0:\n4:last\n'
+
+def test_file_empty_and_append(tmp_path, capsys):
+    src = tmp_path / 'empty.txt'
+    dst = tmp_path / 'out.txt'
+    src.write_text('')
+    dst.write_text('old\n')
+    program = (
+        'void main() { \n'
+        f'   file in = fopen("{src}", "m"); \n'
+        '   print(freadline(in)); \n'
+        f'   file out = fopen("{dst}", "a"); \n'
+        '   fwrite(out, "new\\n"); \n'
+        '} \n'
+    )
+    build(program).run()
+    assert capsys.readouterr().out == 'null'
+    # files left open are closed (and flushed) at exit
+    assert dst.read_text() == 'old\nnew\n'
+
+@pytest.mark.parametrize('body, message', [
+    ('file f = fopen("PATH", "x");', 'Invalid file mode'),
+    ('file f = fopen("PATH/missing", "r");', 'Could not open file'),
+    ('file f = fopen("PATH/f", "w"); fclose(f); fclose(f);',
+     'Invalid file handle'),
+    ('file f = fopen("PATH/f", "w"); string s = freadline(f);',
+     'File error'),
+])
+def test_file_errors(tmp_path, body, message):
+    program = 'void main() { ' + body.replace('PATH', str(tmp_path)) + ' }'
+    with pytest.raises(MyPLError) as e:
+        build(program).run()
+    assert message in str(e.value)
+
+@pytest.mark.parametrize('body', [
+    'file f = fopen("a");',
+    'int f = fopen("a", "r");',
+    'fwrite(1, "x");',
+    'fclose(1);',
+    'file f = fopen("a", "r"); int n = f + 1;',
+    'file f = fopen("a", "r"); file g = f + f;',
+    'file f = fopen("a", "r"); print(f);',
+])
+def test_file_handle_misuse(body):
+    with pytest.raises(MyPLError):
+        build('void main() { ' + body + ' }')
+
+def test_file_handle_type():
+    program = (
+        'void log(file f, string s) { \n'
+        '   if (f != null) { fwrite(f, s); } \n'
+        '} \n'
+        'void main() { \n'
+        '   file f = null; \n'
+        '   log(f, "x"); \n'
+        '} \n'
+    )
+    build(program).run()
+    with pytest.raises(MyPLError):
+        build('struct file { int x; } void main() { }')
+
+@pytest.mark.parametrize('close', ['fclose(f);', ''])
+def test_file_close_errors(tmp_path, monkeypatch, close):
+    def full(self):
+        raise OSError('disk full')
+    monkeypatch.setattr(mypl_files.FileWriter, 'flush', full)
+    program = (
+        'void main() { \n'
+        f'   file f = fopen("{tmp_path}/f", "w"); \n'
+        '   fwrite(f, "x"); \n'
+        f'   {close} \n'
+        '} \n'
+    )
+    # closing explicitly, or at exit
+    with pytest.raises(MyPLError) as e:
+        build(program).run()
+    assert 'File error: disk full' in str(e.value)
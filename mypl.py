@@ -8,18 +8,12 @@ CLASS: CPSC 326
 
 import argparse
 import sys
-import io
 
+# NOTE: each run_*_mode function imports only the modules its mode
+# needs, so short runs (e.g., --lex) don't pay for loading the
+# parser, checker, code generator, and VM.
 from mypl_iowrapper import FileWrapper, StdInWrapper
 from mypl_error import MyPLError
-from mypl_lexer import Lexer
-from mypl_token import TokenType, Token
-from mypl_simple_parser import SimpleParser
-from mypl_ast_parser import ASTParser
-from mypl_printer import PrintVisitor
-from mypl_semantic_checker import SemanticChecker
-from mypl_code_gen import CodeGenerator
-from mypl_vm import VM
 
 
 def run_lex_mode(in_stream):
@@ -30,6 +24,8 @@ def run_lex_mode(in_stream):
         in_stream -- A wrapped input stream containing a mypl program.
 
     """
+    from mypl_token import TokenType
+    from mypl_lexer import Lexer
     try: 
         lexer = Lexer(in_stream)
         t = lexer.next_token()
@@ -52,6 +48,8 @@ def run_parse_mode(in_stream):
         in_stream -- A wrapped input stream containing a mypl program.
 
     """
+    from mypl_lexer import Lexer
+    from mypl_simple_parser import SimpleParser
     try: 
         lexer = Lexer(in_stream)
         parser = SimpleParser(lexer)
@@ -70,6 +68,9 @@ def run_print_mode(in_stream):
         in_stream -- A wrapped input stream containing a mypl program.
 
     """
+    from mypl_lexer import Lexer
+    from mypl_ast_parser import ASTParser
+    from mypl_printer import PrintVisitor
     try: 
         lexer = Lexer(in_stream)
         parser = ASTParser(lexer)
@@ -91,6 +92,9 @@ def run_check_mode(in_stream):
         in_stream -- A wrapped input stream containing a mypl program.
 
     """
+    from mypl_lexer import Lexer
+    from mypl_ast_parser import ASTParser
+    from mypl_semantic_checker import SemanticChecker
     try: 
         lexer = Lexer(in_stream)
         parser = ASTParser(lexer)
@@ -104,47 +108,102 @@ def run_check_mode(in_stream):
 
 
     
-def run_ir_mode(in_stream):
+def run_ir_mode(in_stream, pass_manager, time_passes=False):
     """Generates the intermediate representation (VM instructions) for the
     given mypl program and prints to standard output the resulting
     instructions.
 
     Args: 
         in_stream -- A wrapped input stream containing a mypl program.
+        pass_manager -- The optimization passes to run.
+        time_passes -- If True, prints pass timings to standard error.
 
     """
+    from mypl_lexer import Lexer
+    from mypl_ast_parser import ASTParser
+    from mypl_semantic_checker import SemanticChecker
+    from mypl_code_gen import CodeGenerator
+    from mypl_vm import VM
     try:
         lexer = Lexer(in_stream)
         parser = ASTParser(lexer)
         ast = parser.parse()
         visitor = SemanticChecker()
         ast.accept(visitor)
+        pass_manager.run_ast_passes(ast)
         vm = VM()
         codegen = CodeGenerator(vm)
         ast.accept(codegen)
+        pass_manager.run_code_passes(vm)
+        if time_passes:
+            print(pass_manager.report(), file=sys.stderr)
         print(vm)
     except MyPLError as ex:
         print(ex)
         exit(1)
 
     
-def run_normal_mode(in_stream):
+def run_normal_mode(in_stream, pass_manager, time_passes=False,
+                    check_bounds=False, memo_size=0, output=None):
     """Executes the given mypl program. Any output produced by the program
-    is printed to standard output. 
+    is printed to standard output (or the given output file). 
 
     Args: 
         in_stream -- A wrapped input stream containing a mypl program.
+        pass_manager -- The optimization passes to run.
+        time_passes -- If True, prints pass timings to standard error.
+        check_bounds -- If True, all array accesses are bounds checked.
+        memo_size -- The number of pure function results to cache (0
+                     for none); cache statistics are printed to
+                     standard error at exit.
+        output -- An open file for the program's output (None for
+                  standard output).
 
     """
+    from mypl_lexer import Lexer
+    from mypl_ast_parser import ASTParser
+    from mypl_semantic_checker import SemanticChecker
+    from mypl_code_gen import CodeGenerator
+    from mypl_vm import VM
     try:
         lexer = Lexer(in_stream)
         parser = ASTParser(lexer)
         ast = parser.parse()
         visitor = SemanticChecker()
-        # ast.accept(visitor)
-        vm = VM()
+        ast.accept(visitor)
+        pass_manager.run_ast_passes(ast)
+        vm = VM(check_bounds, memo_size, output)
         codegen = CodeGenerator(vm)
         ast.accept(codegen)
+        pass_manager.run_code_passes(vm)
+        if time_passes:
+            print(pass_manager.report(), file=sys.stderr)
+        vm.run()
+        if vm.memo:
+            print(vm.memo.stats(), file=sys.stderr)
+    except MyPLError as ex:
+        print(ex)
+        exit(1)
+
+
+
+def run_asm_mode(in_stream, check_bounds=False, output=None):
+    """Executes the given textual intermediate representation (as printed
+    by the --ir mode) directly on the VM, bypassing the lexer, parser,
+    and code generator.
+
+    Args: 
+        in_stream -- A wrapped input stream containing mypl VM instructions.
+        check_bounds -- If True, all array accesses are bounds checked.
+        output -- An open file for the program's output (None for
+                  standard output).
+
+    """
+    from mypl_vm import VM
+    from mypl_assembler import Assembler, read_source
+    try:
+        vm = VM(check_bounds, output=output)
+        Assembler(vm).assemble(read_source(in_stream))
         vm.run()
     except MyPLError as ex:
         print(ex)
@@ -170,9 +229,41 @@ if __name__ == '__main__':
     group.add_argument('--check', action='store_true', help=help_msg)
     help_msg = 'displays intermediate code'
     group.add_argument('--ir', action='store_true', help=help_msg)
+    help_msg = 'runs intermediate code (as displayed by --ir)'
+    group.add_argument('--asm', action='store_true', help=help_msg)
+    help_msg = 'optimization level (default 1)'
+    argparser.add_argument('-O', type=int, choices=[0, 1, 2], default=1,
+                           dest='opt_level', help=help_msg)
+    help_msg = 'comma-separated optimization passes to run (overrides -O)'
+    argparser.add_argument('--passes', help=help_msg)
+    help_msg = 'prints the time taken by each optimization pass'
+    argparser.add_argument('--time-passes', action='store_true', help=help_msg)
+    help_msg = 'bounds checks all array accesses (for debugging)'
+    argparser.add_argument('--check-bounds', action='store_true', help=help_msg)
+    help_msg = 'caches results of pure functions (reports cache statistics)'
+    argparser.add_argument('--memoize', action='store_true', help=help_msg)
+    help_msg = 'number of results --memoize caches (default 1024)'
+    argparser.add_argument('--memo-size', type=int, default=1024, help=help_msg)
+    help_msg = 'writes the program\'s output to a file'
+    argparser.add_argument('--output', metavar='FILE', help=help_msg)
     help_msg = 'mypl program file (optional)'
     argparser.add_argument('filename', nargs='?', help=help_msg)
     args = argparser.parse_args()
+    # set up the optimization passes (only needed to compile)
+    pass_manager = None
+    if not (args.lex or args.parse or args.print or args.check or args.asm):
+        from mypl_passes import PassManager, OPT_LEVELS
+        try:
+            if args.passes is not None:
+                names = [name for name in args.passes.split(',') if name]
+            else:
+                names = list(OPT_LEVELS[args.opt_level])
+            # memoization needs the functions marked pure
+            if args.memoize and 'pure' not in names:
+                names.append('pure')
+            pass_manager = PassManager(names)
+        except ValueError as ex:
+            argparser.error(str(ex))
     # get the input (file or standard in)
     in_stream = StdInWrapper(sys.stdin)
     if args.filename:
@@ -181,6 +272,13 @@ if __name__ == '__main__':
         except: 
             print(f"ERROR: Could not open file '{args.filename}'")
             exit(1)
+    output = None
+    if args.output:
+        try:
+            output = open(args.output, 'w', encoding='utf-8')
+        except OSError:
+            print(f"ERROR: Could not open file '{args.output}'")
+            exit(1)
     # check args and route to appropriate function
     if args.lex:
         run_lex_mode(in_stream)
@@ -191,9 +289,15 @@ if __name__ == '__main__':
     elif args.check:
         run_check_mode(in_stream)
     elif args.ir:
-        run_ir_mode(in_stream)
+        run_ir_mode(in_stream, pass_manager, args.time_passes)
+    elif args.asm:
+        run_asm_mode(in_stream, args.check_bounds, output)
     else:
-        run_normal_mode(in_stream)
-    # close the (wrapped) input stream
+        run_normal_mode(in_stream, pass_manager, args.time_passes,
+                        args.check_bounds,
+                        args.memo_size if args.memoize else 0, output)
+    # close the (wrapped) input stream and output file
     in_stream.close()
+    if output:
+        output.close()
 
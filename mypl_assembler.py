@@ -0,0 +1,139 @@
+"""Assembler for reading textual MyPL VM instructions (as printed by
+the --ir mode) back into VM frame templates.
+
+The accepted format is the one produced by printing a VM:
+
+    Frame f_int (args: 1)
+      0: OpCode.STORE(0)
+      1: OpCode.LOAD(0)  // optional comment
+      2: OpCode.RET()
+
+For hand-written code the instruction indexes and the "OpCode."
+prefix are optional (if an index is given it must match the
+instruction's position), blank lines and lines starting with // are
+ignored, and a missing "(args: n)" means the function takes no
+arguments. Operands are Python
+literals (an empty operand is None); an unquoted operand is read as a
+string.
+
+NAME: Jake VanZyverden
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+import ast
+import re
+
+from mypl_error import *
+from mypl_opcode import OpCode
+from mypl_frame import VMFrameTemplate, VMInstr
+
+
+FRAME_RE = re.compile(r'Frame\s+(\S+)(?:\s+\(args:\s*(\d+)\))?\s*$')
+INSTR_RE = re.compile(r'(?:(\d+)\s*:\s*)?(?:OpCode\.)?([A-Z]+)\(')
+STRING_RE = re.compile(r'\'(?:[^\'\\]|\\.)*\'|"(?:[^"\\]|\\.)*"')
+
+
+def read_source(in_stream):
+    """Returns the entire contents of a wrapped input stream.
+
+    Args:
+        in_stream -- A wrapped input stream (see mypl_iowrapper).
+
+    """
+    chars = []
+    ch = in_stream.read_char()
+    while ch != '':
+        chars.append(ch)
+        ch = in_stream.read_char()
+    return ''.join(chars)
+
+
+class Assembler:
+
+    def __init__(self, vm):
+        """Creates a new assembler given a VM.
+
+        Args:
+            vm -- The target vm to add frame templates to.
+
+        """
+        self.vm = vm
+        self.curr_template = None
+        self.line = 0
+
+    def error(self, message):
+        """Raises an assembler error for the current line."""
+        raise AssemblerError(f'{message} at line {self.line}')
+
+    def assemble(self, source):
+        """Parses the given textual IR, adding each frame template to the VM.
+
+        Args:
+            source -- The IR program text.
+
+        """
+        for line, text in enumerate(source.splitlines(), start=1):
+            self.line = line
+            text = text.strip()
+            if not text or text.startswith('//'):
+                continue
+            m = FRAME_RE.match(text)
+            if m:
+                self.finish_template()
+                arg_count = int(m.group(2)) if m.group(2) else 0
+                self.curr_template = VMFrameTemplate(m.group(1), arg_count, [])
+            else:
+                self.instruction(text)
+        self.finish_template()
+        return self.vm
+
+    def finish_template(self):
+        """Adds the current template (if any) to the VM."""
+        if not self.curr_template:
+            return
+        template = self.curr_template
+        if template.function_name in self.vm.frame_templates:
+            self.error(f'duplicate frame "{template.function_name}"')
+        self.vm.add_frame_template(template)
+        self.curr_template = None
+
+    def instruction(self, text):
+        """Parses a single instruction line into the current template."""
+        if not self.curr_template:
+            self.error('instruction outside of a frame')
+        m = INSTR_RE.match(text)
+        if not m:
+            self.error(f'invalid instruction "{text}"')
+        index, name = m.group(1), m.group(2)
+        if name not in OpCode.__members__:
+            self.error(f'unknown opcode "{name}"')
+        instrs = self.curr_template.instructions
+        if index is not None and int(index) != len(instrs):
+            self.error(f'expecting instruction index {len(instrs)}')
+        operand, rest = self.operand(text[m.end():])
+        rest = rest.strip()
+        comment = ''
+        if rest.startswith('//'):
+            comment = rest[2:].strip()
+        elif rest:
+            self.error(f'unexpected text "{rest}"')
+        instrs.append(VMInstr(OpCode[name], operand, comment))
+
+    def operand(self, text):
+        """Parses an operand and the closing parenthesis, returning the
+        operand value and the remaining text.
+
+        """
+        m = STRING_RE.match(text)
+        end = m.end() if m else text.find(')')
+        if end < 0 or text[end:end + 1] != ')':
+            self.error('expecting ")"')
+        literal = text[:end].strip()
+        if not literal:
+            return None, text[end + 1:]
+        try:
+            return ast.literal_eval(literal), text[end + 1:]
+        except (ValueError, SyntaxError):
+            return literal, text[end + 1:]
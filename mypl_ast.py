@@ -110,6 +110,7 @@ class FunDef:
     fun_name: Token
     params: List[VarDef]
     stmts: List[Stmt]
+    pure: bool = False          # result depends only on arguments (set by purity pass)
     def accept(self, visitor):
         visitor.visit_fun_def(self)
 
@@ -137,6 +138,8 @@ class Expr:
     first: ExprTerm
     op: Token
     rest: 'Expr'
+    type: 'DataType' = None     # expression type (set by checker)
+    op_type: 'DataType' = None  # type of both operands of op, if known
     def accept(self, visitor):
         visitor.visit_expr(self)
 
@@ -144,7 +147,8 @@ class Expr:
 class CallExpr(Stmt, RValue):
     fun_name: Token
     args: List[Expr]
-    arg_types: List[str]
+    target: str = None          # mangled overload name (set by checker)
+    type: 'DataType' = None     # return type (set by checker)
     def accept(self, visitor):
         visitor.visit_call_expr(self)
         
@@ -171,6 +175,7 @@ class NewRValue(RValue):
     type_name: Token
     array_expr: Expr
     struct_params: List[Expr]
+    type: 'DataType' = None     # allocated type (set by checker)
     def accept(self, visitor):
         visitor.visit_new_rvalue(self)
     
@@ -178,6 +183,9 @@ class NewRValue(RValue):
 class VarRef:
     var_name: Token
     array_expr: Expr
+    type: 'DataType' = None     # type after this reference (set by checker)
+    offset: int = None          # field index in its struct (set by checker)
+    unchecked: bool = False     # index known to be in range (set by bounds pass)
         
 @dataclass
 class VarRValue(RValue):
@@ -22,8 +22,6 @@ class ASTParser:
         """
         self.lexer = lexer
         self.curr_token = None
-        self.struct_defs = {}
-        self.var_bindings = {}
 
     def parse(self):
         """Start the parser, returning a Program AST node."""
@@ -131,7 +129,6 @@ class ASTParser:
         fields_node = []
         self.fields(fields_node)
         self.eat(TokenType.RBRACE, "Expected RBRACE")
-        self.struct_defs[name.lexeme] = []
         program_node.struct_defs.append(StructDef(name, fields_node))
 
     def fields(self, fields_node):
@@ -489,7 +486,6 @@ class ASTParser:
 
     def call_expr(self, skip_id, skipped_id):
         args = []
-        arg_types = []
         if (not skip_id):
             fun_name = self.curr_token
             self.eat(TokenType.ID, "Expected ID")
@@ -497,50 +493,17 @@ class ASTParser:
             fun_name = skipped_id
         self.eat(TokenType.LPAREN, " Expected LPAREN")
         while (not self.match(TokenType.RPAREN)):
-            match self.curr_token.token_type:
-                case TokenType.ID:
-                    added = False
-                    for _def in self.struct_defs:
-                        for val in self.struct_defs[_def]:
-                            if (val == self.curr_token.lexeme):
-                                arg_types.append(_def)
-                                added = True
-                    if (not added):
-                        if (self.var_bindings.__contains__(self.curr_token.lexeme)):
-                            arg_types.append(self.var_bindings[self.curr_token.lexeme])
-                case TokenType.INT_VAL:
-                    arg_types.append("int")
-                case TokenType.STRING_VAL:
-                    arg_types.append("string")
-                case TokenType.DOUBLE_VAL:
-                    arg_types.append("double")
-                case TokenType.BOOL_VAL:
-                    arg_types.append("bool")
-                case TokenType.NOT:
-                    arg_types.append("bool")
-                case _:
-                    arg_types.append("expr")
             args.append(self.expr())
             if (not self.match(TokenType.RPAREN)):
                 self.eat(TokenType.COMMA, " Expected COMMA")
         self.eat(TokenType.RPAREN, " Expected RPAREN")
-        return CallExpr(fun_name, args, arg_types)
+        return CallExpr(fun_name, args)
 
     def vdecl_stmt(self, skipID, var_def):
         expr = None
         if (not skipID):
             var_def.data_type = self.data_type()
-            var_def.var_name = self.curr_token
-            if (self.struct_defs.__contains__(var_def.data_type.type_name.lexeme)):
-                self.struct_defs[var_def.data_type.type_name.lexeme].append(var_def.var_name.lexeme)
-            else:
-                self.var_bindings[var_def.var_name.lexeme] = var_def.data_type.type_name.lexeme
-        else:
-            var_def.var_name = self.curr_token
-            if (self.struct_defs.__contains__(var_def.data_type.type_name.lexeme)):
-                self.struct_defs[var_def.data_type.type_name.lexeme].append(var_def.var_name.lexeme)
-            else:
-                self.var_bindings[var_def.var_name.lexeme] = var_def.data_type.type_name.lexeme
+        var_def.var_name = self.curr_token
         self.eat(TokenType.ID, "Expected ID")
         if (self.match(TokenType.ASSIGN)):
             self.eat(TokenType.ASSIGN, " Expected ASSIGN")
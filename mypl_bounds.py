@@ -0,0 +1,202 @@
+"""Array bounds-check elimination for canonical MyPL for loops.
+
+Runs after semantic checking and before code generation. In a loop of
+the form
+
+  for (int i = K; i < length(a); i = i + S) { ... }
+
+with non-negative K, positive S, and a body that neither assigns nor
+declares i or a, every a[i] in the body is in range: i starts at K or
+above, only grows, and is below length(a) each time the body runs (an
+array's length never changes, and a null a fails in length before the
+body runs). These accesses are marked unchecked, so the code generator
+emits GETIU/SETIU, which skip the VM's null and index checks. The VM
+can be told to check them anyway (see VM check_bounds).
+
+NAME: Jake VanZyverden
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+from mypl_token import TokenType
+from mypl_ast import *
+from mypl_effects import effects
+
+
+def term_var(term):
+    """Returns the name of the variable a term consists of (or None)."""
+    if not isinstance(term, SimpleTerm) or not isinstance(term.rvalue, VarRValue):
+        return None
+    path = term.rvalue.path
+    if len(path) != 1 or path[0].array_expr:
+        return None
+    return path[0].var_name.lexeme
+
+
+def expr_var(expr):
+    """Returns the name of the variable an expression consists of (or
+    None).
+
+    """
+    if expr is None or expr.op or expr.not_op:
+        return None
+    return term_var(expr.first)
+
+
+def expr_int(expr):
+    """Returns the value of an int literal expression (or None)."""
+    if expr is None or expr.op or expr.not_op:
+        return None
+    term = expr.first
+    if (not isinstance(term, SimpleTerm) or
+            not isinstance(term.rvalue, SimpleRValue) or
+            term.rvalue.value.token_type != TokenType.INT_VAL):
+        return None
+    return int(term.rvalue.value.lexeme)
+
+
+class BoundsCheckEliminator(Visitor):
+
+    def __init__(self):
+        """Creates a bounds-check elimination pass."""
+        # (array name, index name) pairs known to be in range
+        self.safe = set()
+        # number of canonical loops found and accesses unchecked
+        self.loops = 0
+        self.unchecked = 0
+
+    def summary(self):
+        """Returns a short description of what the pass did."""
+        return f'{self.unchecked} array access(es) unchecked in {self.loops} loop(s)'
+
+    # Helper functions
+
+    def canonical(self, for_stmt):
+        """Returns the (array name, index name) of a canonical array loop
+        (or None if the loop isn't one).
+
+        """
+        var_def = for_stmt.var_decl.var_def
+        index = var_def.var_name.lexeme
+        if var_def.data_type.is_array or var_def.data_type.type_name.lexeme != 'int':
+            return None
+        start = expr_int(for_stmt.var_decl.expr)
+        if start is None or start < 0:
+            return None
+        # i < length(a)
+        condition = for_stmt.condition
+        if (condition.not_op or condition.op is None or
+                condition.op.token_type != TokenType.LESS or
+                term_var(condition.first) != index):
+            return None
+        rest = condition.rest
+        if rest.op or rest.not_op or not isinstance(rest.first, SimpleTerm):
+            return None
+        call = rest.first.rvalue
+        if (not isinstance(call, CallExpr) or call.fun_name.lexeme != 'length' or
+                len(call.args) != 1 or expr_var(call.args[0]) is None):
+            return None
+        array = expr_var(call.args[0])
+        # i = i + S
+        assign = for_stmt.assign_stmt
+        expr = assign.expr
+        if (len(assign.lvalue) != 1 or assign.lvalue[0].array_expr or
+                assign.lvalue[0].var_name.lexeme != index or expr.not_op or
+                expr.op is None or expr.op.token_type != TokenType.PLUS or
+                term_var(expr.first) != index):
+            return None
+        step = expr_int(expr.rest)
+        if step is None or step < 1:
+            return None
+        found = effects(*for_stmt.stmts)
+        if index in found.variables or array in found.variables:
+            return None
+        return array, index
+
+    def check_path(self, path):
+        """Marks the path's first access unchecked if it is a safe one, and
+        visits its index expressions.
+
+        """
+        first = path[0]
+        if first.array_expr:
+            key = (first.var_name.lexeme, expr_var(first.array_expr))
+            if key in self.safe and not first.unchecked:
+                first.unchecked = True
+                self.unchecked += 1
+        for var_ref in path:
+            if var_ref.array_expr:
+                var_ref.array_expr.accept(self)
+
+    def visit_stmts(self, stmts):
+        """Visits each statement in the list."""
+        for stmt in stmts:
+            stmt.accept(self)
+
+    # Visitor functions
+
+    def visit_program(self, program):
+        for fun_def in program.fun_defs:
+            fun_def.accept(self)
+
+    def visit_fun_def(self, fun_def):
+        self.visit_stmts(fun_def.stmts)
+
+    def visit_return_stmt(self, return_stmt):
+        return_stmt.expr.accept(self)
+
+    def visit_var_decl(self, var_decl):
+        if var_decl.expr:
+            var_decl.expr.accept(self)
+
+    def visit_assign_stmt(self, assign_stmt):
+        self.check_path(assign_stmt.lvalue)
+        assign_stmt.expr.accept(self)
+
+    def visit_while_stmt(self, while_stmt):
+        while_stmt.condition.accept(self)
+        self.visit_stmts(while_stmt.stmts)
+
+    def visit_for_stmt(self, for_stmt):
+        for_stmt.var_decl.accept(self)
+        for_stmt.condition.accept(self)
+        for_stmt.assign_stmt.accept(self)
+        key = self.canonical(for_stmt)
+        if key is None or key in self.safe:
+            self.visit_stmts(for_stmt.stmts)
+            return
+        self.loops += 1
+        self.safe.add(key)
+        self.visit_stmts(for_stmt.stmts)
+        self.safe.remove(key)
+
+    def visit_if_stmt(self, if_stmt):
+        for basic_if in [if_stmt.if_part] + if_stmt.else_ifs:
+            basic_if.condition.accept(self)
+            self.visit_stmts(basic_if.stmts)
+        self.visit_stmts(if_stmt.else_stmts)
+
+    def visit_call_expr(self, call_expr):
+        for arg in call_expr.args:
+            arg.accept(self)
+
+    def visit_expr(self, expr):
+        expr.first.accept(self)
+        if expr.rest:
+            expr.rest.accept(self)
+
+    def visit_simple_term(self, simple_term):
+        simple_term.rvalue.accept(self)
+
+    def visit_complex_term(self, complex_term):
+        complex_term.expr.accept(self)
+
+    def visit_new_rvalue(self, new_rvalue):
+        if new_rvalue.array_expr:
+            new_rvalue.array_expr.accept(self)
+        for param in new_rvalue.struct_params or []:
+            param.accept(self)
+
+    def visit_var_rvalue(self, var_rvalue):
+        self.check_path(var_rvalue.path)
@@ -0,0 +1,262 @@
+"""Control-flow graph (CFG) representation of MyPL VM frame templates.
+
+A CFG splits a template's instructions into basic blocks (straight-line
+sequences entered only at the top and left only at the bottom) linked
+to their predecessors and successors. Jumps inside blocks refer to
+blocks rather than instruction offsets, so passes can add, remove, and
+reorder instructions and blocks freely; to_instructions() lays the
+blocks back out and recomputes the jump offsets.
+
+NAME: Jake VanZyverden
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+from dataclasses import dataclass, field
+from mypl_opcode import OpCode
+from mypl_frame import VMFrameTemplate, VMInstr
+
+
+JUMPS = [OpCode.JMP, OpCode.JMPF]
+
+# instructions that leave the function
+EXITS = [OpCode.RET, OpCode.TAILCALL]
+
+# opcode -> (number of values popped, number of values pushed); CALL
+# and TAILCALL pop the callee's argument count
+STACK_EFFECTS = {
+    OpCode.PUSH: (0, 1), OpCode.POP: (1, 0), OpCode.LOAD: (0, 1),
+    OpCode.STORE: (1, 0),
+    OpCode.ADD: (2, 1), OpCode.SUB: (2, 1), OpCode.MUL: (2, 1),
+    OpCode.DIV: (2, 1), OpCode.CMPLT: (2, 1), OpCode.CMPLE: (2, 1),
+    OpCode.CMPEQ: (2, 1), OpCode.CMPNE: (2, 1), OpCode.AND: (2, 1),
+    OpCode.OR: (2, 1), OpCode.NOT: (1, 1), OpCode.NOTU: (1, 1),
+    OpCode.ADDI: (2, 1), OpCode.ADDD: (2, 1), OpCode.CONCAT: (2, 1),
+    OpCode.SUBI: (2, 1), OpCode.SUBD: (2, 1), OpCode.MULI: (2, 1),
+    OpCode.MULD: (2, 1), OpCode.DIVI: (2, 1), OpCode.DIVD: (2, 1),
+    OpCode.CMPLTI: (2, 1), OpCode.CMPLEI: (2, 1),
+    OpCode.JMP: (0, 0), OpCode.JMPF: (1, 0),
+    OpCode.CALL: (None, 1), OpCode.TAILCALL: (None, 0), OpCode.RET: (1, 0),
+    OpCode.WRITE: (1, 0), OpCode.READ: (0, 1), OpCode.READALL: (0, 1),
+    OpCode.READN: (1, 1), OpCode.LEN: (1, 1),
+    OpCode.GETC: (2, 1), OpCode.TOINT: (1, 1), OpCode.TODBL: (1, 1),
+    OpCode.TOSTR: (1, 1), OpCode.FOPEN: (2, 1), OpCode.FREAD: (1, 1),
+    OpCode.FWRITE: (2, 0), OpCode.FCLOSE: (1, 0),
+    OpCode.ALLOCS: (0, 1), OpCode.SETF: (2, 0), OpCode.GETF: (1, 1),
+    OpCode.ALLOCA: (1, 1), OpCode.SETI: (3, 0), OpCode.GETI: (2, 1),
+    OpCode.SETIU: (3, 0), OpCode.GETIU: (2, 1),
+    OpCode.SETFU: (2, 0), OpCode.GETFU: (1, 1), OpCode.LENU: (1, 1),
+    OpCode.TOSTRU: (1, 1),
+    OpCode.DUP: (1, 2), OpCode.NOP: (0, 0),
+}
+
+
+def stack_effect(instr, templates):
+    """Returns the (pops, pushes) of an instruction.
+
+    Args:
+        instr -- The VM instruction.
+        templates -- Function name -> VMFrameTemplate (for CALL arity).
+
+    """
+    pops, pushes = STACK_EFFECTS[instr.opcode]
+    if pops is None:
+        callee = instr.operand
+        if not isinstance(callee, VMFrameTemplate):
+            callee = templates[callee]
+        pops = callee.arg_count
+    return pops, pushes
+
+
+@dataclass(eq=False)
+class BasicBlock:
+    """A basic block of a CFG."""
+    id: int
+    instructions: list[VMInstr] = field(default_factory=list)
+    # block executed when the last instruction doesn't jump (or None)
+    fallthrough: 'BasicBlock' = field(default=None, repr=False)
+    # block jumped to by a final JMP/JMPF (or None)
+    target: 'BasicBlock' = field(default=None, repr=False)
+    preds: list['BasicBlock'] = field(default_factory=list, repr=False)
+    # operand stack depth on entry and exit (None if unreachable)
+    stack_in: int = None
+    stack_out: int = None
+
+    @property
+    def succs(self):
+        """Returns the successor blocks."""
+        return [b for b in (self.fallthrough, self.target) if b is not None]
+
+    @property
+    def terminator(self):
+        """Returns the last instruction (or None if the block is empty)."""
+        return self.instructions[-1] if self.instructions else None
+
+
+class CFG:
+
+    def __init__(self, template, templates):
+        """Builds the CFG of a frame template.
+
+        Args:
+            template -- The VMFrameTemplate.
+            templates -- Function name -> VMFrameTemplate (for CALL arity).
+
+        """
+        self.template = template
+        self.templates = templates
+        self.blocks = []
+        # (block, depth) pairs where predecessors disagree on stack depth
+        self.depth_conflicts = []
+        self.max_stack = 0
+        self.build()
+
+    def __repr__(self):
+        """Returns a string representation of the blocks."""
+        s = f'CFG {self.template.function_name}\n'
+        for block in self.blocks:
+            succs = ', '.join(f'B{b.id}' for b in block.succs)
+            s += f'  B{block.id} (stack {block.stack_in} -> {block.stack_out})'
+            s += f' -> [{succs}]\n'
+            for instr in block.instructions:
+                s += f'    {instr}\n'
+        return s
+
+    @property
+    def entry(self):
+        """Returns the entry block (or None for an empty function)."""
+        return self.blocks[0] if self.blocks else None
+
+    def build(self):
+        """Splits the template instructions into linked basic blocks."""
+        instrs = self.template.instructions
+        leaders = {0} if instrs else set()
+        for i, instr in enumerate(instrs):
+            if instr.opcode in JUMPS:
+                # a jump past the last instruction gets an empty end block
+                leaders.add(instr.operand)
+            if instr.opcode in JUMPS + EXITS and i + 1 < len(instrs):
+                leaders.add(i + 1)
+        leaders = sorted(leaders)
+        block_at = {}
+        for start in leaders:
+            block = BasicBlock(len(self.blocks))
+            block_at[start] = block
+            self.blocks.append(block)
+        bounds = leaders + [len(instrs)]
+        for i, block in enumerate(self.blocks):
+            block.instructions = instrs[bounds[i]:bounds[i + 1]]
+            last = block.terminator
+            if last and last.opcode in JUMPS:
+                block.target = block_at[last.operand]
+            ends = last and last.opcode in [OpCode.JMP] + EXITS
+            if not ends and i + 1 < len(self.blocks):
+                block.fallthrough = self.blocks[i + 1]
+        self.link_preds()
+
+    def link_preds(self):
+        """Recomputes each block's predecessor list."""
+        for block in self.blocks:
+            block.preds = []
+        for block in self.blocks:
+            for succ in block.succs:
+                succ.preds.append(block)
+
+    def remove_unreachable(self):
+        """Removes blocks that can't be reached from the entry block."""
+        if not self.blocks:
+            return
+        seen = {self.entry}
+        work = [self.entry]
+        while work:
+            for succ in work.pop().succs:
+                if succ not in seen:
+                    seen.add(succ)
+                    work.append(succ)
+        self.blocks = [b for b in self.blocks if b in seen]
+        self.link_preds()
+
+    def annotate_stack_depths(self):
+        """Computes the operand stack depth on entry to and exit from each
+        reachable block, the maximum depth, and any blocks whose
+        predecessors disagree on the entry depth.
+
+        """
+        self.depth_conflicts = []
+        self.max_stack = 0
+        for block in self.blocks:
+            block.stack_in = block.stack_out = None
+        if not self.blocks:
+            return
+        self.entry.stack_in = 0
+        work = [self.entry]
+        while work:
+            block = work.pop()
+            depth = block.stack_in
+            for instr in block.instructions:
+                pops, pushes = stack_effect(instr, self.templates)
+                depth = depth - pops + pushes
+                self.max_stack = max(self.max_stack, depth)
+            block.stack_out = depth
+            for succ in block.succs:
+                if succ.stack_in is None:
+                    succ.stack_in = depth
+                    work.append(succ)
+                elif succ.stack_in != depth:
+                    self.depth_conflicts.append((succ, depth))
+
+    def to_instructions(self):
+        """Lays out the blocks in order, adding a JMP where a fallthrough
+        block isn't next, and returns the instruction list with jump
+        offsets recomputed.
+
+        """
+        layout = []
+        for i, block in enumerate(self.blocks):
+            layout.append(block)
+            nxt = self.blocks[i + 1] if i + 1 < len(self.blocks) else None
+            if block.fallthrough is not None and block.fallthrough is not nxt:
+                jump = BasicBlock(-1, [VMInstr(OpCode.JMP)])
+                jump.target = block.fallthrough
+                layout.append(jump)
+        start = {}
+        offset = 0
+        for block in layout:
+            start[block] = offset
+            offset += len(block.instructions)
+        instrs = []
+        for block in layout:
+            for instr in block.instructions:
+                if instr.opcode in JUMPS:
+                    instr.operand = start[block.target]
+                instrs.append(instr)
+        return instrs
+
+
+class CFGSimplifier:
+
+    def __init__(self):
+        """Creates a CFG simplification pass."""
+        # number of blocks removed
+        self.removed = 0
+        # largest operand stack depth over all functions
+        self.max_stack = 0
+
+    def summary(self):
+        """Returns a short description of what the pass did."""
+        return f'{self.removed} block(s) removed, max stack {self.max_stack}'
+
+    def optimize(self, vm):
+        """Rebuilds each frame template from its CFG with unreachable
+        blocks removed.
+
+        """
+        for template in vm.frame_templates.values():
+            cfg = CFG(template, vm.frame_templates)
+            count = len(cfg.blocks)
+            cfg.remove_unreachable()
+            cfg.annotate_stack_depths()
+            self.removed += count - len(cfg.blocks)
+            self.max_stack = max(self.max_stack, cfg.max_stack)
+            template.instructions = cfg.to_instructions()
@@ -12,8 +12,23 @@ from mypl_var_table import *
 from mypl_frame import *
 from mypl_opcode import *
 from mypl_vm import *
+from mypl_overload import mangle, signature
 
 
+# (operand type, operator) -> type-specialized instruction
+TYPED_OPS = {
+    ('int', TokenType.PLUS): ADDI, ('double', TokenType.PLUS): ADDD,
+    ('string', TokenType.PLUS): CONCAT,
+    ('int', TokenType.MINUS): SUBI, ('double', TokenType.MINUS): SUBD,
+    ('int', TokenType.TIMES): MULI, ('double', TokenType.TIMES): MULD,
+    ('int', TokenType.DIVIDE): DIVI, ('double', TokenType.DIVIDE): DIVD,
+    ('int', TokenType.LESS): CMPLTI, ('int', TokenType.LESS_EQ): CMPLEI,
+    ('int', TokenType.GREATER): CMPLTI, ('int', TokenType.GREATER_EQ): CMPLEI,
+}
+
+# built-in functions whose instructions push no value
+VOID_BUILT_INS = ['print', 'fwrite', 'fclose']
+
 class CodeGenerator(Visitor):
 
     def __init__(self, vm):
@@ -35,6 +50,60 @@ class CodeGenerator(Visitor):
         """Helper function to add an instruction to the current template."""
         self.curr_template.instructions.append(instr)
 
+    def gen_stmt(self, stmt):
+        """Helper function to generate code for a statement. The value of a
+        call used as a statement is popped so it doesn't build up on the
+        operand stack.
+
+        """
+        stmt.accept(self)
+        if (isinstance(stmt, CallExpr) and stmt.fun_name.lexeme not in VOID_BUILT_INS):
+            self.add_instr(POP())
+
+    def typed_op(self, expr):
+        """Helper function returning the type-specialized instruction for
+        an expression's operator, or None if the checker couldn't give
+        both operands the same (non-array) type.
+
+        """
+        op_type = expr.op_type
+        if (op_type is None or op_type.is_array):
+            return None
+        make = TYPED_OPS.get((op_type.type_name.lexeme, expr.op.token_type))
+        return make() if make else None
+
+    def short_circuit(self, expr):
+        """Helper function to generate an and/or expression (without its
+        not) that skips the right operand when the left operand decides
+        the result: the left value is kept if it is false (and) or true
+        (or), otherwise it is popped and the right operand evaluated.
+
+        """
+        expr.first.accept(self)
+        self.add_instr(DUP())
+        if (expr.op.token_type == TokenType.OR):
+            self.add_instr(NOT())
+        jmp_index = len(self.curr_template.instructions)
+        self.add_instr(JMPF(-1))
+        self.add_instr(POP())
+        expr.rest.accept(self)
+        self.add_instr(NOP())
+        self.curr_template.instructions[jmp_index] = JMPF(len(self.curr_template.instructions) - 1)
+
+    def tail_call(self, expr):
+        """Helper function that returns the user-defined function call an
+        expression consists of (possibly in parentheses), or None.
+
+        """
+        while (not expr.op and not expr.not_op):
+            if (isinstance(expr.first, ComplexTerm)):
+                expr = expr.first.expr
+            elif (isinstance(expr.first.rvalue, CallExpr) and expr.first.rvalue.target):
+                return expr.first.rvalue
+            else:
+                return None
+        return None
+
     def visit_program(self, program):
         for struct_def in program.struct_defs:
             struct_def.accept(self)
@@ -46,17 +115,18 @@ class CodeGenerator(Visitor):
         self.struct_defs[struct_def.struct_name.lexeme] = struct_def
 
     def visit_fun_def(self, fun_def):
-        self.curr_template = VMFrameTemplate(fun_def.fun_name.lexeme, len(fun_def.params), [])
+        name = mangle(fun_def.fun_name.lexeme, signature(fun_def.params))
+        self.curr_template = VMFrameTemplate(name, len(fun_def.params), [])
+        self.curr_template.pure = fun_def.pure
         return_stmts = []
         self.var_table.push_environment()
+        # the VM passes arguments directly into the first variables
         for param in fun_def.params:
-            self.curr_template.function_name += ("_" + param.data_type.type_name.lexeme)
             self.var_table.add(param.var_name.lexeme)
-            self.add_instr(STORE(self.var_table.get(param.var_name.lexeme)))
         last_stmt = None
         if (fun_def.stmts):
             for stmt in fun_def.stmts:
-                stmt.accept(self)
+                self.gen_stmt(stmt)
                 last_stmt = stmt
         if (not(last_stmt and isinstance(last_stmt, ReturnStmt))):
             self.add_instr(PUSH(None))
@@ -68,6 +138,13 @@ class CodeGenerator(Visitor):
         self.vm.add_frame_template(self.curr_template)
 
     def visit_return_stmt(self, return_stmt):
+        call_expr = self.tail_call(return_stmt.expr)
+        if (call_expr):
+            # the callee's return value is returned directly to our caller
+            for arg in call_expr.args:
+                arg.accept(self)
+            self.add_instr(TAILCALL(call_expr.target))
+            return
         return_stmt.expr.accept(self)
         self.add_instr(RET())
 
@@ -85,14 +162,15 @@ class CodeGenerator(Visitor):
                 self.add_instr(LOAD(self.var_table.get(assign_stmt.lvalue[0].var_name.lexeme)))
                 assign_stmt.lvalue[0].array_expr.accept(self)
                 assign_stmt.expr.accept(self)
-                self.add_instr(SETI())
+                self.add_instr(SETIU() if assign_stmt.lvalue[0].unchecked else SETI())
             else:
                 assign_stmt.expr.accept(self)
                 self.add_instr(STORE(self.var_table.get(assign_stmt.lvalue[0].var_name.lexeme)))
         else:
             self.add_instr(LOAD(self.var_table.get(assign_stmt.lvalue[0].var_name.lexeme)))
-            if (self.var_table.get(assign_stmt.lvalue[0].array_expr)):
+            if (assign_stmt.lvalue[0].array_expr):
                 assign_stmt.lvalue[0].array_expr.accept(self)
+                self.add_instr(GETIU() if assign_stmt.lvalue[0].unchecked else GETI())
             if (len(assign_stmt.lvalue) > 2):
                 for value in assign_stmt.lvalue[1:-1]:
                     self.add_instr(GETF(value.var_name.lexeme))
@@ -101,10 +179,8 @@ class CodeGenerator(Visitor):
                         self.add_instr(GETI())
             last_value = assign_stmt.lvalue[len(assign_stmt.lvalue) - 1]
             if (last_value.array_expr):
-                if (self.var_table.get(last_value.var_name.lexeme)):
-                    self.add_instr(LOAD(self.var_table.get(last_value.var_name.lexeme)))
-                else:
-                    self.add_instr(GETF(last_value.var_name.lexeme))
+                # the last reference is a field (even if a variable shares its name)
+                self.add_instr(GETF(last_value.var_name.lexeme))
                 last_value.array_expr.accept(self)
                 assign_stmt.expr.accept(self)
                 self.add_instr(SETI())
@@ -119,7 +195,7 @@ class CodeGenerator(Visitor):
         self.add_instr(JMPF(-1))
         self.var_table.push_environment()
         for stmt in while_stmt.stmts:
-            stmt.accept(self)
+            self.gen_stmt(stmt)
         self.var_table.pop_environment()
         self.add_instr(JMP(jmp_index))
         self.add_instr(NOP())
@@ -134,7 +210,7 @@ class CodeGenerator(Visitor):
         self.add_instr(JMPF(-1))
         self.var_table.push_environment()
         for stmt in for_stmt.stmts:
-            stmt.accept(self)
+            self.gen_stmt(stmt)
         self.var_table.pop_environment()
         for_stmt.assign_stmt.accept(self)
         self.var_table.pop_environment()
@@ -148,7 +224,7 @@ class CodeGenerator(Visitor):
         self.add_instr(JMPF(-1))
         self.var_table.push_environment()
         for stmt in if_stmt.if_part.stmts:
-            stmt.accept(self)
+            self.gen_stmt(stmt)
         self.var_table.pop_environment()
         jump_end_indexes = []
         jump_end_indexes.append(len(self.curr_template.instructions))
@@ -162,7 +238,7 @@ class CodeGenerator(Visitor):
                 self.add_instr(JMPF(-1))
                 self.var_table.push_environment()
                 for stmt in basic_if.stmts:
-                    stmt.accept(self)
+                    self.gen_stmt(stmt)
                 self.var_table.pop_environment()
                 jump_end_indexes.append(len(self.curr_template.instructions))
                 self.add_instr(JMP(-1))
@@ -172,7 +248,7 @@ class CodeGenerator(Visitor):
             self.curr_template.instructions[if_jmp_index] = JMPF(len(self.curr_template.instructions) - 1)
             self.var_table.push_environment()
             for stmt in if_stmt.else_stmts:
-                stmt.accept(self)
+                self.gen_stmt(stmt)
             self.var_table.pop_environment()
             self.add_instr(NOP())
         else:
@@ -184,7 +260,8 @@ class CodeGenerator(Visitor):
     def visit_call_expr(self, call_expr):
         for arg in call_expr.args:
             arg.accept(self)
-        if (not call_expr.args):
+        # print() prints null
+        if (not call_expr.args and call_expr.fun_name.lexeme == 'print'):
             self.add_instr(PUSH(None))
         match (call_expr.fun_name.lexeme):
             case "print":
@@ -192,6 +269,18 @@ class CodeGenerator(Visitor):
                 return
             case "input":
                 self.add_instr(READ())
+            case "input_all":
+                self.add_instr(READALL())
+            case "input_lines":
+                self.add_instr(READN())
+            case "fopen":
+                self.add_instr(FOPEN())
+            case "freadline":
+                self.add_instr(FREAD())
+            case "fwrite":
+                self.add_instr(FWRITE())
+            case "fclose":
+                self.add_instr(FCLOSE())
             case "itos":
                 self.add_instr(TOSTR())
             case "itod":
@@ -209,22 +298,23 @@ class CodeGenerator(Visitor):
             case "get":
                 self.add_instr(GETC())
             case _:
-                call_arg_types = ""
-                for type in call_expr.arg_types:
-                    call_arg_types += ("_" + type)
-                call_name = call_expr.fun_name.lexeme + call_arg_types
-                self.add_instr(CALL(call_name))
+                self.add_instr(CALL(call_expr.target))
 
 
     def visit_expr(self, expr):
-        if (expr.op and (expr.op.token_type == TokenType.GREATER or expr.op.token_type == TokenType.GREATER_EQ)):
+        if (expr.op and expr.op.token_type in [TokenType.AND, TokenType.OR]):
+            self.short_circuit(expr)
+        elif (expr.op and (expr.op.token_type == TokenType.GREATER or expr.op.token_type == TokenType.GREATER_EQ)):
             expr.rest.accept(self)
             expr.first.accept(self)
         else:
             expr.first.accept(self)
             if (expr.rest):
                 expr.rest.accept(self)
-        if (expr.op):
+        typed = self.typed_op(expr) if expr.op else None
+        if (typed):
+            self.add_instr(typed)
+        elif (expr.op):
             match (expr.op.token_type):
                 case TokenType.PLUS:
                     self.add_instr(ADD())
@@ -234,10 +324,6 @@ class CodeGenerator(Visitor):
                     self.add_instr(MUL())
                 case TokenType.DIVIDE:
                     self.add_instr(DIV())
-                case TokenType.AND:
-                    self.add_instr(AND())
-                case TokenType.OR:
-                    self.add_instr(OR())
                 case TokenType.EQUAL:
                     self.add_instr(CMPEQ())
                 case TokenType.LESS:
@@ -305,9 +391,8 @@ class CodeGenerator(Visitor):
         self.add_instr(LOAD(index))
         if (var_rvalue.path[0].array_expr):
             var_rvalue.path[0].array_expr.accept(self)
-            self.add_instr(GETI())
+            self.add_instr(GETIU() if var_rvalue.path[0].unchecked else GETI())
         for path in var_rvalue.path[1:]:
-            self.add_instr(DUP())
             self.add_instr(GETF(path.var_name.lexeme))
             if (path.array_expr):
                 path.array_expr.accept(self)
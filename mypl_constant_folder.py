@@ -0,0 +1,256 @@
+"""Constant folding visitor for MyPL expressions.
+
+Runs after semantic checking and before code generation. Arithmetic,
+comparisons, string concatenation, and/or, and not over literal
+operands are evaluated at compile time using the VM's semantics, and
+the folded expression is rewritten in place to a single literal. An
+and/or with a literal left operand folds to the literal when it decides
+the result (since the right operand is skipped), or else to its right
+operand. An operation that would raise a VM error at runtime (e.g.,
+division by zero or arithmetic on null) is left unfolded so the error
+still occurs when (and if) the code runs.
+
+NAME: Jake VanZyverden
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+from mypl_token import Token, TokenType
+from mypl_ast import *
+
+
+# sentinel for expressions that do not have a compile-time value
+NOT_CONSTANT = object()
+
+
+class ConstantFolder(Visitor):
+
+    def __init__(self):
+        """Creates a constant folder."""
+        # number of expressions folded
+        self.folded = 0
+
+    def summary(self):
+        """Returns a short description of what the pass did."""
+        return f'{self.folded} expression(s) folded'
+
+    # Helper functions
+
+    def literal_value(self, simple_rvalue):
+        """Returns the runtime value of a literal, as pushed by the code
+        generator.
+
+        """
+        token = simple_rvalue.value
+        match token.token_type:
+            case TokenType.INT_VAL:
+                return int(token.lexeme)
+            case TokenType.DOUBLE_VAL:
+                return float(token.lexeme)
+            case TokenType.STRING_VAL:
+                if '\\' in token.lexeme:
+                    # escapes are left to the code generator
+                    return NOT_CONSTANT
+                return token.lexeme
+            case TokenType.BOOL_VAL:
+                return token.lexeme == 'true'
+            case TokenType.NULL_VAL:
+                return None
+        return NOT_CONSTANT
+
+    def term_value(self, term):
+        """Returns the value of an expression term, or NOT_CONSTANT."""
+        if isinstance(term, ComplexTerm):
+            return self.expr_value(term.expr)
+        if isinstance(term.rvalue, SimpleRValue):
+            return self.literal_value(term.rvalue)
+        return NOT_CONSTANT
+
+    def expr_value(self, expr):
+        """Returns the value of an already folded expression, or
+        NOT_CONSTANT.
+
+        """
+        if expr.op or expr.not_op:
+            return NOT_CONSTANT
+        return self.term_value(expr.first)
+
+    def evaluate(self, op, y, x):
+        """Returns the value of y op x as computed by the VM, or
+        NOT_CONSTANT if the VM would report an error (or the operand
+        types are not ones the VM defines the operation for).
+
+        """
+        if op.token_type in [TokenType.EQUAL, TokenType.NOT_EQUAL]:
+            return (y == x) == (op.token_type == TokenType.EQUAL)
+        if x is None or y is None or type(x) != type(y):
+            return NOT_CONSTANT
+        if op.token_type in [TokenType.AND, TokenType.OR]:
+            if type(x) != bool:
+                return NOT_CONSTANT
+            return (y and x) if op.token_type == TokenType.AND else (y or x)
+        if type(x) == bool:
+            return NOT_CONSTANT
+        match op.token_type:
+            case TokenType.PLUS:
+                return y + x
+            case TokenType.LESS:
+                return y < x
+            case TokenType.LESS_EQ:
+                return y <= x
+            case TokenType.GREATER:
+                return y > x
+            case TokenType.GREATER_EQ:
+                return y >= x
+        if type(x) == str:
+            return NOT_CONSTANT
+        match op.token_type:
+            case TokenType.MINUS:
+                return y - x
+            case TokenType.TIMES:
+                return y * x
+            case TokenType.DIVIDE:
+                if int(x) == 0:
+                    return NOT_CONSTANT
+                return y / x if type(x) == float else y // x
+        return NOT_CONSTANT
+
+    def literal_token(self, value, token):
+        """Returns a literal token for the value (positioned at the given
+        token).
+
+        """
+        if value is None:
+            return Token(TokenType.NULL_VAL, 'null', token.line, token.column)
+        if type(value) == bool:
+            lexeme = 'true' if value else 'false'
+            return Token(TokenType.BOOL_VAL, lexeme, token.line, token.column)
+        if type(value) == int:
+            return Token(TokenType.INT_VAL, str(value), token.line, token.column)
+        if type(value) == float:
+            return Token(TokenType.DOUBLE_VAL, repr(value), token.line, token.column)
+        return Token(TokenType.STRING_VAL, value, token.line, token.column)
+
+    def fold_stmts(self, stmts):
+        """Folds the expressions of each statement in the list."""
+        for stmt in stmts:
+            stmt.accept(self)
+
+    # Visitor functions
+
+    def visit_program(self, program):
+        for fun_def in program.fun_defs:
+            fun_def.accept(self)
+
+    def visit_fun_def(self, fun_def):
+        self.fold_stmts(fun_def.stmts)
+
+    def visit_return_stmt(self, return_stmt):
+        return_stmt.expr.accept(self)
+
+    def visit_var_decl(self, var_decl):
+        if var_decl.expr:
+            var_decl.expr.accept(self)
+
+    def visit_assign_stmt(self, assign_stmt):
+        for var_ref in assign_stmt.lvalue:
+            if var_ref.array_expr:
+                var_ref.array_expr.accept(self)
+        assign_stmt.expr.accept(self)
+
+    def visit_while_stmt(self, while_stmt):
+        while_stmt.condition.accept(self)
+        self.fold_stmts(while_stmt.stmts)
+
+    def visit_for_stmt(self, for_stmt):
+        for_stmt.var_decl.accept(self)
+        for_stmt.condition.accept(self)
+        for_stmt.assign_stmt.accept(self)
+        self.fold_stmts(for_stmt.stmts)
+
+    def visit_if_stmt(self, if_stmt):
+        for basic_if in [if_stmt.if_part] + if_stmt.else_ifs:
+            basic_if.condition.accept(self)
+            self.fold_stmts(basic_if.stmts)
+        self.fold_stmts(if_stmt.else_stmts)
+
+    def visit_call_expr(self, call_expr):
+        for arg in call_expr.args:
+            arg.accept(self)
+
+    def visit_expr(self, expr):
+        expr.first.accept(self)
+        if expr.rest:
+            expr.rest.accept(self)
+        value = self.term_value(expr.first)
+        if value is NOT_CONSTANT:
+            return
+        token = expr.op
+        if expr.op:
+            rest_value = self.expr_value(expr.rest)
+            if (rest_value is NOT_CONSTANT and type(value) == bool and
+                    expr.op.token_type in [TokenType.AND, TokenType.OR]):
+                self.fold_short_circuit(expr, value)
+                return
+            if rest_value is NOT_CONSTANT:
+                return
+            value = self.evaluate(expr.op, value, rest_value)
+            if value is NOT_CONSTANT:
+                return
+        elif isinstance(expr.first, SimpleTerm) and not expr.not_op:
+            # already a literal
+            return
+        if expr.not_op:
+            if type(value) != bool:
+                return
+            value = not value
+        if token is None:
+            token = self.first_token(expr.first)
+        expr.not_op = False
+        expr.first = SimpleTerm(SimpleRValue(self.literal_token(value, token)))
+        expr.op = None
+        expr.rest = None
+        self.folded += 1
+
+    def fold_short_circuit(self, expr, value):
+        """Folds an and/or whose left operand is a boolean literal: the
+        result is the literal if it decides the expression (false and,
+        true or), otherwise the right operand.
+
+        """
+        decided = value == (expr.op.token_type == TokenType.OR)
+        if decided:
+            if expr.not_op:
+                value = not value
+                expr.not_op = False
+            token = self.literal_token(value, expr.op)
+            expr.first = SimpleTerm(SimpleRValue(token))
+        else:
+            expr.first = ComplexTerm(expr.rest)
+        expr.op = None
+        expr.rest = None
+        self.folded += 1
+
+    def first_token(self, term):
+        """Returns the literal token a constant term starts with."""
+        while isinstance(term, ComplexTerm):
+            term = term.expr.first
+        return term.rvalue.value
+
+    def visit_simple_term(self, simple_term):
+        simple_term.rvalue.accept(self)
+
+    def visit_complex_term(self, complex_term):
+        complex_term.expr.accept(self)
+
+    def visit_new_rvalue(self, new_rvalue):
+        if new_rvalue.array_expr:
+            new_rvalue.array_expr.accept(self)
+        for param in new_rvalue.struct_params or []:
+            param.accept(self)
+
+    def visit_var_rvalue(self, var_rvalue):
+        for var_ref in var_rvalue.path:
+            if var_ref.array_expr:
+                var_ref.array_expr.accept(self)
@@ -0,0 +1,281 @@
+"""Common-subexpression elimination (CSE) of MyPL variable path loads.
+
+Runs after semantic checking and before code generation. Within each
+statement list, a path prefix (e.g., node.next in node.next.value and
+node.next.next, or grid[i].cells in grid[i].cells[j]) loaded by more
+than one statement or expression is loaded once into a temporary
+variable ($cse0, $cse1, ...), declared just before the first statement
+using it, and the later loads read the temporary instead.
+
+A loaded prefix stays available until a statement may change it: an
+assignment to one of the variables it reads, a write to one of its
+fields (or, for indexed loads, to any array element), or a user
+function call. Statements that call user functions or read input, and
+loop statements, don't share their loads. Only prefixes whose reuse
+saves instructions get a temporary.
+
+NAME: Jake VanZyverden
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+from dataclasses import dataclass, field
+from mypl_token import Token, TokenType
+from mypl_ast import *
+from mypl_effects import TypeScopes, effects, reads, short_circuits, path_key
+
+
+@dataclass
+class Occurrence:
+    """A variable path (rvalue or assignment lvalue) whose loads may be
+    shared.
+
+    """
+    path: list
+    # number of leading references loaded in full
+    full: int
+    # True if the reference after the full ones is loaded without its
+    # index (an indexed assignment target)
+    split_after: bool = False
+    # the chosen (record, j, split) to rewrite the path with
+    choice: tuple = None
+
+
+@dataclass
+class Available:
+    """A path prefix loaded by one or more occurrences."""
+    refs: list
+    # index of the first statement loading the prefix
+    stmt: int
+    reads: object
+    # (occurrence, j, split) for each occurrence loading the prefix
+    occurrences: list = field(default_factory=list)
+    # the temporary holding the prefix (or None) and the occurrences
+    # rewritten to use it
+    temp: Token = None
+    chosen: list = field(default_factory=list)
+
+    @property
+    def cost(self):
+        """Returns the cost of loading the prefix (a GETF or GETI counts
+        as two instructions).
+
+        """
+        indexes = sum(1 for ref in self.refs if ref.array_expr)
+        return 1 + 2 * (len(self.refs) - 1) + 2 * indexes
+
+
+def prefix_refs(path, j, split):
+    """Returns the first j references of the path (without the j-th
+    reference's index if split).
+
+    """
+    if split:
+        return path[:j - 1] + [VarRef(path[j - 1].var_name, None)]
+    return path[:j]
+
+
+class PathEliminator(Visitor):
+
+    def __init__(self):
+        """Creates a path load CSE pass."""
+        # variable types (set per program)
+        self.types = None
+        # number of temporaries created
+        self.temps = 0
+        # number of path loads replaced by a temporary
+        self.replaced = 0
+
+    def summary(self):
+        """Returns a short description of what the pass did."""
+        return f'{self.replaced} path load(s) shared via {self.temps} temporaries'
+
+    # Helper functions
+
+    def occurrences(self, stmt):
+        """Returns the path occurrences a statement loads before it
+        writes anything (or none if it can't share loads).
+
+        """
+        if isinstance(stmt, VarDecl):
+            exprs = [stmt.expr] if stmt.expr else []
+        elif isinstance(stmt, AssignStmt):
+            exprs = [stmt.expr]
+        elif isinstance(stmt, ReturnStmt):
+            exprs = [stmt.expr]
+        elif isinstance(stmt, CallExpr):
+            exprs = stmt.args
+        elif isinstance(stmt, IfStmt):
+            exprs = [stmt.if_part.condition]
+        else:
+            return []
+        found = effects(*exprs)
+        is_print = isinstance(stmt, CallExpr) and stmt.fun_name.lexeme == 'print'
+        if found.calls or (found.io and not is_print):
+            return []
+        result = []
+        if isinstance(stmt, AssignStmt) and len(stmt.lvalue) > 1:
+            lvalue = stmt.lvalue
+            split_after = lvalue[-1].array_expr is not None
+            result.append(Occurrence(lvalue, len(lvalue) - 1, split_after))
+        for expr in exprs:
+            self.collect(expr, result)
+        return result
+
+    def collect(self, node, result):
+        """Adds the variable paths in an expression to result (paths
+        inside array indexes, and in the right operand of and/or, which
+        may be skipped, are left alone).
+
+        """
+        if isinstance(node, Expr):
+            self.collect(node.first, result)
+            if node.rest and not short_circuits(node):
+                self.collect(node.rest, result)
+        elif isinstance(node, SimpleTerm):
+            self.collect(node.rvalue, result)
+        elif isinstance(node, ComplexTerm):
+            self.collect(node.expr, result)
+        elif isinstance(node, CallExpr):
+            for arg in node.args:
+                self.collect(arg, result)
+        elif isinstance(node, NewRValue):
+            if node.array_expr:
+                self.collect(node.array_expr, result)
+            for param in node.struct_params or []:
+                self.collect(param, result)
+        elif isinstance(node, VarRValue):
+            result.append(Occurrence(node.path, len(node.path)))
+
+    def prefixes(self, occurrence):
+        """Returns the (j, split) prefixes of an occurrence that load more
+        than a single variable.
+
+        """
+        path = occurrence.path
+        result = []
+        for j in range(1, occurrence.full + 1):
+            if path[j - 1].array_expr:
+                result.append((j, True))
+            result.append((j, False))
+        if occurrence.split_after:
+            result.append((occurrence.full + 1, True))
+        return [(j, split) for j, split in result
+                if len(prefix_refs(path, j, split)) > 1 or
+                (j == 1 and not split and path[0].array_expr)]
+
+    def eliminate(self, stmts):
+        """Shares path loads between the statements of a list (rewritten
+        in place).
+
+        """
+        records = []
+        live = {}
+        for index, stmt in enumerate(stmts):
+            for occurrence in self.occurrences(stmt):
+                for j, split in self.prefixes(occurrence):
+                    refs = prefix_refs(occurrence.path, j, split)
+                    key = path_key(refs)
+                    if key not in live:
+                        live[key] = Available(refs, index, reads(VarRValue(refs)))
+                        records.append(live[key])
+                    live[key].occurrences.append((occurrence, j, split))
+            found = effects(stmt)
+            for key, record in list(live.items()):
+                if record.reads.invalidated_by(found):
+                    del live[key]
+        # each occurrence uses its costliest prefix loaded more than once
+        for record in records:
+            if len(record.occurrences) < 2:
+                continue
+            for occurrence, j, split in record.occurrences:
+                if (occurrence.choice is None or
+                        occurrence.choice[0].cost < record.cost):
+                    occurrence.choice = (record, j, split)
+        shared = []
+        for record in records:
+            chosen = [(o, j, split) for o, j, split in record.occurrences
+                      if o.choice and o.choice[0] is record]
+            uses = len(chosen)
+            # loads saved must outweigh the temporary's STORE and LOADs
+            if uses < 2 or uses * record.cost <= record.cost + 1 + uses:
+                continue
+            data_type = self.types.path_type(record.refs)
+            if data_type is None:
+                continue
+            token = record.refs[0].var_name
+            record.temp = Token(TokenType.ID, f'$cse{self.temps}', token.line,
+                                token.column)
+            self.temps += 1
+            record.chosen = chosen
+            shared.append(record)
+        inserts = {}
+        for record in sorted(shared, key=lambda r: r.cost):
+            refs = list(record.refs)
+            # a longer prefix is loaded from a shorter one's temporary
+            first = record.occurrences[0][0]
+            shorter = [(r, j, split) for r in shared if r.cost < record.cost
+                       for o, j, split in r.occurrences if o is first]
+            if shorter:
+                r, j, split = max(shorter, key=lambda entry: entry[0].cost)
+                index = refs[j - 1].array_expr if split else None
+                refs = [VarRef(r.temp, index)] + refs[j:]
+            expr = Expr(False, SimpleTerm(VarRValue(refs)), None, None)
+            data_type = self.types.path_type(record.refs)
+            inserts.setdefault(record.stmt, []).append(
+                VarDecl(VarDef(data_type, record.temp), expr))
+        for record in shared:
+            for occurrence, j, split in record.chosen:
+                path = occurrence.path
+                index = path[j - 1].array_expr if split else None
+                path[:] = [VarRef(record.temp, index)] + path[j:]
+                self.replaced += 1
+        result = []
+        for index, stmt in enumerate(stmts):
+            result.extend(inserts.get(index, []))
+            result.append(stmt)
+        stmts[:] = result
+
+    def visit_block(self, stmts, scope=None):
+        """Eliminates common path loads in a statement list and its nested
+        statement lists.
+
+        """
+        self.types.push(scope)
+        for stmt in stmts:
+            stmt.accept(self)
+        self.eliminate(stmts)
+        self.types.pop()
+
+    def add_var(self, var_decl):
+        """Adds a declared variable's type to the current scope."""
+        var_def = var_decl.var_def
+        self.types.add(var_def.var_name.lexeme, var_def.data_type)
+
+    # Visitor functions
+
+    def visit_program(self, program):
+        self.types = TypeScopes(program)
+        for fun_def in program.fun_defs:
+            fun_def.accept(self)
+
+    def visit_fun_def(self, fun_def):
+        params = {p.var_name.lexeme: p.data_type for p in fun_def.params}
+        self.visit_block(fun_def.stmts, params)
+
+    def visit_var_decl(self, var_decl):
+        self.add_var(var_decl)
+
+    def visit_while_stmt(self, while_stmt):
+        self.visit_block(while_stmt.stmts)
+
+    def visit_for_stmt(self, for_stmt):
+        var_def = for_stmt.var_decl.var_def
+        self.visit_block(for_stmt.stmts,
+                         {var_def.var_name.lexeme: var_def.data_type})
+
+    def visit_if_stmt(self, if_stmt):
+        for basic_if in [if_stmt.if_part] + if_stmt.else_ifs:
+            self.visit_block(basic_if.stmts)
+        self.visit_block(if_stmt.else_stmts)
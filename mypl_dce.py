@@ -0,0 +1,204 @@
+"""Whole-program dead function and dead struct elimination.
+
+DefinitionEliminator runs after semantic checking and before code
+generation: it follows the (checker resolved) calls from main to find
+the reachable functions, and keeps only those and the structs they use
+(directly, or through the fields of another used struct). This saves
+generating and optimizing code for unused library functions and
+overloads.
+
+TemplatePruner does the same over the VM's frame templates after code
+generation, following CALL and TAILCALL operands, so functions that
+become unused (e.g., once all their calls are inlined) are dropped.
+
+NAME: Jake VanZyverden
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+from mypl_ast import *
+from mypl_opcode import OpCode
+from mypl_overload import mangle, signature
+
+
+def reachable(roots, edges):
+    """Returns the set of names reachable from the roots.
+
+    Args:
+        roots -- The starting names.
+        edges -- Name -> iterable of the names it uses.
+
+    """
+    seen = set(roots)
+    work = list(roots)
+    while work:
+        for name in edges.get(work.pop(), []):
+            if name not in seen:
+                seen.add(name)
+                work.append(name)
+    return seen
+
+
+class Uses(Visitor):
+
+    def __init__(self):
+        """Creates an empty summary of the functions and types a function
+        uses.
+
+        """
+        # mangled names of the user functions called
+        self.calls = set()
+        # names of the types declared, allocated, or returned
+        self.types = set()
+        # True if an array type is declared, allocated, or returned
+        self.arrays = False
+        # names of the built-in functions called
+        self.built_ins = set()
+
+    def visit_stmts(self, stmts):
+        """Visits each statement in the list."""
+        for stmt in stmts:
+            stmt.accept(self)
+
+    def add_type(self, data_type):
+        """Records a declared or returned type."""
+        self.types.add(data_type.type_name.lexeme)
+        if data_type.is_array:
+            self.arrays = True
+
+    def visit_fun_def(self, fun_def):
+        self.add_type(fun_def.return_type)
+        for param in fun_def.params:
+            self.add_type(param.data_type)
+        self.visit_stmts(fun_def.stmts)
+
+    def visit_return_stmt(self, return_stmt):
+        return_stmt.expr.accept(self)
+
+    def visit_var_decl(self, var_decl):
+        self.add_type(var_decl.var_def.data_type)
+        if var_decl.expr:
+            var_decl.expr.accept(self)
+
+    def visit_assign_stmt(self, assign_stmt):
+        self.visit_path(assign_stmt.lvalue)
+        assign_stmt.expr.accept(self)
+
+    def visit_while_stmt(self, while_stmt):
+        while_stmt.condition.accept(self)
+        self.visit_stmts(while_stmt.stmts)
+
+    def visit_for_stmt(self, for_stmt):
+        for_stmt.var_decl.accept(self)
+        for_stmt.condition.accept(self)
+        for_stmt.assign_stmt.accept(self)
+        self.visit_stmts(for_stmt.stmts)
+
+    def visit_if_stmt(self, if_stmt):
+        for basic_if in [if_stmt.if_part] + if_stmt.else_ifs:
+            basic_if.condition.accept(self)
+            self.visit_stmts(basic_if.stmts)
+        self.visit_stmts(if_stmt.else_stmts)
+
+    def visit_call_expr(self, call_expr):
+        # built-in functions have no target
+        if call_expr.target:
+            self.calls.add(call_expr.target)
+        else:
+            self.built_ins.add(call_expr.fun_name.lexeme)
+        for arg in call_expr.args:
+            arg.accept(self)
+
+    def visit_expr(self, expr):
+        expr.first.accept(self)
+        if expr.rest:
+            expr.rest.accept(self)
+
+    def visit_simple_term(self, simple_term):
+        simple_term.rvalue.accept(self)
+
+    def visit_complex_term(self, complex_term):
+        complex_term.expr.accept(self)
+
+    def visit_new_rvalue(self, new_rvalue):
+        self.types.add(new_rvalue.type_name.lexeme)
+        if new_rvalue.array_expr:
+            self.arrays = True
+            new_rvalue.array_expr.accept(self)
+        for param in new_rvalue.struct_params or []:
+            param.accept(self)
+
+    def visit_var_rvalue(self, var_rvalue):
+        self.visit_path(var_rvalue.path)
+
+    def visit_path(self, path):
+        """Visits the index expressions of a variable path."""
+        for var_ref in path:
+            if var_ref.array_expr:
+                var_ref.array_expr.accept(self)
+
+
+class DefinitionEliminator(Visitor):
+
+    def __init__(self):
+        """Creates a dead function and struct elimination pass."""
+        # number of function and struct definitions removed
+        self.functions = 0
+        self.structs = 0
+
+    def summary(self):
+        """Returns a short description of what the pass did."""
+        return (f'{self.functions} function(s) and {self.structs} struct(s) '
+                f'removed')
+
+    def visit_program(self, program):
+        funs = {mangle(f.fun_name.lexeme, signature(f.params)): f
+                for f in program.fun_defs}
+        if 'main' not in funs:
+            return
+        uses = {}
+        for name, fun_def in funs.items():
+            uses[name] = Uses()
+            fun_def.accept(uses[name])
+        live = reachable(['main'], {name: u.calls for name, u in uses.items()})
+        fun_defs = [f for name, f in funs.items() if name in live]
+        # structs used by live functions, and by the fields of used structs
+        fields = {s.struct_name.lexeme:
+                  [f.data_type.type_name.lexeme for f in s.fields]
+                  for s in program.struct_defs}
+        types = set().union(*(uses[name].types for name in live))
+        types = reachable(types, fields)
+        struct_defs = [s for s in program.struct_defs
+                       if s.struct_name.lexeme in types]
+        self.functions += len(program.fun_defs) - len(fun_defs)
+        self.structs += len(program.struct_defs) - len(struct_defs)
+        program.fun_defs = fun_defs
+        program.struct_defs = struct_defs
+
+
+class TemplatePruner:
+
+    def __init__(self):
+        """Creates a dead frame template elimination pass."""
+        # number of frame templates removed
+        self.removed = 0
+
+    def summary(self):
+        """Returns a short description of what the pass did."""
+        return f'{self.removed} function(s) removed'
+
+    def optimize(self, vm):
+        """Removes the frame templates that can't be called from main."""
+        templates = vm.frame_templates
+        if 'main' not in templates:
+            return
+        calls = {}
+        for name, template in templates.items():
+            calls[name] = [str(instr.operand) for instr in template.instructions
+                           if instr.opcode in [OpCode.CALL, OpCode.TAILCALL]]
+        live = reachable(['main'], calls)
+        for name in list(templates):
+            if name not in live:
+                del templates[name]
+                self.removed += 1
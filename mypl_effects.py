@@ -0,0 +1,295 @@
+"""Side-effect analysis helpers for MyPL AST optimization passes.
+
+An Effects visitor walks statements and expressions and records what
+they may modify: variables (assigned or declared), struct fields and
+array elements written, and whether user functions (which may write
+anything on the heap) or I/O built-ins are called. A Reads visitor
+records the variables, fields, and array elements an expression reads.
+Heap accesses are tracked by field name only, so two structs with a
+same-named field are treated as possible aliases. TypeScopes tracks
+variable types so passes can declare typed temporaries (for paths the
+checker didn't annotate).
+
+NAME: Jake VanZyverden
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+from mypl_token import TokenType
+from mypl_ast import *
+
+
+# built-in functions without side effects
+PURE_BUILT_INS = ['itos', 'itod', 'dtos', 'dtoi', 'stoi', 'stod',
+                  'length', 'get']
+
+# built-in functions that perform I/O
+IO_BUILT_INS = ['print', 'input', 'input_all', 'input_lines', 'fopen',
+                'freadline', 'fwrite', 'fclose']
+
+
+def effects(*nodes):
+    """Returns the combined Effects of the given AST nodes."""
+    visitor = Effects()
+    for node in nodes:
+        node.accept(visitor)
+    return visitor
+
+
+def side_effect_free(*nodes):
+    """Returns True if evaluating the (expression) nodes can't change
+    program state or perform I/O.
+
+    """
+    found = effects(*nodes)
+    return not (found.calls or found.io or found.fields or found.arrays)
+
+
+def short_circuits(expr):
+    """Returns True if the expression's right operand (rest) is only
+    evaluated depending on its left operand (and/or).
+
+    """
+    return expr.op is not None and expr.op.token_type in [TokenType.AND,
+                                                          TokenType.OR]
+
+
+def reads(*nodes):
+    """Returns the combined Reads of the given AST nodes."""
+    visitor = Reads()
+    for node in nodes:
+        node.accept(visitor)
+    return visitor
+
+
+def node_key(node):
+    """Returns a hashable key identifying an expression's structure (two
+    nodes with the same key compute the same value in the same state).
+
+    """
+    if node is None:
+        return None
+    if isinstance(node, Expr):
+        op = node.op.lexeme if node.op else None
+        return ('expr', node.not_op, node_key(node.first), op,
+                node_key(node.rest))
+    if isinstance(node, SimpleTerm):
+        return node_key(node.rvalue)
+    if isinstance(node, ComplexTerm):
+        return ('()', node_key(node.expr))
+    if isinstance(node, SimpleRValue):
+        return (node.value.token_type, node.value.lexeme)
+    if isinstance(node, VarRValue):
+        return ('path',) + path_key(node.path)
+    if isinstance(node, CallExpr):
+        name = node.target or node.fun_name.lexeme
+        return ('call', name) + tuple(node_key(arg) for arg in node.args)
+    # each allocation is distinct
+    return ('new', id(node))
+
+
+def path_key(path):
+    """Returns a hashable key for a list of variable references."""
+    return tuple((ref.var_name.lexeme, node_key(ref.array_expr))
+                 for ref in path)
+
+
+class Effects(Visitor):
+
+    def __init__(self):
+        """Creates an empty effects summary."""
+        # variable names assigned or declared
+        self.variables = set()
+        # struct field names written
+        self.fields = set()
+        # True if any array element is written
+        self.arrays = False
+        # True if a user-defined function is called
+        self.calls = False
+        # True if an I/O built-in is called
+        self.io = False
+
+    def visit_stmts(self, stmts):
+        """Visits each statement in the list."""
+        for stmt in stmts:
+            stmt.accept(self)
+
+    def visit_fun_def(self, fun_def):
+        self.visit_stmts(fun_def.stmts)
+
+    def visit_return_stmt(self, return_stmt):
+        return_stmt.expr.accept(self)
+
+    def visit_var_decl(self, var_decl):
+        self.variables.add(var_decl.var_def.var_name.lexeme)
+        if var_decl.expr:
+            var_decl.expr.accept(self)
+
+    def visit_assign_stmt(self, assign_stmt):
+        lvalue = assign_stmt.lvalue
+        for var_ref in lvalue:
+            if var_ref.array_expr:
+                var_ref.array_expr.accept(self)
+        last = lvalue[-1]
+        if last.array_expr:
+            self.arrays = True
+        elif len(lvalue) > 1:
+            self.fields.add(last.var_name.lexeme)
+        else:
+            self.variables.add(last.var_name.lexeme)
+        assign_stmt.expr.accept(self)
+
+    def visit_while_stmt(self, while_stmt):
+        while_stmt.condition.accept(self)
+        self.visit_stmts(while_stmt.stmts)
+
+    def visit_for_stmt(self, for_stmt):
+        for_stmt.var_decl.accept(self)
+        for_stmt.condition.accept(self)
+        for_stmt.assign_stmt.accept(self)
+        self.visit_stmts(for_stmt.stmts)
+
+    def visit_if_stmt(self, if_stmt):
+        for basic_if in [if_stmt.if_part] + if_stmt.else_ifs:
+            basic_if.condition.accept(self)
+            self.visit_stmts(basic_if.stmts)
+        self.visit_stmts(if_stmt.else_stmts)
+
+    def visit_call_expr(self, call_expr):
+        name = call_expr.fun_name.lexeme
+        if name in IO_BUILT_INS:
+            self.io = True
+        elif name not in PURE_BUILT_INS:
+            self.calls = True
+        for arg in call_expr.args:
+            arg.accept(self)
+
+    def visit_expr(self, expr):
+        expr.first.accept(self)
+        if expr.rest:
+            expr.rest.accept(self)
+
+    def visit_simple_term(self, simple_term):
+        simple_term.rvalue.accept(self)
+
+    def visit_complex_term(self, complex_term):
+        complex_term.expr.accept(self)
+
+    def visit_new_rvalue(self, new_rvalue):
+        if new_rvalue.array_expr:
+            new_rvalue.array_expr.accept(self)
+        for param in new_rvalue.struct_params or []:
+            param.accept(self)
+
+    def visit_var_rvalue(self, var_rvalue):
+        for var_ref in var_rvalue.path:
+            if var_ref.array_expr:
+                var_ref.array_expr.accept(self)
+
+
+class Reads(Visitor):
+
+    def __init__(self):
+        """Creates an empty summary of the state an expression reads."""
+        # variable names read
+        self.variables = set()
+        # struct field names read
+        self.fields = set()
+        # True if any array element is read
+        self.arrays = False
+
+    def invalidated_by(self, found):
+        """Returns True if the given Effects may change a value read."""
+        return bool(found.calls or found.variables & self.variables or
+                    found.fields & self.fields or
+                    (found.arrays and self.arrays))
+
+    def visit_call_expr(self, call_expr):
+        for arg in call_expr.args:
+            arg.accept(self)
+
+    def visit_expr(self, expr):
+        expr.first.accept(self)
+        if expr.rest:
+            expr.rest.accept(self)
+
+    def visit_simple_term(self, simple_term):
+        simple_term.rvalue.accept(self)
+
+    def visit_complex_term(self, complex_term):
+        complex_term.expr.accept(self)
+
+    def visit_new_rvalue(self, new_rvalue):
+        if new_rvalue.array_expr:
+            new_rvalue.array_expr.accept(self)
+        for param in new_rvalue.struct_params or []:
+            param.accept(self)
+
+    def visit_var_rvalue(self, var_rvalue):
+        self.variables.add(var_rvalue.path[0].var_name.lexeme)
+        for i, var_ref in enumerate(var_rvalue.path):
+            if i > 0:
+                self.fields.add(var_ref.var_name.lexeme)
+            if var_ref.array_expr:
+                self.arrays = True
+                var_ref.array_expr.accept(self)
+
+
+class TypeScopes:
+
+    def __init__(self, program):
+        """Creates an empty scope stack for the program's functions.
+
+        Args:
+            program -- The (checked) Program, for its struct fields.
+
+        """
+        # struct name -> {field name -> DataType}
+        self.structs = {}
+        for struct_def in program.struct_defs:
+            self.structs[struct_def.struct_name.lexeme] = {
+                field.var_name.lexeme: field.data_type
+                for field in struct_def.fields}
+        # variable name -> DataType, one dictionary per scope
+        self.scopes = []
+
+    def push(self, scope=None):
+        """Adds a new scope with the given variable -> DataType entries."""
+        self.scopes.append(dict(scope or {}))
+
+    def pop(self):
+        """Removes the innermost scope."""
+        self.scopes.pop()
+
+    def add(self, name, data_type):
+        """Adds a variable to the innermost scope."""
+        self.scopes[-1][name] = data_type
+
+    def var_type(self, name):
+        """Returns the DataType of the innermost variable with the name."""
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        return None
+
+    def path_type(self, path):
+        """Returns the DataType of a variable path (or None). The type
+        the checker recorded on the path's last reference is used if it
+        has one (references created by passes don't).
+
+        """
+        if path[-1].type is not None:
+            return path[-1].type
+        data_type = self.var_type(path[0].var_name.lexeme)
+        for i, var_ref in enumerate(path):
+            if data_type is None:
+                return None
+            if i > 0:
+                fields = self.structs.get(data_type.type_name.lexeme, {})
+                data_type = fields.get(var_ref.var_name.lexeme)
+                if data_type is None:
+                    return None
+            if var_ref.array_expr:
+                data_type = DataType(False, data_type.type_name)
+        return data_type
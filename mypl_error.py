@@ -64,6 +64,11 @@ def VMError(message):
     return MyPLError('VM Error: ' + message)        
 
 
+def AssemblerError(message):
+    """Create a MyPLError for an assembler (textual IR) exception.
+    
+    Args:
+        message -- The error message.
 
-
-
+    """
+    return MyPLError('Assembler Error: ' + message)
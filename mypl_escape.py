@@ -0,0 +1,203 @@
+"""Escape analysis and scalar replacement of MyPL structs.
+
+Runs after semantic checking and before code generation. A struct
+variable declared with a new struct (e.g., T t = new T(5, x)) doesn't
+escape if the rest of its scope only reads and writes its fields
+(t.x, t.x = 3, t.ys[i]): it is never reassigned, passed, returned,
+stored, or compared as a whole. Such a struct is never allocated;
+each field becomes a local variable ($sr0, $sr1, ...) initialized
+with its constructor argument, so its GETFs and SETFs become plain
+LOADs and STOREs and no heap object is created.
+
+NAME: Jake VanZyverden
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+from mypl_token import Token, TokenType
+from mypl_ast import *
+
+
+class StructUses(Visitor):
+
+    def __init__(self, name):
+        """Creates an empty summary of a struct variable's uses.
+
+        Args:
+            name -- The struct variable's name.
+
+        """
+        self.name = name
+        # field access paths starting at the variable
+        self.paths = []
+        # True if the variable is used other than through its fields (or
+        # redeclared, which makes its uses ambiguous)
+        self.escapes = False
+
+    def use(self, path):
+        """Records a variable path that may start at the variable."""
+        if path[0].var_name.lexeme == self.name:
+            if len(path) == 1 or path[0].array_expr:
+                self.escapes = True
+            else:
+                self.paths.append(path)
+        for var_ref in path:
+            if var_ref.array_expr:
+                var_ref.array_expr.accept(self)
+
+    def visit_stmts(self, stmts):
+        """Visits each statement in the list."""
+        for stmt in stmts:
+            stmt.accept(self)
+
+    def visit_return_stmt(self, return_stmt):
+        return_stmt.expr.accept(self)
+
+    def visit_var_decl(self, var_decl):
+        if var_decl.var_def.var_name.lexeme == self.name:
+            self.escapes = True
+        if var_decl.expr:
+            var_decl.expr.accept(self)
+
+    def visit_assign_stmt(self, assign_stmt):
+        self.use(assign_stmt.lvalue)
+        assign_stmt.expr.accept(self)
+
+    def visit_while_stmt(self, while_stmt):
+        while_stmt.condition.accept(self)
+        self.visit_stmts(while_stmt.stmts)
+
+    def visit_for_stmt(self, for_stmt):
+        for_stmt.var_decl.accept(self)
+        for_stmt.condition.accept(self)
+        for_stmt.assign_stmt.accept(self)
+        self.visit_stmts(for_stmt.stmts)
+
+    def visit_if_stmt(self, if_stmt):
+        for basic_if in [if_stmt.if_part] + if_stmt.else_ifs:
+            basic_if.condition.accept(self)
+            self.visit_stmts(basic_if.stmts)
+        self.visit_stmts(if_stmt.else_stmts)
+
+    def visit_call_expr(self, call_expr):
+        for arg in call_expr.args:
+            arg.accept(self)
+
+    def visit_expr(self, expr):
+        expr.first.accept(self)
+        if expr.rest:
+            expr.rest.accept(self)
+
+    def visit_simple_term(self, simple_term):
+        simple_term.rvalue.accept(self)
+
+    def visit_complex_term(self, complex_term):
+        complex_term.expr.accept(self)
+
+    def visit_new_rvalue(self, new_rvalue):
+        if new_rvalue.array_expr:
+            new_rvalue.array_expr.accept(self)
+        for param in new_rvalue.struct_params or []:
+            param.accept(self)
+
+    def visit_var_rvalue(self, var_rvalue):
+        self.use(var_rvalue.path)
+
+
+class ScalarReplacer(Visitor):
+
+    def __init__(self):
+        """Creates a scalar replacement pass."""
+        # struct name -> StructDef
+        self.struct_defs = {}
+        # number of structs replaced and of locals created for them
+        self.replaced = 0
+        self.scalars = 0
+
+    def summary(self):
+        """Returns a short description of what the pass did."""
+        return f'{self.replaced} struct(s) replaced by {self.scalars} local(s)'
+
+    # Helper functions
+
+    def allocation(self, stmt):
+        """Returns the NewRValue a statement declares a struct variable
+        with (or None if the statement isn't such a declaration).
+
+        """
+        if not isinstance(stmt, VarDecl) or stmt.expr is None:
+            return None
+        expr = stmt.expr
+        if expr.op or expr.not_op or not isinstance(expr.first, SimpleTerm):
+            return None
+        rvalue = expr.first.rvalue
+        if (not isinstance(rvalue, NewRValue) or rvalue.array_expr or
+                rvalue.type_name.lexeme not in self.struct_defs):
+            return None
+        return rvalue
+
+    def replace(self, var_decl, new_rvalue, paths):
+        """Returns the declarations of the locals replacing a struct
+        variable's fields, rewriting its field paths to use them.
+
+        """
+        struct_def = self.struct_defs[new_rvalue.type_name.lexeme]
+        token = var_decl.var_def.var_name
+        names = []
+        decls = []
+        for field, param in zip(struct_def.fields, new_rvalue.struct_params or []):
+            name = Token(TokenType.ID, f'$sr{self.scalars}', token.line, token.column)
+            self.scalars += 1
+            names.append(name)
+            decls.append(VarDecl(VarDef(field.data_type, name), param))
+        for path in paths:
+            # the field's offset (from the checker) picks its local
+            field_ref = path[1]
+            path[:] = [VarRef(names[field_ref.offset], field_ref.array_expr,
+                              field_ref.type)] + path[2:]
+        self.replaced += 1
+        return decls
+
+    def replace_stmts(self, stmts):
+        """Replaces the non-escaping structs declared in the statement
+        list (and its nested statement lists) by locals.
+
+        """
+        for stmt in stmts:
+            stmt.accept(self)
+        result = []
+        for index, stmt in enumerate(stmts):
+            new_rvalue = self.allocation(stmt)
+            if new_rvalue is None:
+                result.append(stmt)
+                continue
+            uses = StructUses(stmt.var_def.var_name.lexeme)
+            uses.visit_stmts(stmts[index + 1:])
+            if uses.escapes:
+                result.append(stmt)
+            else:
+                result.extend(self.replace(stmt, new_rvalue, uses.paths))
+        stmts[:] = result
+
+    # Visitor functions
+
+    def visit_program(self, program):
+        for struct_def in program.struct_defs:
+            self.struct_defs[struct_def.struct_name.lexeme] = struct_def
+        for fun_def in program.fun_defs:
+            fun_def.accept(self)
+
+    def visit_fun_def(self, fun_def):
+        self.replace_stmts(fun_def.stmts)
+
+    def visit_while_stmt(self, while_stmt):
+        self.replace_stmts(while_stmt.stmts)
+
+    def visit_for_stmt(self, for_stmt):
+        self.replace_stmts(for_stmt.stmts)
+
+    def visit_if_stmt(self, if_stmt):
+        for basic_if in [if_stmt.if_part] + if_stmt.else_ifs:
+            self.replace_stmts(basic_if.stmts)
+        self.replace_stmts(if_stmt.else_stmts)
@@ -0,0 +1,133 @@
+"""File handles for the MyPL VM's file built-ins.
+
+A MyPL program opens a file with fopen(path, mode), getting back a
+handle of the built-in type file (the file's id in the VM's file heap),
+and then reads lines from it with freadline, writes strings to it with
+fwrite, and closes it with fclose. The modes are:
+
+  * "r" -- read, in large chunks (see InputBuffer)
+  * "m" -- read, through a read-only memory map of the file (the OS
+           pages the file in as it is read, so even files larger than
+           memory are read without copying them into the VM)
+  * "w" -- write (truncating the file), through an OutputBuffer
+  * "a" -- append, through an OutputBuffer
+
+Reading and writing never hold more than a buffer's worth of a file, so
+programs can stream through files of any size.
+
+NAME: Jake VanZyverden
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+import io
+import mmap
+
+from mypl_input import InputBuffer, decode_line
+from mypl_output import OutputBuffer
+
+
+# fopen modes
+FILE_MODES = ['r', 'm', 'w', 'a']
+
+
+def open_file(path, mode):
+    """Returns a new file handle for the path opened in the given mode.
+    Raises ValueError for an unknown mode and OSError if the file can't
+    be opened.
+
+    """
+    if mode == 'r':
+        return FileReader(path)
+    if mode == 'm':
+        return MappedReader(path)
+    if mode in ['w', 'a']:
+        return FileWriter(path, mode)
+    raise ValueError(f'unknown file mode "{mode}"')
+
+
+class FileHandle:
+    """An open file (base class). Unsupported operations raise
+    io.UnsupportedOperation.
+
+    """
+
+    def readline(self):
+        """Returns the next line (None at the end of the file)."""
+        raise io.UnsupportedOperation('file not open for reading')
+
+    def write(self, text):
+        """Writes text to the file."""
+        raise io.UnsupportedOperation('file not open for writing')
+
+    def flush(self):
+        """Writes any buffered text to the file."""
+        pass
+
+    def close(self):
+        """Closes the file."""
+        pass
+
+
+class FileReader(FileHandle):
+
+    def __init__(self, path):
+        """Opens a file for buffered reading."""
+        self.file = open(path, 'rb')
+        self.buffer = InputBuffer(self.file)
+
+    def readline(self):
+        return self.buffer.readline()
+
+    def close(self):
+        self.file.close()
+
+
+class MappedReader(FileHandle):
+
+    def __init__(self, path):
+        """Opens a file for reading through a read-only memory map."""
+        with open(path, 'rb') as file:
+            # empty files can't be mapped
+            if file.seek(0, io.SEEK_END) == 0:
+                self.map = b''
+            else:
+                self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.pos = 0
+
+    def readline(self):
+        size = len(self.map)
+        if self.pos >= size:
+            return None
+        end = self.map.find(b'\n', self.pos)
+        if end == -1:
+            end = size
+        line = self.map[self.pos:end]
+        self.pos = end + 1
+        return decode_line(line)
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+
+
+class FileWriter(FileHandle):
+
+    def __init__(self, path, mode):
+        """Opens a file for buffered writing ("w") or appending ("a")."""
+        self.file = open(path, mode, encoding='utf-8')
+        self.buffer = OutputBuffer(self.file)
+
+    def write(self, text):
+        self.buffer.write(text)
+
+    def flush(self):
+        self.buffer.flush()
+        self.file.flush()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.file.close()
@@ -20,6 +20,14 @@ class VMFrameTemplate:
     function_name: str
     arg_count: int
     instructions: list['VMInstr'] = field(default_factory=list) 
+    # variable slots (set by the verifier)
+    var_count: int = None
+    # True if calls may be memoized (set from the purity analysis)
+    pure: bool = False
+
+    def __str__(self):
+        """Returns the function name (e.g., for linked CALL operands)."""
+        return self.function_name
 
     
 @dataclass
@@ -29,6 +37,8 @@ class VMFrame:
     pc: int = 0
     variables: list[Any] = field(default_factory=list) 
     operand_stack: list[Any] = field(default_factory=list) 
+    # memoization cache key for the call's result (or None)
+    memo_key: Any = None
 
 
 @dataclass
@@ -40,11 +50,22 @@ class VMInstr:
 
     def __repr__(self):
         s = f'{self.opcode}('
-        s += f'{str(self.operand)}' if self.operand != None else ''
+        if isinstance(self.operand, str):
+            s += repr(self.operand)
+        elif self.operand != None:
+            s += str(self.operand)
         s += ')'
         s += f'  // {self.comment}' if self.comment else ''
         return s
 
+
+def slot_count(template):
+    """Returns the number of variable slots the template uses."""
+    slots = [instr.operand + 1 for instr in template.instructions
+             if instr.opcode in [OpCode.LOAD, OpCode.STORE]]
+    return max(slots + [template.arg_count])
+
+
 # Helper functions for creating specific instruction types
 
 def PUSH(value):
@@ -92,6 +113,39 @@ def OR():
 def NOT():
     return VMInstr(OpCode.NOT)
 
+def ADDI():
+    return VMInstr(OpCode.ADDI)
+
+def ADDD():
+    return VMInstr(OpCode.ADDD)
+
+def CONCAT():
+    return VMInstr(OpCode.CONCAT)
+
+def SUBI():
+    return VMInstr(OpCode.SUBI)
+
+def SUBD():
+    return VMInstr(OpCode.SUBD)
+
+def MULI():
+    return VMInstr(OpCode.MULI)
+
+def MULD():
+    return VMInstr(OpCode.MULD)
+
+def DIVI():
+    return VMInstr(OpCode.DIVI)
+
+def DIVD():
+    return VMInstr(OpCode.DIVD)
+
+def CMPLTI():
+    return VMInstr(OpCode.CMPLTI)
+
+def CMPLEI():
+    return VMInstr(OpCode.CMPLEI)
+
 def JMP(offset):
     return VMInstr(OpCode.JMP, offset)
 
@@ -101,6 +155,9 @@ def JMPF(offset):
 def CALL(fun_name):
     return VMInstr(OpCode.CALL, fun_name)
 
+def TAILCALL(fun_name):
+    return VMInstr(OpCode.TAILCALL, fun_name)
+
 def RET():
     return VMInstr(OpCode.RET)    
 
@@ -110,6 +167,12 @@ def WRITE():
 def READ():
     return VMInstr(OpCode.READ)
 
+def READALL():
+    return VMInstr(OpCode.READALL)
+
+def READN():
+    return VMInstr(OpCode.READN)
+
 def LEN():
     return VMInstr(OpCode.LEN)
 
@@ -125,6 +188,18 @@ def TODBL():
 def TOSTR():
     return VMInstr(OpCode.TOSTR)
 
+def FOPEN():
+    return VMInstr(OpCode.FOPEN)
+
+def FREAD():
+    return VMInstr(OpCode.FREAD)
+
+def FWRITE():
+    return VMInstr(OpCode.FWRITE)
+
+def FCLOSE():
+    return VMInstr(OpCode.FCLOSE)
+
 def ALLOCS():
     return VMInstr(OpCode.ALLOCS)
 
@@ -143,6 +218,12 @@ def SETI():
 def GETI():
     return VMInstr(OpCode.GETI)
 
+def SETIU():
+    return VMInstr(OpCode.SETIU)
+
+def GETIU():
+    return VMInstr(OpCode.GETIU)
+
 def DUP():
     return VMInstr(OpCode.DUP)
 
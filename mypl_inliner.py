@@ -0,0 +1,164 @@
+"""Bytecode inliner for small MyPL functions.
+
+Replaces CALLs to small leaf functions (functions that make no calls,
+and so can't be recursive) with a copy of the callee's instructions:
+
+  * the arguments (already on the operand stack) are stored into the
+    callee's parameter slots, and the callee's variable slots are
+    renumbered past the caller's own slots
+  * each RET becomes a JMP past the inlined body, leaving the return
+    value on the operand stack as the CALL would have
+
+A callee is inlined only if its CFG shows a consistent operand stack
+holding just the return value at each RET. The callee's size and the
+total growth of each caller are limited by the max_size and budget
+settings. Inlining repeats until no more calls qualify, so a function
+that becomes a leaf after its own calls are inlined can be inlined in
+turn.
+
+NAME: Jake VanZyverden
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+from mypl_opcode import OpCode
+from mypl_frame import VMFrameTemplate, VMInstr, STORE, JMP, slot_count
+from mypl_cfg import CFG, JUMPS
+from mypl_peephole import remove_instrs
+
+
+# default maximum callee size (in instructions)
+MAX_SIZE = 32
+
+# default maximum number of instructions added to each caller
+BUDGET = 200
+
+
+class Inliner:
+
+    def __init__(self, max_size=MAX_SIZE, budget=BUDGET):
+        """Creates an inliner.
+
+        Args:
+            max_size -- The largest callee (in instructions) to inline.
+            budget -- The most instructions inlining may add to a caller.
+
+        """
+        self.max_size = max_size
+        self.budget = budget
+        # (callee name, caller name) -> number of calls inlined
+        self.inlined = {}
+
+    def summary(self):
+        """Returns a short description of what the pass did."""
+        total = sum(self.inlined.values())
+        s = f'{total} call(s) inlined'
+        if self.inlined:
+            sites = [f'{callee} into {caller} ({count})'
+                     for (callee, caller), count in self.inlined.items()]
+            s += ': ' + ', '.join(sites)
+        return s
+
+    def optimize(self, vm):
+        """Inlines calls in each of the VM's frame templates."""
+        templates = vm.frame_templates
+        growth = {name: 0 for name in templates}
+        changed = True
+        while changed:
+            changed = False
+            bodies = {}
+            for name, template in templates.items():
+                body = self.inline_body(template, templates)
+                if body is not None:
+                    bodies[name] = (template.arg_count, body)
+            for template in templates.values():
+                if self.inline_calls(template, bodies, growth):
+                    changed = True
+
+    def inline_body(self, template, templates):
+        """Returns the callee instructions to inline for the template, or
+        None if it isn't an inlining candidate.
+
+        """
+        instrs = template.instructions
+        if any(instr.opcode in [OpCode.CALL, OpCode.TAILCALL] for instr in instrs):
+            return None
+        if not instrs:
+            return None
+        copy = [VMInstr(i.opcode, i.operand, i.comment) for i in instrs]
+        cfg = CFG(VMFrameTemplate(template.function_name, template.arg_count,
+                                  copy), templates)
+        cfg.remove_unreachable()
+        cfg.annotate_stack_depths()
+        if cfg.depth_conflicts:
+            return None
+        for block in cfg.blocks:
+            last = block.terminator
+            if block.succs:
+                continue
+            # every exit must be a RET of the only value on the stack
+            if last is None or last.opcode != OpCode.RET or block.stack_out != 0:
+                return None
+        body = cfg.to_instructions()
+        body = remove_instrs(body, [i.opcode != OpCode.NOP for i in body])
+        if len(body) > self.max_size:
+            return None
+        return body
+
+    def inline_calls(self, template, bodies, growth):
+        """Inlines the template's calls to the given bodies (while the
+        caller's budget lasts). Returns True if any call was inlined.
+
+        Args:
+            template -- The caller's frame template.
+            bodies -- Callee name -> (argument count, instructions).
+            growth -- Caller name -> instructions added so far.
+
+        """
+        name = template.function_name
+        instrs = template.instructions
+        base = slot_count(template)
+        result = []
+        new_index = []
+        inlined = False
+        # jumps in the inlined bodies are already final offsets
+        inlined_jumps = set()
+        for instr in instrs:
+            new_index.append(len(result))
+            callee = str(instr.operand) if instr.opcode == OpCode.CALL else None
+            if (callee not in bodies or callee == name or
+                    growth[name] + len(bodies[callee][1]) > self.budget):
+                result.append(instr)
+                continue
+            arg_count, body = bodies[callee]
+            inlined = True
+            growth[name] += len(body)
+            key = (callee, name)
+            self.inlined[key] = self.inlined.get(key, 0) + 1
+            for slot in reversed(range(arg_count)):
+                result.append(STORE(base + slot))
+            if arg_count:
+                result[-arg_count].comment = f'inline {callee}'
+            start = len(result)
+            end = start + len(body)
+            for body_instr in body:
+                copy = VMInstr(body_instr.opcode, body_instr.operand,
+                               body_instr.comment)
+                if copy.opcode in [OpCode.LOAD, OpCode.STORE]:
+                    copy.operand += base
+                elif copy.opcode in JUMPS:
+                    copy.operand += start
+                elif copy.opcode == OpCode.RET:
+                    copy = JMP(end)
+                if copy.opcode in JUMPS:
+                    inlined_jumps.add(id(copy))
+                result.append(copy)
+        if not inlined:
+            return False
+        new_index.append(len(result))
+        for instr in result:
+            if instr.opcode in JUMPS and id(instr) not in inlined_jumps:
+                instr.operand = new_index[instr.operand]
+        template.instructions = result
+        return True
@@ -0,0 +1,113 @@
+"""Buffered input for the MyPL VM.
+
+The VM's READs take lines from an InputBuffer, which reads its source
+in large binary chunks (instead of one Python input() call per line)
+and splits the lines out of its buffer. A source is any binary file-like
+object with a read(n) (or read1(n)) method, for example an open binary
+file or an io.BytesIO; the default reads standard input.
+
+Lines are returned without their line ending, and None marks the end of
+the input.
+
+NAME: Jake VanZyverden
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+import sys
+
+
+# default number of bytes read from the source at once
+CHUNK_SIZE = 1 << 16
+
+
+def decode_line(line):
+    """Returns a line of bytes (without its line ending) as a string."""
+    if line.endswith(b'\r'):
+        line = line[:-1]
+    return line.decode('utf-8')
+
+
+class InputBuffer:
+
+    def __init__(self, source=None, chunk_size=CHUNK_SIZE):
+        """Creates an empty input buffer.
+
+        Args:
+            source -- Where input is read from (standard input if None).
+            chunk_size -- The number of bytes read from the source at
+                          once.
+
+        """
+        self.source = source
+        self.chunk_size = chunk_size
+        self.data = b''
+        self.pos = 0
+        self.done = False
+
+    def stream(self):
+        """Returns the source (looking up standard input on first use)."""
+        if self.source is None:
+            self.source = sys.stdin.buffer
+        return self.source
+
+    def fill(self):
+        """Adds the next chunk of the source to the buffer. Returns False
+        at the end of the source.
+
+        """
+        if self.done:
+            return False
+        # read1 returns what is available (so interactive input isn't
+        # held up waiting for a full chunk)
+        read = getattr(self.stream(), 'read1', self.stream().read)
+        chunk = read(self.chunk_size)
+        if not chunk:
+            self.done = True
+            return False
+        self.data = self.data[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def readline(self):
+        """Returns the next line (None at the end of the input)."""
+        end = self.data.find(b'\n', self.pos)
+        while end == -1:
+            start = len(self.data) - self.pos
+            if not self.fill():
+                if self.pos == len(self.data):
+                    return None
+                # last line without a line ending
+                line = self.data[self.pos:]
+                self.pos = len(self.data)
+                return decode_line(line)
+            end = self.data.find(b'\n', start)
+        line = self.data[self.pos:end]
+        self.pos = end + 1
+        return decode_line(line)
+
+    def readlines(self, count=None):
+        """Returns a list of the next count lines (or fewer at the end of
+        the input), or of all the remaining lines if count is None.
+
+        """
+        lines = []
+        if count is not None:
+            while len(lines) < count:
+                line = self.readline()
+                if line is None:
+                    break
+                lines.append(line)
+            return lines
+        rest = self.data[self.pos:]
+        if not self.done:
+            rest += self.stream().read()
+            self.done = True
+        self.data = b''
+        self.pos = 0
+        if rest:
+            lines = [decode_line(line) for line in rest.split(b'\n')]
+            if rest.endswith(b'\n'):
+                lines.pop()
+        return lines
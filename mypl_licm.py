@@ -0,0 +1,259 @@
+"""Loop-invariant code motion (LICM) for MyPL while and for loops.
+
+Runs after semantic checking and before code generation. Calls to pure
+built-in functions (e.g., length(xs)) and variable paths (e.g., a.b.c
+or a prefix of a.b.c[i]) whose values can't change while a loop runs
+are computed once, before the loop, into temporary variables ($licm0,
+$licm1, ...) that the loop then reads instead.
+
+A value is invariant if the loop doesn't assign (or declare) its
+variables, doesn't write the fields (or, for indexed loads, array
+elements) it reads, and doesn't call a user-defined function (which may
+write any heap slot). Only code evaluated on the loop's first test is
+hoisted (never the right operand of and/or, which may be skipped), so
+hoisting never adds an evaluation (or runtime error) the original
+program wouldn't have performed first:
+
+  * the loop condition, if it (and a for loop's initializer) is side
+    effect free; the temporaries are declared just before the loop
+
+  * for while loops with such a condition, the leading side effect free
+    local variable declarations and assignments of the body; the loop
+    is guarded by an if on its condition and the temporaries are
+    declared inside the guard
+
+NAME: Jake VanZyverden
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+import copy
+from mypl_token import Token, TokenType
+from mypl_ast import *
+from mypl_effects import (PURE_BUILT_INS, TypeScopes, effects,
+                          side_effect_free, short_circuits, node_key)
+
+
+class LoopInvariantMover(Visitor):
+
+    def __init__(self):
+        """Creates a loop-invariant code motion pass."""
+        # variable types (set per program)
+        self.types = None
+        # number of temporaries created (and expressions hoisted)
+        self.hoisted = 0
+        # state of the loop being hoisted from
+        self.loop_effects = None
+        self.temps = {}
+
+    def summary(self):
+        """Returns a short description of what the pass did."""
+        return f'{self.hoisted} expression(s) hoisted'
+
+    # Helper functions
+
+    def expr_invariant(self, expr):
+        """Returns True if the expression's value can't change in the loop."""
+        if not self.term_invariant(expr.first):
+            return False
+        return expr.rest is None or self.expr_invariant(expr.rest)
+
+    def term_invariant(self, term):
+        """Returns True if the term's value can't change in the loop."""
+        if isinstance(term, ComplexTerm):
+            return self.expr_invariant(term.expr)
+        rvalue = term.rvalue
+        if isinstance(rvalue, SimpleRValue):
+            return True
+        if isinstance(rvalue, CallExpr):
+            return (rvalue.fun_name.lexeme in PURE_BUILT_INS and
+                    all(self.expr_invariant(arg) for arg in rvalue.args))
+        if isinstance(rvalue, VarRValue):
+            return self.invariant_prefix(rvalue.path) == (len(rvalue.path), False)
+        return False
+
+    def invariant_prefix(self, path):
+        """Returns (k, split) where the first k references of the path are
+        invariant loads. If split is True, the k-th reference's variable
+        (or field) is invariant but its array index load is not.
+
+        """
+        found = self.loop_effects
+        for i, var_ref in enumerate(path):
+            name = var_ref.var_name.lexeme
+            if i == 0 and name in found.variables:
+                return i, False
+            if i > 0 and (found.calls or name in found.fields):
+                return i, False
+            if var_ref.array_expr:
+                if (found.calls or found.arrays or
+                        not self.expr_invariant(var_ref.array_expr)):
+                    return i, True
+        return len(path), False
+
+    def temp(self, rvalue, data_type, out):
+        """Returns a temporary variable holding the rvalue's value, adding
+        its declaration to out unless an equal value was already hoisted
+        from the loop.
+
+        Args:
+            rvalue -- The invariant rvalue.
+            data_type -- The rvalue's DataType.
+            out -- The list of preheader statements.
+
+        """
+        key = node_key(rvalue)
+        if key in self.temps:
+            return self.temps[key]
+        token = self.first_token(rvalue)
+        name = Token(TokenType.ID, f'$licm{self.hoisted}', token.line, token.column)
+        self.hoisted += 1
+        expr = Expr(False, SimpleTerm(rvalue), None, None)
+        out.append(VarDecl(VarDef(data_type, name), expr))
+        self.temps[key] = name
+        return name
+
+    def first_token(self, rvalue):
+        """Returns a token to position a temporary for the rvalue at."""
+        if isinstance(rvalue, CallExpr):
+            return rvalue.fun_name
+        return rvalue.path[0].var_name
+
+    def hoist_expr(self, expr, out):
+        """Replaces the invariant calls and paths in the expression with
+        temporaries declared in out. The right operand of and/or may be
+        skipped at runtime, so nothing is hoisted from it.
+
+        """
+        term = expr.first
+        if isinstance(term, ComplexTerm):
+            self.hoist_expr(term.expr, out)
+        else:
+            term.rvalue = self.hoist_rvalue(term.rvalue, out)
+        if expr.rest and not short_circuits(expr):
+            self.hoist_expr(expr.rest, out)
+
+    def hoist_rvalue(self, rvalue, out):
+        """Returns the rvalue with its invariant parts replaced by
+        temporaries declared in out.
+
+        """
+        if isinstance(rvalue, CallExpr):
+            name = rvalue.fun_name.lexeme
+            if (name in PURE_BUILT_INS and
+                    all(self.expr_invariant(arg) for arg in rvalue.args)):
+                temp = self.temp(rvalue, rvalue.type, out)
+                return VarRValue([VarRef(temp, None)])
+            for arg in rvalue.args:
+                self.hoist_expr(arg, out)
+        elif isinstance(rvalue, VarRValue):
+            self.hoist_path(rvalue, out)
+        elif isinstance(rvalue, NewRValue):
+            if rvalue.array_expr:
+                self.hoist_expr(rvalue.array_expr, out)
+            for param in rvalue.struct_params or []:
+                self.hoist_expr(param, out)
+        return rvalue
+
+    def hoist_path(self, var_rvalue, out):
+        """Replaces the longest invariant prefix of the path (if it loads
+        more than a single variable) with a temporary.
+
+        """
+        path = var_rvalue.path
+        k, split = self.invariant_prefix(path)
+        prefix = path[:k]
+        if split:
+            prefix = prefix + [VarRef(path[k].var_name, None)]
+        loads = len(prefix) + sum(1 for ref in prefix if ref.array_expr)
+        data_type = self.types.path_type(prefix) if prefix else None
+        if loads > 1 and data_type is not None:
+            temp = self.temp(VarRValue(prefix), data_type, out)
+            rest = path[k + 1:] if split else path[k:]
+            index = path[k].array_expr if split else None
+            path[:] = [VarRef(temp, index)] + rest
+        for var_ref in path:
+            if var_ref.array_expr:
+                self.hoist_expr(var_ref.array_expr, out)
+
+    def hoist(self, loop):
+        """Returns the statements replacing the loop: its preheader
+        temporaries, followed by the (possibly guarded) loop.
+
+        """
+        self.loop_effects = effects(loop)
+        self.temps = {}
+        header = [loop.condition]
+        if isinstance(loop, ForStmt) and loop.var_decl.expr:
+            header.append(loop.var_decl.expr)
+        if not side_effect_free(*header):
+            return [loop]
+        pre = []
+        self.hoist_expr(loop.condition, pre)
+        if isinstance(loop, ForStmt):
+            return pre + [loop]
+        body = []
+        for stmt in loop.stmts:
+            if isinstance(stmt, VarDecl) and stmt.expr:
+                expr = stmt.expr
+            elif (isinstance(stmt, AssignStmt) and len(stmt.lvalue) == 1 and
+                  not stmt.lvalue[0].array_expr):
+                expr = stmt.expr
+            else:
+                break
+            if not side_effect_free(expr):
+                break
+            self.hoist_expr(expr, body)
+        if not body:
+            return pre + [loop]
+        guard = BasicIf(copy.deepcopy(loop.condition), body + [loop])
+        return pre + [IfStmt(guard, [], [])]
+
+    def rewrite_stmts(self, stmts, scope=None):
+        """Hoists invariants out of each loop in the statement list (inner
+        loops first).
+
+        Args:
+            stmts -- The statement list (rewritten in place).
+            scope -- Variables to add to the list's scope (or None).
+
+        """
+        self.types.push(scope)
+        result = []
+        for stmt in stmts:
+            stmt.accept(self)
+            if isinstance(stmt, (WhileStmt, ForStmt)):
+                result.extend(self.hoist(stmt))
+            else:
+                result.append(stmt)
+        self.types.pop()
+        stmts[:] = result
+
+    # Visitor functions
+
+    def visit_program(self, program):
+        self.types = TypeScopes(program)
+        for fun_def in program.fun_defs:
+            fun_def.accept(self)
+
+    def visit_fun_def(self, fun_def):
+        params = {p.var_name.lexeme: p.data_type for p in fun_def.params}
+        self.rewrite_stmts(fun_def.stmts, params)
+
+    def visit_var_decl(self, var_decl):
+        var_def = var_decl.var_def
+        self.types.add(var_def.var_name.lexeme, var_def.data_type)
+
+    def visit_while_stmt(self, while_stmt):
+        self.rewrite_stmts(while_stmt.stmts)
+
+    def visit_for_stmt(self, for_stmt):
+        var_def = for_stmt.var_decl.var_def
+        self.rewrite_stmts(for_stmt.stmts,
+                           {var_def.var_name.lexeme: var_def.data_type})
+
+    def visit_if_stmt(self, if_stmt):
+        for basic_if in [if_stmt.if_part] + if_stmt.else_ifs:
+            self.rewrite_stmts(basic_if.stmts)
+        self.rewrite_stmts(if_stmt.else_stmts)
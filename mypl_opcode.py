@@ -30,31 +30,61 @@ OpCode = Enum('OpCode', [
     'AND',     # pop x, pop y, push (y and x)
     'OR',      # pop x, pop y, push (y or x)
     'NOT',     # pop x, push (not x)
+    'NOTU',    # NOT without the null check (x known to be non-null)
+
+    # type-specialized operators (both operands of the given type)
+    'ADDI',    # pop int x, pop int y, push (y + x)
+    'ADDD',    # pop double x, pop double y, push (y + x)
+    'CONCAT',  # pop string x, pop string y, push (y + x)
+    'SUBI',    # pop int x, pop int y, push (y - x)
+    'SUBD',    # pop double x, pop double y, push (y - x)
+    'MULI',    # pop int x, pop int y, push (y * x)
+    'MULD',    # pop double x, pop double y, push (y * x)
+    'DIVI',    # pop int x, pop int y, push (y // x)
+    'DIVD',    # pop double x, pop double y, push (y / x)
+    'CMPLTI',  # pop int x, pop int y, push (y < x)
+    'CMPLEI',  # pop int x, pop int y, push (y <= x)
 
     # jump and branch
     'JMP',     # jump to given instruction offset A
     'JMPF',    # pop x, if x is False jump to instruction offset A
 
     # functions
-    'CALL',    # call function A (pop and push arguments)
+    'CALL',    # call function A (pop arguments into its first variables)
+    'TAILCALL',  # call function A in place of the current function (pop
+                 # arguments into its first variables, reuse the frame)
     'RET',     # return from current function
 
     # built ins
     'WRITE',   # pop x, print x to standard output
-    'READ',    # read standard input, push result onto stack
+    'READ',    # read line of standard input, push result (null at end)
+    'READALL', # read rest of standard input, push oid of array of its lines
+    'READN',   # pop int x, read up to x lines of standard input, push oid
+               # of array of the lines
     'LEN',     # pop string x, push len(x) if str, else push len(obj(x))
+    'LENU',    # LEN without the null check (x known to be non-null)
     'GETC',    # pop string x, pop int y, push x[y]
     'TOINT',   # pop x, push int(x)
     'TODBL',   # pop x, push double(x)
     'TOSTR',   # pop x, push str(x)
+    'TOSTRU',  # TOSTR without the null check (x known to be non-null)
+    'FOPEN',   # pop string mode x, pop string path y, open file y in mode x,
+               # push its handle (file id)
+    'FREAD',   # pop handle x, push the next line of file(x) (null at end)
+    'FWRITE',  # pop string x, pop handle y, write x to file(y)
+    'FCLOSE',  # pop handle x, close file(x)
 
     # heap
     'ALLOCS',  # allocate struct object, push oid x
     'SETF',    # pop value x, pop oid y, set obj(y)[A] = x
     'GETF',    # pop oid x, push obj(x)[A] onto stack
+    'SETFU',   # SETF without the null check (oid known to be non-null)
+    'GETFU',   # GETF without the null check (oid known to be non-null)
     'ALLOCA',  # pop int x, allocate array object with x None values, push oid
     'SETI',    # pop value x, pop index y, pop oid z, set array obj(z)[y] = x
     'GETI',    # pop index x, pop oid y, push obj(y)[x] onto stack
+    'SETIU',   # SETI without index checks (index known to be in range)
+    'GETIU',   # GETI without null and index checks (index known to be in range)
 
     # special
     'DUP',     # pop x, push x, push x
@@ -0,0 +1,63 @@
+"""Buffered output for the MyPL VM.
+
+The VM's WRITEs add text to an OutputBuffer, which passes it on to its
+sink in large chunks: when the buffer reaches its size threshold, when
+the program is about to read input, and when the program ends (or
+fails). A sink is any object with a write(text) method, for example an
+open file or an io.StringIO (to collect output in memory); the default
+StdoutSink writes to standard output.
+
+NAME: Jake VanZyverden
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+import sys
+
+
+# default number of characters buffered before a flush
+BUFFER_SIZE = 1 << 16
+
+
+class StdoutSink:
+    """Writes to the current standard output (looked up on each write,
+    so a redirected sys.stdout is honored).
+
+    """
+
+    def write(self, text):
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+
+class OutputBuffer:
+
+    def __init__(self, sink=None, threshold=BUFFER_SIZE):
+        """Creates an empty output buffer.
+
+        Args:
+            sink -- Where buffered text is written (standard output if
+                    None).
+            threshold -- The number of characters buffered before the
+                         buffer is flushed.
+
+        """
+        self.sink = sink if sink is not None else StdoutSink()
+        self.threshold = threshold
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        """Adds text to the buffer, flushing it if it is full."""
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.threshold:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered text to the sink."""
+        if self.parts:
+            self.sink.write(''.join(self.parts))
+            self.parts = []
+            self.size = 0
@@ -0,0 +1,87 @@
+"""Overload resolution table for MyPL functions.
+
+Functions may be overloaded on their parameter types. Each overload is
+compiled to a VM frame whose name is the function name mangled with
+its parameter types (e.g., f_int_string, g_array_T). The table maps
+each function name to its signatures once, so every call site is
+resolved by a typed lookup rather than by re-deriving names.
+
+NAME: Jake VanZyverden
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+
+def type_str(data_type):
+    """Returns the signature string for a DataType (e.g., "int" or
+    "array T").
+
+    """
+    name = data_type.type_name.lexeme
+    return 'array ' + name if data_type.is_array else name
+
+
+def signature(params):
+    """Returns the signature (tuple of type strings) for a list of
+    parameter VarDefs.
+
+    """
+    return tuple(type_str(param.data_type) for param in params)
+
+
+def mangle(fun_name, sig):
+    """Returns the VM frame name for a function with the given signature.
+
+    Args:
+        fun_name -- The (unmangled) function name.
+        sig -- The tuple of parameter type strings.
+
+    """
+    return fun_name + ''.join('_' + t.replace(' ', '_') for t in sig)
+
+
+class OverloadTable:
+
+    def __init__(self):
+        """Creates an empty overload table."""
+        # function name -> {signature -> FunDef}
+        self.signatures = {}
+
+    def __contains__(self, fun_name):
+        """True if at least one overload of the function exists."""
+        return fun_name in self.signatures
+
+    def add(self, fun_def):
+        """Adds the function definition, returning False if an overload
+        with the same signature already exists.
+
+        Args:
+            fun_def -- The FunDef to add.
+
+        """
+        overloads = self.signatures.setdefault(fun_def.fun_name.lexeme, {})
+        sig = signature(fun_def.params)
+        if sig in overloads:
+            return False
+        overloads[sig] = fun_def
+        return True
+
+    def resolve(self, fun_name, arg_types):
+        """Returns the list of (signature, FunDef) overloads matching the
+        given argument types. An exact match is returned on its own;
+        otherwise a null argument (type "void") matches any parameter
+        type.
+
+        Args:
+            fun_name -- The function being called.
+            arg_types -- The argument type strings.
+
+        """
+        overloads = self.signatures.get(fun_name, {})
+        arg_types = tuple(arg_types)
+        if arg_types in overloads:
+            return [(arg_types, overloads[arg_types])]
+        return [(sig, fun_def) for sig, fun_def in overloads.items()
+                if len(sig) == len(arg_types) and
+                all(a == p or a == 'void' for a, p in zip(arg_types, sig))]
@@ -0,0 +1,123 @@
+"""Optimization pass manager for the MyPL compiler.
+
+Passes come in two kinds: AST passes are visitors run over the checked
+program before code generation, and code passes transform the VM frame
+templates after code generation. Each optimization level (-O0, -O1,
+-O2) names an ordered list of passes; a custom list can be given
+instead (e.g., to benchmark a pass on its own). Every pass object
+provides a summary() describing what it did.
+
+NAME: Jake VanZyverden
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+import time
+import importlib
+from dataclasses import dataclass
+
+
+@dataclass
+class Pass:
+    """An optimization pass registration. The pass's module is only
+    imported when the pass is created, so a run loads just the passes it
+    selects.
+
+    """
+    name: str
+    kind: str                   # 'ast' or 'code'
+    module: str                 # module defining the pass class
+    class_name: str
+    description: str
+
+    def create(self):
+        """Returns a new pass object."""
+        module = importlib.import_module(self.module)
+        return getattr(module, self.class_name)()
+
+
+PASSES = {p.name: p for p in [
+    Pass('fold', 'ast', 'mypl_constant_folder', 'ConstantFolder',
+         'constant folding'),
+    Pass('licm', 'ast', 'mypl_licm', 'LoopInvariantMover',
+         'loop-invariant code motion'),
+    Pass('peephole', 'code', 'mypl_peephole', 'PeepholeOptimizer',
+         'NOP/unreachable code removal and jump threading'),
+    Pass('cse', 'ast', 'mypl_cse', 'PathEliminator',
+         'sharing of common path loads'),
+    Pass('inline', 'code', 'mypl_inliner', 'Inliner',
+         'inlining of small leaf functions'),
+    Pass('cfg', 'code', 'mypl_cfg', 'CFGSimplifier',
+         'unreachable block removal and stack depth analysis'),
+    Pass('scalar', 'ast', 'mypl_escape', 'ScalarReplacer',
+         'scalar replacement of non-escaping structs'),
+    Pass('bounds', 'ast', 'mypl_bounds', 'BoundsCheckEliminator',
+         'bounds-check elimination in canonical array loops'),
+    Pass('dce', 'ast', 'mypl_dce', 'DefinitionEliminator',
+         'removal of functions and structs unreachable from main'),
+    Pass('prune', 'code', 'mypl_dce', 'TemplatePruner',
+         'removal of frame templates unreachable from main'),
+    Pass('pure', 'ast', 'mypl_purity', 'PurityAnalysis',
+         'marking of pure functions (for --memoize)'),
+    Pass('verify', 'code', 'mypl_verifier', 'Verifier',
+         'bytecode verification (stack depths, jumps, calls, variables)'),
+]}
+
+OPT_LEVELS = {
+    0: [],
+    1: ['dce', 'fold', 'peephole', 'verify'],
+    2: ['dce', 'fold', 'scalar', 'bounds', 'licm', 'cse', 'inline', 'prune',
+        'cfg', 'peephole', 'verify'],
+}
+
+
+class PassManager:
+
+    def __init__(self, pass_names):
+        """Creates a pass manager for the given ordered pass names.
+
+        Args:
+            pass_names -- The names of the passes to run, in order.
+
+        """
+        unknown = [name for name in pass_names if name not in PASSES]
+        if unknown:
+            raise ValueError(f'unknown pass(es): {", ".join(unknown)}')
+        self.passes = [PASSES[name] for name in pass_names]
+        # (pass name, seconds, summary) for each pass run
+        self.timings = []
+
+    @staticmethod
+    def for_level(level):
+        """Returns a pass manager for the given optimization level."""
+        return PassManager(OPT_LEVELS[level])
+
+    def run_pass(self, registration, run):
+        """Creates the pass, runs it via the given function, and records
+        its time and summary.
+
+        """
+        opt_pass = registration.create()
+        start = time.perf_counter()
+        run(opt_pass)
+        elapsed = time.perf_counter() - start
+        self.timings.append((registration.name, elapsed, opt_pass.summary()))
+
+    def run_ast_passes(self, program):
+        """Runs each AST pass over the (checked) program."""
+        for registration in self.passes:
+            if registration.kind == 'ast':
+                self.run_pass(registration, lambda p: program.accept(p))
+
+    def run_code_passes(self, vm):
+        """Runs each code pass over the VM's frame templates."""
+        for registration in self.passes:
+            if registration.kind == 'code':
+                self.run_pass(registration, lambda p: p.optimize(vm))
+
+    def report(self):
+        """Returns the pass timings and summaries as a string."""
+        lines = [f'{name:<12}{seconds * 1000:>9.3f} ms  {summary}'
+                 for name, seconds, summary in self.timings]
+        return '\n'.join(lines)
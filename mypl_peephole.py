@@ -0,0 +1,141 @@
+"""Peephole optimizer for MyPL VM frame templates.
+
+Rewrites each template's instruction list in place, repeating until
+nothing changes:
+
+  * jumps to jumps are retargeted to the final destination, and jumps
+    to the next instruction are removed
+  * unreachable instructions (e.g., after a RET, TAILCALL, or JMP) are
+    removed
+  * NOPs and PUSH; POP pairs are removed
+
+Jump offsets are remapped as instructions are removed: a jump to a
+removed instruction lands on the next remaining one.
+
+NAME: Jake VanZyverden
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+from mypl_opcode import OpCode
+
+
+JUMPS = [OpCode.JMP, OpCode.JMPF]
+
+
+def jump_targets(instrs):
+    """Returns the set of instruction offsets that are jumped to."""
+    return {instr.operand for instr in instrs if instr.opcode in JUMPS}
+
+
+def remove_instrs(instrs, keep):
+    """Returns the instructions whose keep flag is set, remapping jump
+    offsets so a jump to a removed instruction lands on the next kept
+    instruction.
+
+    Args:
+        instrs -- The instruction list.
+        keep -- A list of booleans, one per instruction.
+
+    """
+    new_index = []
+    count = 0
+    for flag in keep:
+        new_index.append(count)
+        count += flag
+    new_index.append(count)
+    result = []
+    for instr, flag in zip(instrs, keep):
+        if flag:
+            if instr.opcode in JUMPS:
+                instr.operand = new_index[instr.operand]
+            result.append(instr)
+    return result
+
+
+def reachable(instrs):
+    """Returns a list of flags marking the instructions reachable from the
+    start of the function.
+
+    """
+    seen = [False] * len(instrs)
+    work = [0]
+    while work:
+        pc = work.pop()
+        while pc < len(instrs) and not seen[pc]:
+            seen[pc] = True
+            instr = instrs[pc]
+            if instr.opcode in [OpCode.RET, OpCode.TAILCALL]:
+                break
+            if instr.opcode in JUMPS:
+                work.append(instr.operand)
+                if instr.opcode == OpCode.JMP:
+                    break
+            pc += 1
+    return seen
+
+
+class PeepholeOptimizer:
+
+    def __init__(self):
+        """Creates a peephole optimizer."""
+        # number of instructions removed
+        self.removed = 0
+
+    def summary(self):
+        """Returns a short description of what the pass did."""
+        return f'{self.removed} instruction(s) removed'
+
+    def optimize(self, vm):
+        """Optimizes each frame template of the VM."""
+        for template in vm.frame_templates.values():
+            self.optimize_template(template)
+
+    def optimize_template(self, template):
+        """Optimizes the template's instructions until no more changes
+        apply.
+
+        """
+        instrs = template.instructions
+        start = len(instrs)
+        changed = True
+        while changed:
+            changed = self.thread_jumps(instrs)
+            keep = reachable(instrs)
+            targets = jump_targets(instrs)
+            for i, instr in enumerate(instrs):
+                if not keep[i]:
+                    continue
+                if instr.opcode == OpCode.NOP:
+                    keep[i] = False
+                elif instr.opcode == OpCode.JMP and instr.operand == i + 1:
+                    keep[i] = False
+                elif (instr.opcode == OpCode.PUSH and i + 1 < len(instrs) and
+                      instrs[i + 1].opcode == OpCode.POP and keep[i + 1] and
+                      i + 1 not in targets):
+                    keep[i] = keep[i + 1] = False
+            if not all(keep):
+                instrs[:] = remove_instrs(instrs, keep)
+                changed = True
+        self.removed += start - len(instrs)
+
+    def thread_jumps(self, instrs):
+        """Retargets jumps whose destination is an unconditional jump.
+        Returns True if any jump changed.
+
+        """
+        changed = False
+        for instr in instrs:
+            if instr.opcode not in JUMPS:
+                continue
+            target = instr.operand
+            seen = set()
+            while (target < len(instrs) and target not in seen and
+                   instrs[target].opcode == OpCode.JMP):
+                seen.add(target)
+                target = instrs[target].operand
+            if target != instr.operand:
+                instr.operand = target
+                changed = True
+        return changed
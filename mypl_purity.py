@@ -0,0 +1,65 @@
+"""Purity analysis of MyPL functions (for memoization).
+
+Runs after semantic checking and before code generation. A function is
+pure if its result depends only on its arguments and calling it has no
+other effect:
+
+  * its parameters, return value, and local variables are all ints,
+    doubles, strings, or bools (so it can't reach the heap), and it
+    allocates no structs or arrays
+  * it calls no I/O built-ins (print, input)
+  * every user function it calls is pure (recursion is allowed)
+
+Pure functions are marked (FunDef.pure) and the code generator copies
+the mark to their frame templates, so a VM with memoization turned on
+can cache their results.
+
+NAME: Jake VanZyverden
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+from mypl_ast import *
+from mypl_overload import mangle, signature
+from mypl_effects import IO_BUILT_INS
+from mypl_dce import Uses
+
+
+# types of the values a pure function may handle
+PRIMITIVE_TYPES = ['int', 'double', 'string', 'bool']
+
+
+class PurityAnalysis(Visitor):
+
+    def __init__(self):
+        """Creates a purity analysis pass."""
+        # number of functions analyzed and found pure
+        self.functions = 0
+        self.pure = 0
+
+    def summary(self):
+        """Returns a short description of what the pass did."""
+        return f'{self.pure} of {self.functions} function(s) pure'
+
+    def visit_program(self, program):
+        funs = {mangle(f.fun_name.lexeme, signature(f.params)): f
+                for f in program.fun_defs}
+        uses = {}
+        for name, fun_def in funs.items():
+            uses[name] = Uses()
+            fun_def.accept(uses[name])
+        # start from the functions pure on their own, then drop those
+        # calling impure functions until nothing changes
+        pure = {name for name, u in uses.items()
+                if u.types <= set(PRIMITIVE_TYPES) and not u.arrays and
+                not u.built_ins & set(IO_BUILT_INS)}
+        changed = True
+        while changed:
+            impure = {name for name in pure if not uses[name].calls <= pure}
+            pure -= impure
+            changed = bool(impure)
+        for name, fun_def in funs.items():
+            fun_def.pure = name in pure
+        self.functions += len(funs)
+        self.pure += len(pure)
@@ -11,10 +11,14 @@ from mypl_error import *
 from mypl_token import Token, TokenType
 from mypl_ast import *
 from mypl_symbol_table import SymbolTable
+from mypl_overload import OverloadTable, type_str, mangle
 
 BASE_TYPES = ['int', 'double', 'bool', 'string']
+# built-in types of VM objects (only created and used by built-ins)
+HANDLE_TYPES = ['file']
 BUILT_INS = ['print', 'input', 'itos', 'itod', 'dtos', 'dtoi', 'stoi', 'stod',
-             'length', 'get']
+             'length', 'get', 'input_all', 'input_lines', 'fopen', 'freadline',
+             'fwrite', 'fclose']
 COMPARE_OPS = ['<', '<=', '>', '>=', '!=', '==', 'and', 'or']
 
 
@@ -23,7 +27,7 @@ class SemanticChecker(Visitor):
 
     def __init__(self):
         self.structs = {}
-        self.functions = {}
+        self.functions = OverloadTable()
         self.symbol_table = SymbolTable()
         self.curr_type = None
 
@@ -54,6 +58,20 @@ class SemanticChecker(Visitor):
                 return var_def.data_type
         return None
 
+    def get_field_offset(self, struct_def, field_name):
+        """Returns the index of the given field name in the struct
+        definition's fields (or None if it isn't a field).
+
+        Args:
+            struct_def: The StructDef object 
+            field_name: The name of the field
+
+        """
+        for i, var_def in enumerate(struct_def.fields):
+            if var_def.var_name.lexeme == field_name:
+                return i
+        return None
+
     # Visitor Functions
 
     def visit_program(self, program):
@@ -62,11 +80,13 @@ class SemanticChecker(Visitor):
             struct_name = struct.struct_name.lexeme
             if struct_name in self.structs:
                 self.error(f'duplicate {struct_name} definition', struct.struct_name)
+            if struct_name in HANDLE_TYPES:
+                self.error(f'redefining built-in type', struct.struct_name)
             self.structs[struct_name] = struct
         # check and record function defs
         for fun in program.fun_defs:
             fun_name = fun.fun_name.lexeme
-            if fun_name in self.functions:
+            if not self.functions.add(fun):
                 self.error(f'duplicate {fun_name} definition', fun.fun_name)
             if fun_name in BUILT_INS:
                 self.error(f'redefining built-in function', fun.fun_name)
@@ -74,7 +94,6 @@ class SemanticChecker(Visitor):
                 self.error('main without void type', fun.return_type.type_name)
             if fun_name == 'main' and fun.params:
                 self.error('main function with parameters', fun.fun_name)
-            self.functions[fun_name] = fun
         # check main function
         if 'main' not in self.functions:
             self.error('missing main function', None)
@@ -82,7 +101,7 @@ class SemanticChecker(Visitor):
         for struct in self.structs.values():
             struct.accept(self)
         # check each function
-        for fun in self.functions.values():
+        for fun in program.fun_defs:
             fun.accept(self)
 
     def visit_struct_def(self, struct_def):
@@ -92,7 +111,7 @@ class SemanticChecker(Visitor):
                 self.error("Duplicate parameter names in function definition", field.var_name)
             else:
                 if (field.data_type.type_name.lexeme not in self.structs.keys() and
-                        field.data_type.type_name.lexeme not in BASE_TYPES):
+                        field.data_type.type_name.lexeme not in BASE_TYPES + HANDLE_TYPES):
                     self.error("Param type not defined", field.data_type.type_name)
                 self.symbol_table.add(field.var_name.lexeme, field.data_type)
         self.symbol_table.pop_environment()
@@ -106,14 +125,14 @@ class SemanticChecker(Visitor):
                 self.error("Duplicate parameter names in function definition", param.var_name)
             else:
                 if (param.data_type.type_name.lexeme not in self.structs.keys() and
-                        param.data_type.type_name.lexeme not in BASE_TYPES):
+                        param.data_type.type_name.lexeme not in BASE_TYPES + HANDLE_TYPES):
                     self.error("Param type not defined", param.data_type.type_name)
                 self.symbol_table.add(param.var_name.lexeme, param.data_type)
         if (self.symbol_table.exists_in_curr_env(fun_def.return_type.type_name.lexeme)):
             self.error("return binding already exists for environment", fun_def.return_type.type_name)
         else:
-            if (not self.symbol_table.exists(fun_def.return_type.type_name.lexeme) and
-                    fun_def.return_type.type_name.lexeme not in BASE_TYPES
+            if (fun_def.return_type.type_name.lexeme not in self.structs and
+                    fun_def.return_type.type_name.lexeme not in BASE_TYPES + HANDLE_TYPES
                     and fun_def.return_type.type_name.lexeme != 'void'):
                 self.error('return type does not exist', fun_def.return_type.type_name)
             self.symbol_table.add('return', fun_def.return_type.type_name.lexeme)
@@ -152,25 +171,7 @@ class SemanticChecker(Visitor):
         return
 
     def visit_assign_stmt(self, assign_stmt):
-        lvalue_type = None
-        depth = 0
-        for lvalue in assign_stmt.lvalue:
-            if (not self.symbol_table.exists_in_curr_env(lvalue.var_name.lexeme)):
-                lvalue_type = self.symbol_table.get(assign_stmt.lvalue[depth - 1].var_name.lexeme)
-                if (lvalue_type is not None and lvalue_type.type_name.lexeme in self.structs):
-                    if (lvalue_type.is_array and lvalue.array_expr is None):
-                        self.error("Array type must have an array expression", lvalue.var_name.lexeme)
-                    struct = self.structs[lvalue_type.type_name.lexeme]
-                    for field in struct.fields:
-                        if (field.var_name.lexeme == lvalue.var_name.lexeme):
-                            self.curr_type = field.data_type
-                            return
-                    self.error('Undefined variable type', lvalue.var_name)
-                else:
-                    self.error('Undefined variable type', lvalue.var_name)
-            depth = depth + 1
-            self.curr_type = self.symbol_table.get(lvalue.var_name.lexeme)
-        lvalue_final_type = self.curr_type
+        lvalue_final_type = self.check_path(assign_stmt.lvalue)
         assign_stmt.expr.accept(self)
         if (self.curr_type.type_name.lexeme != lvalue_final_type.type_name.lexeme):
             if (not self.curr_type.type_name.lexeme == 'void'):
@@ -222,7 +223,7 @@ class SemanticChecker(Visitor):
         return
 
     def visit_call_expr(self, call_expr):
-        if (call_expr.fun_name.lexeme not in self.functions.keys()):
+        if (call_expr.fun_name.lexeme not in self.functions):
             if (call_expr.fun_name.lexeme not in BUILT_INS):
                 self.error("Function not defined", call_expr.fun_name)
         i = 0
@@ -294,20 +295,52 @@ class SemanticChecker(Visitor):
                 case 'input':
                     curr_token = Token(TokenType.STRING_TYPE, 'string', call_expr.fun_name.line, call_expr.fun_name.column)
                     self.curr_type = DataType(False, curr_token)
-                    return
+                case 'input_all':
+                    if (len(args) != 0):
+                        self.error('Invalid number of args for built-in function', call_expr.fun_name)
+                    curr_token = Token(TokenType.STRING_TYPE, 'string', call_expr.fun_name.line,
+                                       call_expr.fun_name.column)
+                    self.curr_type = DataType(True, curr_token)
+                case 'input_lines':
+                    self.check_built_ins(args, 'int', call_expr.fun_name)
+                    curr_token = Token(TokenType.STRING_TYPE, 'string', call_expr.fun_name.line,
+                                       call_expr.fun_name.column)
+                    self.curr_type = DataType(True, curr_token)
+                case 'fopen':
+                    self.check_built_in_args(args, ['string', 'string'], call_expr.fun_name)
+                    curr_token = Token(TokenType.ID, 'file', call_expr.fun_name.line,
+                                       call_expr.fun_name.column)
+                    self.curr_type = DataType(False, curr_token)
+                case 'freadline':
+                    self.check_built_in_args(args, ['file'], call_expr.fun_name)
+                    curr_token = Token(TokenType.STRING_TYPE, 'string', call_expr.fun_name.line,
+                                       call_expr.fun_name.column)
+                    self.curr_type = DataType(False, curr_token)
+                case 'fwrite':
+                    self.check_built_in_args(args, ['file', 'string'], call_expr.fun_name)
+                    curr_token = Token(TokenType.VOID_TYPE, 'void', call_expr.fun_name.line,
+                                       call_expr.fun_name.column)
+                    self.curr_type = DataType(False, curr_token)
+                case 'fclose':
+                    self.check_built_in_args(args, ['file'], call_expr.fun_name)
+                    curr_token = Token(TokenType.VOID_TYPE, 'void', call_expr.fun_name.line,
+                                       call_expr.fun_name.column)
+                    self.curr_type = DataType(False, curr_token)
+            call_expr.type = self.curr_type
             return
-        fun = self.functions[call_expr.fun_name.lexeme]
+        arg_types = []
         for arg in call_expr.args:
             arg.accept(self)
-            if (i > len(fun.params) - 1):
-                self.error("Too many args for function definition", call_expr.fun_name)
-            if (fun.params[i].data_type.type_name.lexeme != self.curr_type.type_name.lexeme):
-                if (self.curr_type.type_name.lexeme != 'void'):
-                    self.error("Parameter type mismatch", self.curr_type.type_name)
-            i = i + 1
-        if (i != len(fun.params)):
-            self.error("Number of args does not match number of parameters", call_expr.fun_name)
+            arg_types.append(type_str(self.curr_type))
+        matches = self.functions.resolve(call_expr.fun_name.lexeme, arg_types)
+        if (not matches):
+            self.error("No overload matches the argument types", call_expr.fun_name)
+        if (len(matches) > 1):
+            self.error("Ambiguous call to overloaded function", call_expr.fun_name)
+        sig, fun = matches[0]
+        call_expr.target = mangle(call_expr.fun_name.lexeme, sig)
         self.curr_type = fun.return_type
+        call_expr.type = self.curr_type
         return
 
     def visit_expr(self, expr):
@@ -320,8 +353,15 @@ class SemanticChecker(Visitor):
             rhs_type = self.curr_type
 
             if (rhs_type.type_name.lexeme != lhs_type.type_name.lexeme):
-                if (not rhs_type.type_name.lexeme == 'void'):
+                if (rhs_type.type_name.lexeme != 'void' and lhs_type.type_name.lexeme != 'void'):
                     self.error('left and ride side of expression do not match', rhs_type.type_name)
+            elif (lhs_type.type_name.lexeme != 'void' and lhs_type.is_array == rhs_type.is_array):
+                # both operand types are known (for specialized opcodes)
+                expr.op_type = lhs_type
+            if (expr.op.lexeme not in ['==', '!=']):
+                for operand_type in [lhs_type, rhs_type]:
+                    if (operand_type.type_name.lexeme in HANDLE_TYPES and not operand_type.is_array):
+                        self.error('Invalid operation on file handle', expr.op)
             if (expr.op.lexeme in COMPARE_OPS):
                 if (
                         expr.op.lexeme != '==' and expr.op.lexeme != '!=' and expr.op.lexeme != 'or' and expr.op.lexeme != 'and'):
@@ -329,11 +369,12 @@ class SemanticChecker(Visitor):
                         self.error('Cannot compare string/bool to each other', rhs_type.type_name)
                 self.curr_type = DataType(False, Token(TokenType.BOOL_VAL, 'bool', self.curr_type.type_name.line,
                                                        self.curr_type.type_name.column))
+        expr.type = self.curr_type
 
     def visit_data_type(self, data_type):
         # note: allowing void (bad cases of void caught by parser)
         name = data_type.type_name.lexeme
-        if name == 'void' or name in BASE_TYPES or name in self.structs:
+        if name == 'void' or name in BASE_TYPES + HANDLE_TYPES or name in self.structs:
             self.curr_type = data_type
         else:
             self.error(f'invalid type "{name}"', data_type.type_name)
@@ -370,11 +411,12 @@ class SemanticChecker(Visitor):
     def visit_new_rvalue(self, new_rvalue):
         if (new_rvalue.array_expr):
             new_rvalue.array_expr.accept(self)
-        self.curr_type = DataType(new_rvalue.array_expr, new_rvalue.type_name)
+        self.curr_type = DataType(new_rvalue.array_expr is not None, new_rvalue.type_name)
         if (new_rvalue.type_name.lexeme in self.structs and not self.curr_type.is_array):
             i = 0
             struct = self.structs[new_rvalue.type_name.lexeme]
             if (new_rvalue.struct_params is None and len(struct.fields) == 0):
+                new_rvalue.type = self.curr_type
                 return
             if (len(struct.fields) != len(new_rvalue.struct_params)):
                 self.error("Number of args does not match number of parameters", new_rvalue.type_name)
@@ -386,27 +428,44 @@ class SemanticChecker(Visitor):
                     if (self.curr_type.type_name.lexeme != 'void'):
                         self.error("Parameter type mismatch", self.curr_type.type_name)
                 i = i + 1
-        self.curr_type = DataType(new_rvalue.array_expr, new_rvalue.type_name)
+        self.curr_type = DataType(new_rvalue.array_expr is not None, new_rvalue.type_name)
+        new_rvalue.type = self.curr_type
         return
 
     def visit_var_rvalue(self, var_rvalue):
-        depth = 0
-        for var_ref in var_rvalue.path:
-            if (not self.symbol_table.exists_in_curr_env(var_ref.var_name.lexeme)):
-                parent = self.symbol_table.get(var_rvalue.path[depth - 1].var_name.lexeme)
-                if (parent is not None and parent.type_name.lexeme in self.structs):
-                    struct = self.structs[parent.type_name.lexeme]
-                    for field in struct.fields:
-                        if (field.var_name.lexeme == var_ref.var_name.lexeme):
-                            self.curr_type = field.data_type
-                            return
-                    self.error("Undefined variable referenced in expression", var_ref.var_name)
-                else:
-                    self.error("Undefined variable referenced in expression", var_ref.var_name)
-            depth = depth + 1
-            self.curr_type = self.symbol_table.get(var_ref.var_name.lexeme)
+        self.curr_type = self.check_path(var_rvalue.path)
         return
 
+    def check_path(self, path):
+        """Returns the DataType of a variable path (e.g., a.b[i].c),
+        checking the variable, each field, and each array index along
+        the way.
+
+        Args:
+            path: The list of VarRefs making up the path.
+
+        """
+        var_type = self.symbol_table.get(path[0].var_name.lexeme)
+        if (var_type is None):
+            self.error("Undefined variable referenced in expression", path[0].var_name)
+        for depth, var_ref in enumerate(path):
+            if (depth > 0):
+                struct_name = var_type.type_name.lexeme
+                if (var_type.is_array or struct_name not in self.structs):
+                    self.error('Undefined variable type', var_ref.var_name)
+                var_type = self.get_field_type(self.structs[struct_name], var_ref.var_name.lexeme)
+                if (var_type is None):
+                    self.error("Undefined variable referenced in expression", var_ref.var_name)
+                var_ref.offset = self.get_field_offset(self.structs[struct_name], var_ref.var_name.lexeme)
+            if (var_ref.array_expr):
+                if (not var_type.is_array):
+                    self.error("Array index on non-array variable", var_ref.var_name)
+                var_ref.array_expr.accept(self)
+                if (self.curr_type.type_name.lexeme != 'int' or self.curr_type.is_array):
+                    self.error("Array index must be an int", var_ref.var_name)
+                var_type = DataType(False, var_type.type_name)
+            var_ref.type = var_type
+        return var_type
 
     def check_built_ins(self, args, type1, function):
         if (len(args) != 1):
@@ -415,3 +474,11 @@ class SemanticChecker(Visitor):
         arg1 = self.curr_type
         if (arg1.type_name.lexeme != type1):
             self.error('invalid argument for built-in function', function)
+
+    def check_built_in_args(self, args, types, function):
+        if (len(args) != len(types)):
+            self.error("Invalid number of args for built-in function", function)
+        for arg, arg_type in zip(args, types):
+            arg.accept(self)
+            if (self.curr_type.type_name.lexeme != arg_type or self.curr_type.is_array):
+                self.error('invalid argument for built-in function', function)
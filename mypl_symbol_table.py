@@ -12,6 +12,9 @@ class SymbolTable:
 
     def __init__(self):
         """Create an empty symbol table."""
+        # name -> stack of (environment depth, info), innermost last
+        self.bindings = {}
+        # per environment undo log of the names it added
         self.environments = []
 
         
@@ -22,12 +25,16 @@ class SymbolTable:
 
     def __repr__(self):
         """Returns a string representation of the environments."""
-        return str(self.environments)
+        envs = [{} for _ in self.environments]
+        for name, stack in self.bindings.items():
+            for depth, info in stack:
+                envs[depth - 1][name] = info
+        return str(envs)
 
     
     def push_environment(self):
         """Add a new environment to the symbol table."""
-        self.environments.append({})
+        self.environments.append([])
 
         
     def pop_environment(self):
@@ -35,7 +42,11 @@ class SymbolTable:
 
         """
         if self.environments:
-            self.environments.pop()
+            for name in self.environments.pop():
+                stack = self.bindings[name]
+                stack.pop()
+                if not stack:
+                    del self.bindings[name]
 
 
     def add(self, name, info):
@@ -46,7 +57,13 @@ class SymbolTable:
             info -- The info to associate to the name.
         """
         if self.environments:
-            self.environments[-1][name] = info
+            depth = len(self.environments)
+            stack = self.bindings.setdefault(name, [])
+            if stack and stack[-1][0] == depth:
+                stack[-1] = (depth, info)
+            else:
+                stack.append((depth, info))
+                self.environments[-1].append(name)
 
             
     def exists(self, name):
@@ -56,10 +73,7 @@ class SymbolTable:
             name: The name to search for.
 
         """
-        for i in range(1, len(self)+1): 
-            if name in self.environments[-i]:
-                return True
-        return False
+        return name in self.bindings
 
     
     def exists_in_curr_env(self, name):
@@ -70,7 +84,8 @@ class SymbolTable:
             name: The name to search for.
 
         """
-        return self.environments and name in self.environments[-1]
+        stack = self.bindings.get(name)
+        return bool(stack) and stack[-1][0] == len(self.environments)
 
     
     def get(self, name):
@@ -81,10 +96,7 @@ class SymbolTable:
             name: The name whose info is to be returned.
 
         """
-        n = len(self)
-        for i in range(1, len(self)+1):
-            if name in self.environments[-i]:
-                return self.environments[-i][name]
+        stack = self.bindings.get(name)
+        if stack:
+            return stack[-1][1]
         return None
-
-    
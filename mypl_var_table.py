@@ -11,6 +11,9 @@ class VarTable:
 
     def __init__(self):
         """Create an empty var table"""
+        # var name -> stack of offsets (innermost declaration last)
+        self.offsets = {}
+        # per environment undo log of the var names it added
         self.environments = []
         self.total_vars = 0
         
@@ -35,8 +38,13 @@ class VarTable:
 
         """
         if self.environments:
-            self.total_vars -= len(self.environments[-1])
-            self.environments.pop()
+            added = self.environments.pop()
+            for var_name in added:
+                offsets = self.offsets[var_name]
+                offsets.pop()
+                if not offsets:
+                    del self.offsets[var_name]
+            self.total_vars -= len(added)
 
             
     def add(self, var_name):
@@ -48,6 +56,7 @@ class VarTable:
         """
         if self.environments:
             self.environments[-1].append(var_name)
+            self.offsets.setdefault(var_name, []).append(self.total_vars)
             self.total_vars += 1
             
             
@@ -59,11 +68,7 @@ class VarTable:
             var_name -- The variable to lookup in the table.
 
         """
-        num_remaining = self.total_vars
-        for i in range(1, len(self) + 1):
-            num_remaining -= len(self.environments[-i])
-            if var_name in self.environments[-i]:
-                return num_remaining + self.environments[-i].index(var_name)
+        offsets = self.offsets.get(var_name)
+        if offsets:
+            return offsets[-1]
         return None
-
-    
@@ -0,0 +1,188 @@
+"""Bytecode verifier for MyPL VM frame templates.
+
+Checks each frame template before it runs:
+
+  * jump offsets are in range, and CALL/TAILCALL targets exist
+  * the operand stack never underflows (including CALL arguments and
+    RET values), and every path reaching an instruction agrees on the
+    stack depth there
+  * every variable slot loaded is a parameter or is stored somewhere
+
+While computing stack depths it also tracks which operand stack values
+are provably non-null (literals, operator results, new objects, and
+copies of them). An instruction whose null-checked operands are all
+non-null is replaced by its unchecked variant (e.g., SETF by SETFU), so
+the VM skips the check.
+
+A verified template records its number of variable slots (var_count).
+The VM preallocates the variables of frames for verified templates, so
+their STOREs never need to grow the variable list.
+
+NAME: Jake VanZyverden
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+from mypl_error import VMError
+from mypl_opcode import OpCode
+from mypl_frame import VMFrameTemplate, slot_count
+from mypl_cfg import JUMPS, EXITS, STACK_EFFECTS
+
+
+# opcodes pushing a value that is never null
+NON_NULL_RESULTS = [
+    OpCode.ADD, OpCode.SUB, OpCode.MUL, OpCode.DIV, OpCode.CMPLT,
+    OpCode.CMPLE, OpCode.CMPEQ, OpCode.CMPNE, OpCode.AND, OpCode.OR,
+    OpCode.NOT, OpCode.ADDI, OpCode.ADDD, OpCode.CONCAT, OpCode.SUBI,
+    OpCode.SUBD, OpCode.MULI, OpCode.MULD, OpCode.DIVI, OpCode.DIVD,
+    OpCode.CMPLTI, OpCode.CMPLEI, OpCode.NOTU, OpCode.READALL, OpCode.READN,
+    OpCode.LEN, OpCode.LENU, OpCode.GETC, OpCode.TOINT, OpCode.TODBL,
+    OpCode.TOSTR, OpCode.TOSTRU, OpCode.FOPEN, OpCode.ALLOCS, OpCode.ALLOCA,
+]
+
+# opcode -> (positions, from the top of the stack (0 = top), of the
+# operands the VM checks for null, variant without the checks)
+UNCHECKED_OPS = {
+    OpCode.NOT: ([0], OpCode.NOTU),
+    OpCode.LEN: ([0], OpCode.LENU),
+    OpCode.TOSTR: ([0], OpCode.TOSTRU),
+    OpCode.SETF: ([1], OpCode.SETFU),
+    OpCode.GETF: ([0], OpCode.GETFU),
+}
+
+
+class Verifier:
+
+    def __init__(self):
+        """Creates a bytecode verifier."""
+        # number of templates verified
+        self.verified = 0
+        # number of runtime null checks removed
+        self.unchecked = 0
+
+    def summary(self):
+        """Returns a short description of what the pass did."""
+        return (f'{self.verified} function(s) verified, '
+                f'{self.unchecked} null check(s) removed')
+
+    def optimize(self, vm):
+        """Verifies each of the VM's frame templates, reporting all
+        problems found as a single VM error.
+
+        """
+        problems = []
+        for template in vm.frame_templates.values():
+            problems.extend(self.verify(template, vm.frame_templates))
+        if problems:
+            raise VMError('Verification failed: ' + '; '.join(problems))
+
+    def verify(self, template, templates):
+        """Verifies a frame template. If it has no problems, sets its
+        var_count and removes its redundant null checks. Returns the list
+        of problems found.
+
+        Args:
+            template -- The VMFrameTemplate to verify.
+            templates -- Function name -> VMFrameTemplate.
+
+        """
+        name = template.function_name
+        instrs = template.instructions
+        problems = self.check_operands(template, templates)
+        if problems:
+            return problems
+        # pc -> tuple of non-null flags, one per operand stack value
+        stacks = {0: ()} if instrs else {}
+        work = [0] if instrs else []
+        while work:
+            pc = work.pop()
+            stack = stacks[pc]
+            instr = instrs[pc]
+            pops, pushes = STACK_EFFECTS[instr.opcode]
+            if pops is None:
+                pops = self.callee(instr, templates).arg_count
+            if pops > len(stack):
+                problems.append(f'stack underflow (in {name} at {pc}: {instr})')
+                continue
+            stack = self.transfer(instr, stack, pops, pushes)
+            for succ in self.successors(instr, pc, len(instrs)):
+                if succ not in stacks:
+                    stacks[succ] = stack
+                    work.append(succ)
+                elif len(stacks[succ]) != len(stack):
+                    problems.append(f'inconsistent stack depth '
+                                    f'(in {name} at {succ}: {instrs[succ]})')
+                else:
+                    merged = tuple(a and b for a, b in zip(stacks[succ], stack))
+                    if merged != stacks[succ]:
+                        stacks[succ] = merged
+                        work.append(succ)
+        if problems:
+            return problems
+        for pc, stack in stacks.items():
+            if instrs[pc].opcode not in UNCHECKED_OPS:
+                continue
+            checked, unchecked = UNCHECKED_OPS[instrs[pc].opcode]
+            if all(stack[-1 - i] for i in checked):
+                instrs[pc].opcode = unchecked
+                self.unchecked += 1
+        template.var_count = slot_count(template)
+        self.verified += 1
+        return []
+
+    def check_operands(self, template, templates):
+        """Returns the problems with a template's jump offsets, call
+        targets, and variable slots.
+
+        """
+        name = template.function_name
+        instrs = template.instructions
+        stored = set(range(template.arg_count))
+        stored.update(i.operand for i in instrs if i.opcode == OpCode.STORE)
+        problems = []
+        for pc, instr in enumerate(instrs):
+            where = f'(in {name} at {pc}: {instr})'
+            if instr.opcode in JUMPS:
+                if not isinstance(instr.operand, int) or not 0 <= instr.operand <= len(instrs):
+                    problems.append(f'invalid jump offset {where}')
+            elif instr.opcode in [OpCode.CALL, OpCode.TAILCALL]:
+                if self.callee(instr, templates) is None:
+                    problems.append(f'unknown function {where}')
+            elif instr.opcode == OpCode.LOAD:
+                if instr.operand not in stored:
+                    problems.append(f'load of unset variable {where}')
+        return problems
+
+    def callee(self, instr, templates):
+        """Returns the template a CALL or TAILCALL calls (or None)."""
+        if isinstance(instr.operand, VMFrameTemplate):
+            return instr.operand
+        return templates.get(instr.operand)
+
+    def transfer(self, instr, stack, pops, pushes):
+        """Returns the non-null flags of the operand stack after the
+        instruction runs.
+
+        """
+        rest = stack[:len(stack) - pops]
+        if instr.opcode == OpCode.DUP:
+            return stack + stack[-1:]
+        if instr.opcode == OpCode.PUSH:
+            return rest + (instr.operand is not None,)
+        return rest + (instr.opcode in NON_NULL_RESULTS,) * pushes
+
+    def successors(self, instr, pc, count):
+        """Returns the offsets that may run after the instruction (an
+        offset equal to the instruction count ends the function).
+
+        """
+        if instr.opcode in EXITS:
+            return []
+        if instr.opcode == OpCode.JMP:
+            targets = [instr.operand]
+        elif instr.opcode == OpCode.JMPF:
+            targets = [pc + 1, instr.operand]
+        else:
+            targets = [pc + 1]
+        return [target for target in targets if target < count]
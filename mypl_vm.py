@@ -6,27 +6,121 @@ CLASS: CPSC 326
 
 """
 
+import operator
+from collections import OrderedDict
 from mypl_error import *
 from mypl_opcode import *
 from mypl_frame import *
+from mypl_output import OutputBuffer
+from mypl_input import InputBuffer
+from mypl_files import FILE_MODES, open_file
+
+
+def divide_doubles(y, x):
+    """Returns y / x, with the same zero check as a generic DIV."""
+    if (int(x) == 0):
+        raise ZeroDivisionError()
+    return y / x
+
+
+# unchecked array accesses -> their checked versions
+CHECKED_ARRAY_OPS = {OpCode.GETIU: OpCode.GETI, OpCode.SETIU: OpCode.SETI}
+
+# type-specialized operators (the operand types were checked statically,
+# so only null operands and division by zero are caught at runtime)
+TYPED_OPS = {
+    OpCode.ADDI: operator.add, OpCode.ADDD: operator.add,
+    OpCode.CONCAT: operator.add,
+    OpCode.SUBI: operator.sub, OpCode.SUBD: operator.sub,
+    OpCode.MULI: operator.mul, OpCode.MULD: operator.mul,
+    OpCode.DIVI: operator.floordiv, OpCode.DIVD: divide_doubles,
+    OpCode.CMPLTI: operator.lt, OpCode.CMPLEI: operator.le,
+}
+
+
+# marks a memoization cache miss (None is a valid result)
+MISSING = object()
+
+
+class MemoCache:
+
+    def __init__(self, size):
+        """Creates an empty least-recently-used cache of function results.
+
+        Args:
+            size -- The most results to keep.
+
+        """
+        self.size = size
+        # (function name, argument tuple) -> result, least recent first
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, key):
+        """Returns the cached result for the key (or MISSING)."""
+        result = self.entries.get(key, MISSING)
+        if result is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return result
+
+    def store(self, key, result):
+        """Caches a result, evicting the least recently used one if the
+        cache is full.
+
+        """
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        """Returns the cache statistics as a string."""
+        return (f'memo: {self.hits} hit(s), {self.misses} miss(es), '
+                f'{len(self.entries)} cached, {self.evictions} eviction(s)')
 
 
 class VM:
 
-    def __init__(self):
-        """Creates a VM."""
+    def __init__(self, check_bounds=False, memo_size=0, output=None,
+                 source=None):
+        """Creates a VM.
+
+        Args:
+            check_bounds -- If True, unchecked array accesses (GETIU and
+                            SETIU) are checked like GETI and SETI.
+            memo_size -- The number of pure function results to cache
+                         (0 turns memoization off).
+            output -- Where the program's output is written: any object
+                      with a write(text) method (standard output if
+                      None).
+            source -- Where the program's input is read from: any binary
+                      object with a read(n) method (standard input if
+                      None).
+
+        """
         self.struct_heap = {}        # id -> dict
         self.array_heap = {}         # id -> list
+        self.file_heap = {}          # id -> FileHandle
         self.next_obj_id = 2024      # next available object id (int)
         self.frame_templates = {}    # function name -> VMFrameTemplate
         self.call_stack = []         # function call stack
+        self.check_bounds = check_bounds
+        self.memo = MemoCache(memo_size) if memo_size > 0 else None
+        self.output = OutputBuffer(output)
+        self.input = InputBuffer(source)
 
     
     def __repr__(self):
         """Returns a string representation of frame templates."""
         s = ''
         for name, template in self.frame_templates.items():
-            s += f'\nFrame {name}\n'
+            s += f'\nFrame {name} (args: {template.arg_count})\n'
             for i in range(len(template.instructions)):
                 s += f'  {i}: {template.instructions[i]}\n'
         return s
@@ -42,8 +136,67 @@ class VM:
         self.frame_templates[template.function_name] = template
 
     
+    def link(self):
+        """Replaces each CALL (and TAILCALL) operand (a function name) with
+        a direct reference to the called function's frame template.
+        Reports all unresolved call targets as a single VM error. If
+        bounds checks are forced on, unchecked array accesses are turned
+        back into checked ones.
+
+        """
+        unresolved = []
+        for template in self.frame_templates.values():
+            for instr in template.instructions:
+                if self.check_bounds and instr.opcode in CHECKED_ARRAY_OPS:
+                    instr.opcode = CHECKED_ARRAY_OPS[instr.opcode]
+                if instr.opcode not in [OpCode.CALL, OpCode.TAILCALL]:
+                    continue
+                if isinstance(instr.operand, VMFrameTemplate):
+                    continue
+                target = self.frame_templates.get(instr.operand)
+                if target is None:
+                    unresolved.append(f'{instr.operand} (in {template.function_name})')
+                else:
+                    instr.operand = target
+        if unresolved:
+            self.error('Unresolved call target(s): ' + ', '.join(unresolved))
+
+    
+    def frame_variables(self, template, args):
+        """Returns the variable list for a new frame of the template,
+        starting with the arguments (preallocated to the template's
+        var_count if the verifier set it).
+
+        """
+        if template.var_count is not None and template.var_count > len(args):
+            return args + [None] * (template.var_count - len(args))
+        return args
+
+    
+    def flush(self):
+        """Writes the program's buffered output, and the buffered writes
+        to its open files (a failed file write is reported when the file
+        is closed).
+
+        """
+        self.output.flush()
+        for handle in self.file_heap.values():
+            try:
+                handle.flush()
+            except (OSError, ValueError):
+                pass
+
+    
+    def file_handle(self, fid, frame):
+        """Returns the open file with the given id."""
+        if fid not in self.file_heap:
+            self.error("Invalid file handle", frame)
+        return self.file_heap[fid]
+
+    
     def error(self, msg, frame=None):
         """Report a VM error."""
+        self.flush()
         if not frame:
             raise VMError(msg)
         pc = frame.pc - 1
@@ -63,8 +216,22 @@ class VM:
         # grab the "main" function frame and instantiate it
         if not 'main' in self.frame_templates:
             self.error('No "main" functrion')
+        self.link()
         frame = VMFrame(self.frame_templates['main'])
+        frame.variables = self.frame_variables(frame.template, [])
         self.call_stack.append(frame)
+        # output is written and files are closed however the run ends
+        completed = False
+        try:
+            self.run_loop(frame, debug)
+            completed = True
+        finally:
+            # a failed run reports its own error, not a close error
+            self.finish(completed)
+
+    
+    def run_loop(self, frame, debug=False):
+        """Runs instructions starting from the given (main) frame."""
 
         # run loop (continue until run out of call frames or instructions)
         while self.call_stack and frame.pc < len(frame.template.instructions):
@@ -74,6 +241,7 @@ class VM:
             frame.pc += 1
             # for debugging:
             if debug:
+                self.output.flush()
                 print('\n')
                 print('\t FRAME.........:', frame.template.function_name)
                 print('\t PC............:', frame.pc)
@@ -100,9 +268,12 @@ class VM:
             elif instr.opcode == OpCode.STORE:
                 data = frame.operand_stack.pop()
                 index = instr.operand
-                if (len(frame.variables) == index):
-                    frame.variables.append(data)
-                else:
+                try:
+                    frame.variables[index] = data
+                except IndexError:
+                    # unverified frames grow as needed (slots may be
+                    # skipped, e.g., by inlined code)
+                    frame.variables.extend([None] * (index + 1 - len(frame.variables)))
                     frame.variables[index] = data
 
 
@@ -110,6 +281,17 @@ class VM:
             #------------------------------------------------------------
             # Operations
             #------------------------------------------------------------
+            elif instr.opcode in TYPED_OPS:
+                x = frame.operand_stack.pop()
+                y = frame.operand_stack.pop()
+                try:
+                    result = TYPED_OPS[instr.opcode](y, x)
+                except TypeError:
+                    # a null operand
+                    self.error('Invalid value in operation', frame)
+                except ZeroDivisionError:
+                    self.error('Invalid value for operation', frame)
+                frame.operand_stack.append(result)
             elif (instr.opcode == OpCode.ADD
             or instr.opcode == OpCode.SUB
             or instr.opcode == OpCode.MUL
@@ -124,15 +306,14 @@ class VM:
                 x = frame.operand_stack.pop()
                 y = frame.operand_stack.pop()
                 result = self.do_operation(x, y, instr.opcode.name)
-                if (result is True or result is False):
-                    result = "true" if (result) else "false"
                 frame.operand_stack.append(result)
             elif instr.opcode == OpCode.NOT:
                 x = frame.operand_stack.pop()
                 if (x is None):
                     self.error("Invalid value for not operation")
-                result = "true" if (not x) else "false"
-                frame.operand_stack.append(result)
+                frame.operand_stack.append(not x)
+            elif instr.opcode == OpCode.NOTU:
+                frame.operand_stack.append(not frame.operand_stack.pop())
             
 
             #------------------------------------------------------------
@@ -146,8 +327,6 @@ class VM:
             elif instr.opcode == OpCode.JMPF:
                 offset = instr.operand
                 x = frame.operand_stack.pop()
-                if (x == 'true' or x == 'false'):
-                    x = True if (x == 'true') else False
                 if (not x):
                     frame.pc = offset
                     
@@ -157,16 +336,35 @@ class VM:
 
 
             elif instr.opcode == OpCode.CALL:
-                fun_name = instr.operand
-                new_frame_template = self.frame_templates[fun_name]
-                new_frame = VMFrame(new_frame_template)
+                # arguments move straight into the callee's first variables
+                arg_count = instr.operand.arg_count
+                args = frame.operand_stack[-arg_count:] if arg_count else []
+                if arg_count:
+                    del frame.operand_stack[-arg_count:]
+                new_frame = VMFrame(instr.operand)
+                if self.memo and instr.operand.pure:
+                    # a cached result of a pure function replaces the call
+                    key = (instr.operand.function_name, tuple(args))
+                    result = self.memo.lookup(key)
+                    if result is not MISSING:
+                        frame.operand_stack.append(result)
+                        continue
+                    new_frame.memo_key = key
+                new_frame.variables = self.frame_variables(instr.operand, args)
                 self.call_stack.append(new_frame)
-                for i in range(new_frame.template.arg_count):
-                    arg = frame.operand_stack.pop()
-                    new_frame.operand_stack.append(arg)
                 frame = new_frame
+            elif instr.opcode == OpCode.TAILCALL:
+                # the current frame is reused for the callee
+                arg_count = instr.operand.arg_count
+                args = frame.operand_stack[-arg_count:] if arg_count else []
+                frame.template = instr.operand
+                frame.pc = 0
+                frame.variables = self.frame_variables(instr.operand, args)
+                frame.operand_stack = []
             elif instr.opcode == OpCode.RET:
                 ret_val = frame.operand_stack.pop()
+                if frame.memo_key is not None:
+                    self.memo.store(frame.memo_key, ret_val)
                 self.call_stack.pop()
                 if (self.call_stack):
                     frame = self.call_stack[-1]
@@ -181,15 +379,25 @@ class VM:
                 val = frame.operand_stack.pop()
                 if (val is True or val is False):
                     val = str.lower(str(val))
-                if (val is None):
-                    print("null", end="")
-                    continue
-                val = str(val).replace('\\n', '\n')
-                val = val.replace('\\t', '\t')
-                print(val, end="")
+                elif (val is None):
+                    val = 'null'
+                # escapes were already processed by the code generator
+                self.output.write(str(val))
             elif instr.opcode == OpCode.READ:
-                val = input()
-                frame.operand_stack.append(val)
+                # show any pending output (e.g., a prompt) first
+                self.output.flush()
+                frame.operand_stack.append(self.input.readline())
+            elif instr.opcode in [OpCode.READALL, OpCode.READN]:
+                self.output.flush()
+                count = None
+                if instr.opcode == OpCode.READN:
+                    count = frame.operand_stack.pop()
+                    if (count is None or count < 0):
+                        self.error("Invalid value for line count", frame)
+                oid = self.next_obj_id
+                self.next_obj_id += 1
+                self.array_heap[oid] = self.input.readlines(count)
+                frame.operand_stack.append(oid)
             elif instr.opcode == OpCode.LEN:
                 val = frame.operand_stack.pop()
                 if (val is None):
@@ -198,6 +406,12 @@ class VM:
                     frame.operand_stack.append(len(val))
                 else:
                     frame.operand_stack.append(len(self.array_heap[val]))
+            elif instr.opcode == OpCode.LENU:
+                val = frame.operand_stack.pop()
+                if (type(val) == str):
+                    frame.operand_stack.append(len(val))
+                else:
+                    frame.operand_stack.append(len(self.array_heap[val]))
             elif instr.opcode == OpCode.GETC:
                 x = frame.operand_stack.pop()
                 y = frame.operand_stack.pop()
@@ -225,6 +439,45 @@ class VM:
                 if (x is None):
                     self.error("Cannot convert null value to string")
                 frame.operand_stack.append(str(x))
+            elif instr.opcode == OpCode.TOSTRU:
+                frame.operand_stack.append(str(frame.operand_stack.pop()))
+            elif instr.opcode == OpCode.FOPEN:
+                mode = frame.operand_stack.pop()
+                path = frame.operand_stack.pop()
+                if (mode is None or path is None):
+                    self.error("Cannot open file with null path or mode", frame)
+                if (mode not in FILE_MODES):
+                    self.error(f'Invalid file mode "{mode}"', frame)
+                try:
+                    handle = open_file(path, mode)
+                except (OSError, ValueError):
+                    self.error(f"Could not open file '{path}'", frame)
+                fid = self.next_obj_id
+                self.next_obj_id += 1
+                self.file_heap[fid] = handle
+                frame.operand_stack.append(fid)
+            elif instr.opcode in [OpCode.FREAD, OpCode.FWRITE]:
+                x = None
+                if instr.opcode == OpCode.FWRITE:
+                    x = frame.operand_stack.pop()
+                    if (x is None):
+                        self.error("Cannot write null value to file", frame)
+                handle = self.file_handle(frame.operand_stack.pop(), frame)
+                try:
+                    if instr.opcode == OpCode.FREAD:
+                        frame.operand_stack.append(handle.readline())
+                    else:
+                        handle.write(x)
+                except (OSError, ValueError) as ex:
+                    self.error(f'File error: {ex}', frame)
+            elif instr.opcode == OpCode.FCLOSE:
+                fid = frame.operand_stack.pop()
+                handle = self.file_handle(fid, frame)
+                del self.file_heap[fid]
+                try:
+                    handle.close()
+                except (OSError, ValueError) as ex:
+                    self.error(f'File error: {ex}', frame)
 
             
             
@@ -249,6 +502,13 @@ class VM:
                 if (x is None):
                     self.error("Invalid value for OID for struct")
                 frame.operand_stack.append(self.struct_heap[x][instr.operand])
+            elif instr.opcode == OpCode.SETFU:
+                x = frame.operand_stack.pop()
+                y = frame.operand_stack.pop()
+                self.struct_heap[y][instr.operand] = x
+            elif instr.opcode == OpCode.GETFU:
+                x = frame.operand_stack.pop()
+                frame.operand_stack.append(self.struct_heap[x][instr.operand])
             elif instr.opcode == OpCode.ALLOCA:
                 oid = self.next_obj_id
                 self.next_obj_id += 1
@@ -274,6 +534,17 @@ class VM:
                 if (len(self.array_heap[y]) - 1 < x or x < 0):
                     self.error("Invalid index for array lookup")
                 frame.operand_stack.append(self.array_heap[y][x])
+            elif instr.opcode == OpCode.SETIU:
+                x = frame.operand_stack.pop()
+                y = frame.operand_stack.pop()
+                oid = frame.operand_stack.pop()
+                if (x is None):
+                    self.error("Invalid value for insert into array")
+                self.array_heap[oid][y] = x
+            elif instr.opcode == OpCode.GETIU:
+                x = frame.operand_stack.pop()
+                y = frame.operand_stack.pop()
+                frame.operand_stack.append(self.array_heap[y][x])
             
             
             #------------------------------------------------------------
@@ -292,6 +563,27 @@ class VM:
             else:
                 self.error(f'unsupported operation {instr}')
 
+    
+    def finish(self, report=True):
+        """Writes the program's buffered output and closes the files it
+        left open.
+
+        Args:
+            report -- If True, a file that fails to close is reported as
+                      a VM error (after the rest are closed).
+
+        """
+        self.output.flush()
+        problems = []
+        for handle in self.file_heap.values():
+            try:
+                handle.close()
+            except (OSError, ValueError) as ex:
+                problems.append(str(ex))
+        self.file_heap.clear()
+        if problems and report:
+            self.error('File error: ' + '; '.join(problems))
+
     def do_operation(self, x, y, op_name):
         if (x is None or y is None):
             if (op_name != "CMPEQ" and op_name != "CMPNE"):
@@ -0,0 +1,956 @@
+import pytest
+import io
+
+from mypl_error import *
+from mypl_iowrapper import *
+from mypl_lexer import *
+from mypl_ast_parser import *
+from mypl_semantic_checker import *
+from mypl_constant_folder import *
+from mypl_code_gen import *
+from mypl_peephole import *
+from mypl_licm import *
+from mypl_cse import *
+from mypl_escape import *
+from mypl_bounds import *
+from mypl_cfg import *
+from mypl_inliner import *
+from mypl_passes import *
+from mypl_verifier import *
+from mypl_dce import *
+from mypl_purity import *
+from mypl_assembler import *
+from mypl_vm import *
+import mypl_vm
+
+
+def build(program, fold=True, peephole=False, passes=(), check_bounds=False,
+          memo_size=0):
+    vm = VM(check_bounds, memo_size)
+    ast = ASTParser(Lexer(FileWrapper(io.StringIO(program)))).parse()
+    ast.accept(SemanticChecker())
+    if fold:
+        ast.accept(ConstantFolder())
+    # AST pass objects (kept by the caller to check their counts)
+    for opt_pass in passes:
+        ast.accept(opt_pass)
+    ast.accept(CodeGenerator(vm))
+    if peephole:
+        PeepholeOptimizer().optimize(vm)
+    return vm
+
+
+def run(program, fold, capsys, peephole=False):
+    build(program, fold, peephole).run()
+    return capsys.readouterr().out
+
+
+def opcodes(vm, name='main'):
+    return [instr.opcode for instr in vm.frame_templates[name].instructions]
+
+
+#----------------------------------------------------------------------
+# Constant folding
+#----------------------------------------------------------------------
+
+def test_fold_matches_vm(capsys):
+    program = (
+        'void main() { \n'
+        '   print(itos(1 + 2 * 3) + " "); \n'
+        '   print(itos(7 / 2) + " " + itos(0 - 7 / 2) + " "); \n'
+        '   print(dtos(7.0 / 2.0) + " " + dtos(1.5 * 2.0) + " "); \n'
+        '   print("a" + "b" + " "); \n'
+        '   print(1 < 2); \n'
+        '   print(2 >= 3); \n'
+        '   print("a" < "b"); \n'
+        '   print(not (1 < 2) or 3 > 2); \n'
+        '   print((2 < 1) and (1 < 2)); \n'
+        '   print(null == null); \n'
+        '   print(not true); \n'
+        '} \n'
+    )
+    assert run(program, True, capsys) == run(program, False, capsys)
+    assert run(program, True, capsys) == '7 3 -3 3.5 3.0 ab truefalsetruefalsefalsetruefalse'
+
+def test_fold_to_single_push():
+    program = (
+        'void main() { \n'
+        '   int x = (1 + 2) * (10 - 4) / 3; \n'
+        '} \n'
+    )
+    vm = build(program)
+    instrs = vm.frame_templates['main'].instructions
+    assert instrs[0].opcode == OpCode.PUSH and instrs[0].operand == 6
+    assert OpCode.MUL not in opcodes(vm)
+
+def test_fold_keeps_division_by_zero():
+    program = (
+        'void main() { \n'
+        '   int x = 1 / (2 - 2); \n'
+        '} \n'
+    )
+    vm = build(program)
+    assert OpCode.DIVI in opcodes(vm)
+    with pytest.raises(MyPLError) as e:
+        vm.run()
+    assert str(e.value).startswith('VM Error')
+
+def test_fold_keeps_null_arithmetic():
+    program = (
+        'void main() { \n'
+        '   int x = null; \n'
+        '   int y = 1 + null; \n'
+        '} \n'
+    )
+    vm = build(program)
+    assert OpCode.ADD in opcodes(vm)
+
+def test_fold_partial(capsys):
+    program = (
+        'void main() { \n'
+        '   int x = 4; \n'
+        '   print(itos(x * 2 + 3)); \n'
+        '} \n'
+    )
+    vm = build(program)
+    assert OpCode.PUSH in opcodes(vm)
+    assert OpCode.ADD not in opcodes(vm)
+    vm.run()
+    assert capsys.readouterr().out == '20'
+
+def test_fold_leaves_escapes():
+    program = (
+        'void main() { \n'
+        '   print("a\\t" + "b\\n"); \n'
+        '} \n'
+    )
+    assert OpCode.CONCAT in opcodes(build(program))
+
+
+#----------------------------------------------------------------------
+# Peephole optimizer
+#----------------------------------------------------------------------
+
+CONTROL_FLOW = (
+    'int fib(int n) { \n'
+    '   if (n < 2) { return n; } \n'
+    '   elseif (n == 2) { return 1; } \n'
+    '   else { return fib(n - 1) + fib(n - 2); } \n'
+    '} \n'
+    'void main() { \n'
+    '   for (int i = 0; i < 10; i = i + 1) { \n'
+    '      int j = 0; \n'
+    '      while (j < i) { j = j + 1; } \n'
+    '      if (j == 3) { print("three "); } \n'
+    '      elseif (j == 4) { print("four "); } \n'
+    '      else { print(itos(fib(j)) + " "); } \n'
+    '   } \n'
+    '} \n'
+)
+
+def test_peephole_matches_unoptimized(capsys):
+    expected = '0 1 1 three four 5 8 13 21 34 '
+    assert run(CONTROL_FLOW, True, capsys) == expected
+    assert run(CONTROL_FLOW, True, capsys, peephole=True) == expected
+
+def test_peephole_removes_nops():
+    vm = build(CONTROL_FLOW, peephole=True)
+    for name in vm.frame_templates:
+        assert OpCode.NOP not in opcodes(vm, name)
+    # unreachable code after the final return is dropped
+    assert opcodes(vm, 'fib_int')[-2:] == [OpCode.ADDI, OpCode.RET]
+
+def test_peephole_threads_jumps(capsys):
+    source = (
+        'Frame main \n'
+        '  0: JMP(3) \n'
+        '  1: PUSH("skipped") \n'
+        '  2: WRITE() \n'
+        '  3: JMP(4) \n'
+        '  4: JMP(6) \n'
+        '  5: NOP() \n'
+        '  6: PUSH(1) \n'
+        '  7: POP() \n'
+        '  8: PUSH("done") \n'
+        '  9: WRITE() \n'
+        '  10: PUSH() \n'
+        '  11: RET() \n'
+    )
+    vm = Assembler(VM()).assemble(source)
+    PeepholeOptimizer().optimize(vm)
+    assert opcodes(vm) == [OpCode.PUSH, OpCode.WRITE, OpCode.PUSH, OpCode.RET]
+    vm.run()
+    assert capsys.readouterr().out == 'done'
+
+def test_peephole_keeps_jump_target_pop():
+    source = (
+        'Frame main \n'
+        '  0: PUSH(1) \n'
+        '  1: PUSH(True) \n'
+        '  2: JMPF(4) \n'
+        '  3: PUSH(2) \n'
+        '  4: POP() \n'
+        '  5: PUSH() \n'
+        '  6: RET() \n'
+    )
+    vm = Assembler(VM()).assemble(source)
+    PeepholeOptimizer().optimize(vm)
+    assert OpCode.POP in opcodes(vm)
+
+
+#----------------------------------------------------------------------
+# Control-flow graph and pass manager
+#----------------------------------------------------------------------
+
+def test_cfg_blocks():
+    source = (
+        'Frame main \n'
+        '  0: PUSH(True) \n'
+        '  1: JMPF(5) \n'
+        '  2: PUSH("then") \n'
+        '  3: WRITE() \n'
+        '  4: JMP(7) \n'
+        '  5: PUSH("else") \n'
+        '  6: WRITE() \n'
+        '  7: PUSH() \n'
+        '  8: RET() \n'
+    )
+    vm = Assembler(VM()).assemble(source)
+    cfg = CFG(vm.frame_templates['main'], vm.frame_templates)
+    assert [len(b.instructions) for b in cfg.blocks] == [2, 3, 2, 2]
+    b0, b1, b2, b3 = cfg.blocks
+    assert b0.succs == [b1, b2]
+    assert b1.succs == [b3] and b2.succs == [b3]
+    assert b3.preds == [b1, b2] and b3.succs == []
+    cfg.annotate_stack_depths()
+    assert not cfg.depth_conflicts
+    assert [(b.stack_in, b.stack_out) for b in cfg.blocks] == [
+        (0, 0), (0, 0), (0, 0), (0, 0)]
+    assert cfg.max_stack == 1
+
+def test_cfg_stack_depths_consistent():
+    vm = build(CONTROL_FLOW)
+    for template in vm.frame_templates.values():
+        cfg = CFG(template, vm.frame_templates)
+        cfg.remove_unreachable()
+        cfg.annotate_stack_depths()
+        assert not cfg.depth_conflicts
+        # every loop and branch rejoins with an empty operand stack
+        for block in cfg.blocks:
+            if block.terminator.opcode in [OpCode.JMP, OpCode.RET]:
+                assert block.stack_out == 0
+
+def test_cfg_round_trip(capsys):
+    vm = build(CONTROL_FLOW)
+    for template in vm.frame_templates.values():
+        cfg = CFG(template, vm.frame_templates)
+        # reversing the non-entry blocks forces explicit fallthrough jumps
+        cfg.blocks[1:] = cfg.blocks[:0:-1]
+        template.instructions = cfg.to_instructions()
+    vm.run()
+    assert capsys.readouterr().out == '0 1 1 three four 5 8 13 21 34 '
+
+def test_pass_levels(capsys):
+    outputs = []
+    for level in OPT_LEVELS:
+        vm = VM()
+        ast = ASTParser(Lexer(FileWrapper(io.StringIO(CONTROL_FLOW)))).parse()
+        ast.accept(SemanticChecker())
+        pass_manager = PassManager.for_level(level)
+        pass_manager.run_ast_passes(ast)
+        ast.accept(CodeGenerator(vm))
+        pass_manager.run_code_passes(vm)
+        assert [t[0] for t in pass_manager.timings] == OPT_LEVELS[level]
+        vm.run()
+        outputs.append(capsys.readouterr().out)
+    assert outputs == ['0 1 1 three four 5 8 13 21 34 '] * len(OPT_LEVELS)
+
+def test_unknown_pass():
+    with pytest.raises(ValueError):
+        PassManager(['fold', 'bogus'])
+
+
+#----------------------------------------------------------------------
+# Loop-invariant code motion
+#----------------------------------------------------------------------
+
+LOOPS = (
+    'struct Node { int val; array int data; } \n'
+    'struct Box { Node n; } \n'
+    'void main() { \n'
+    '   array int xs = new int[5]; \n'
+    '   Box b = new Box(new Node(3, new int[4])); \n'
+    '   for (int k = 0; k < length(b.n.data); k = k + 1) { b.n.data[k] = k; } \n'
+    '   int sum = 0; \n'
+    '   for (int i = 0; i < length(xs); i = i + 1) { \n'
+    '      xs[i] = i * b.n.val; \n'
+    '      sum = sum + xs[i]; \n'
+    '   } \n'
+    '   int j = 0; \n'
+    '   while (j < b.n.data[3]) { \n'
+    '      int v = b.n.val + length(xs); \n'
+    '      sum = sum + v; \n'
+    '      j = j + 1; \n'
+    '   } \n'
+    '   print(itos(sum)); \n'
+    '} \n'
+)
+
+def test_licm_matches_unoptimized(capsys):
+    mover = LoopInvariantMover()
+    vm = build(LOOPS, fold=False, passes=[mover])
+    # length(b.n.data) and length(xs) from the for conditions, and
+    # b.n.data[3], b.n.val, and length(xs) from the while loop
+    assert mover.hoisted == 5
+    vm.run()
+    assert capsys.readouterr().out == run(LOOPS, False, capsys)
+    assert run(LOOPS, False, capsys) == '54'
+
+def test_licm_hoists_out_of_condition():
+    program = (
+        'void main() { \n'
+        '   array int xs = new int[100]; \n'
+        '   for (int i = 0; i < length(xs); i = i + 1) { xs[i] = i; } \n'
+        '} \n'
+    )
+    mover = LoopInvariantMover()
+    vm = build(program, fold=False, passes=[mover])
+    assert mover.hoisted == 1
+    # the only LEN is before the loop
+    ops = opcodes(vm)
+    assert ops.count(OpCode.LEN) == 1
+    assert ops.index(OpCode.LEN) < ops.index(OpCode.JMPF)
+
+def test_licm_keeps_written_fields(capsys):
+    program = (
+        'struct T { int x; int y; } \n'
+        'void main() { \n'
+        '   T t = new T(0, 5); \n'
+        '   while (t.x < t.y) { t.x = t.x + 1; } \n'
+        '   print(itos(t.x)); \n'
+        '} \n'
+    )
+    mover = LoopInvariantMover()
+    vm = build(program, fold=False, passes=[mover])
+    # t.y is invariant, t.x is written in the loop
+    assert mover.hoisted == 1
+    vm.run()
+    assert capsys.readouterr().out == '5'
+
+def test_licm_keeps_loads_across_calls(capsys):
+    program = (
+        'struct T { int x; } \n'
+        'void inc(T t) { t.x = t.x + 1; } \n'
+        'void main() { \n'
+        '   T t = new T(0); \n'
+        '   while (t.x < 3) { inc(t); } \n'
+        '   print(itos(t.x)); \n'
+        '} \n'
+    )
+    mover = LoopInvariantMover()
+    vm = build(program, fold=False, passes=[mover])
+    assert mover.hoisted == 0
+    vm.run()
+    assert capsys.readouterr().out == '3'
+
+def test_licm_zero_trip_loop(capsys):
+    program = (
+        'struct T { int x; } \n'
+        'void main() { \n'
+        '   T t = null; \n'
+        '   int i = 0; \n'
+        '   while (i < 0) { \n'
+        '      int v = t.x; \n'
+        '      i = i + v; \n'
+        '   } \n'
+        '   print("done"); \n'
+        '} \n'
+    )
+    mover = LoopInvariantMover()
+    vm = build(program, fold=False, passes=[mover])
+    # t.x is hoisted into a guard, so it isn't loaded from null
+    assert mover.hoisted == 1
+    vm.run()
+    assert capsys.readouterr().out == 'done'
+
+
+#----------------------------------------------------------------------
+# Inlining
+#----------------------------------------------------------------------
+
+HELPERS = (
+    'struct P { int x; int y; } \n'
+    'int getx(P p) { return p.x; } \n'
+    'int absv(int n) { if (n < 0) { return 0 - n; } return n; } \n'
+    'int norm1(P p) { return absv(p.x) + absv(p.y); } \n'
+    'int fact(int n) { if (n < 2) { return 1; } return n * fact(n - 1); } \n'
+    'void main() { \n'
+    '   P p = new P(3, 0 - 4); \n'
+    '   int t = 0; \n'
+    '   for (int i = 0; i < 3; i = i + 1) { \n'
+    '      t = t + getx(p) + norm1(p) + absv(i); \n'
+    '   } \n'
+    '   print(itos(t) + " " + itos(fact(5))); \n'
+    '} \n'
+)
+
+def test_inline_matches_unoptimized(capsys):
+    vm = build(HELPERS)
+    inliner = Inliner()
+    inliner.optimize(vm)
+    assert inliner.inlined == {('getx_P', 'main'): 1, ('absv_int', 'main'): 1,
+                               ('absv_int', 'norm1_P'): 2,
+                               ('norm1_P', 'main'): 1}
+    assert 'absv_int into norm1_P (2)' in inliner.summary()
+    # recursive functions are never inlined
+    calls = [i.operand for i in vm.frame_templates['main'].instructions
+             if i.opcode == OpCode.CALL]
+    assert calls == ['fact_int']
+    vm.run()
+    assert capsys.readouterr().out == run(HELPERS, False, capsys)
+    assert run(HELPERS, False, capsys) == '33 120'
+
+def test_inline_budget():
+    vm = build(HELPERS)
+    inliner = Inliner(max_size=6)
+    inliner.optimize(vm)
+    assert inliner.inlined == {('getx_P', 'main'): 1}
+    vm = build(HELPERS)
+    inliner = Inliner(budget=0)
+    inliner.optimize(vm)
+    assert inliner.inlined == {}
+
+def test_store_extends_variables(capsys):
+    source = (
+        'Frame main \n'
+        '  PUSH("x") \n'
+        '  STORE(3) \n'
+        '  LOAD(3) \n'
+        '  WRITE() \n'
+        '  PUSH() \n'
+        '  RET() \n'
+    )
+    Assembler(VM()).assemble(source).run()
+    assert capsys.readouterr().out == 'x'
+
+
+#----------------------------------------------------------------------
+# Tail calls
+#----------------------------------------------------------------------
+
+MUTUAL = (
+    'bool even(int n) { if (n == 0) { return true; } return odd(n - 1); } \n'
+    'bool odd(int n) { if (n == 0) { return false; } return even(n - 1); } \n'
+    'bool even(string s) { return (even(stoi(s))); } \n'
+    'int sum(int n, int acc) { \n'
+    '   if (n == 0) { return acc; } \n'
+    '   return sum(n - 1, acc + n); \n'
+    '} \n'
+    'void main() { \n'
+    '   print(even(10001)); \n'
+    '   print(even("2000")); \n'
+    '   print(" " + itos(sum(20000, 0))); \n'
+    '} \n'
+)
+
+def test_tail_calls(capsys, monkeypatch):
+    vm = build(MUTUAL, peephole=True)
+    assert opcodes(vm, 'even_int')[-1] == OpCode.TAILCALL
+    assert opcodes(vm, 'even_string') == [OpCode.LOAD, OpCode.TOINT,
+                                          OpCode.TAILCALL]
+    frames = []
+    def counting_frame(template):
+        frames.append(template)
+        return VMFrame(template)
+    monkeypatch.setattr(mypl_vm, 'VMFrame', counting_frame)
+    vm.run()
+    assert capsys.readouterr().out == 'falsetrue 200010000'
+    # main plus one frame per call from main
+    assert len(frames) == 4
+
+def test_non_tail_calls():
+    program = (
+        'int f(int n) { \n'
+        '   if (n < 1) { return 0; } \n'
+        '   return 1 + f(n - 1); \n'
+        '} \n'
+        'void main() { \n'
+        '   f(3); \n'
+        '} \n'
+    )
+    vm = build(program)
+    assert OpCode.TAILCALL not in opcodes(vm, 'f_int')
+    assert OpCode.TAILCALL not in opcodes(vm, 'main')
+
+
+#----------------------------------------------------------------------
+# Path load CSE
+#----------------------------------------------------------------------
+
+PATHS = (
+    'struct Node { int value; Node next; } \n'
+    'struct Row { array int cells; } \n'
+    'void main() { \n'
+    '   Node head = new Node(0, new Node(1, new Node(2, new Node(3, null)))); \n'
+    '   int s = head.next.next.value + head.next.next.next.value; \n'
+    '   head.next.next.value = head.next.next.value * 10; \n'
+    '   print(itos(s) + " " + itos(head.next.next.value) + " "); \n'
+    '   array Row grid = new Row[2]; \n'
+    '   grid[1] = new Row(new int[3]); \n'
+    '   int i = 1; \n'
+    '   grid[i].cells[0] = 4; \n'
+    '   grid[i].cells[1] = grid[i].cells[0] + 1; \n'
+    '   grid[i].cells[2] = grid[i].cells[0] + grid[i].cells[1]; \n'
+    '   print(itos(grid[i].cells[2])); \n'
+    '} \n'
+)
+
+def test_cse_matches_unoptimized(capsys):
+    eliminator = PathEliminator()
+    vm = build(PATHS, fold=False, passes=[eliminator])
+    assert eliminator.temps > 0
+    before = len(build(PATHS, fold=False).frame_templates['main'].instructions)
+    assert len(vm.frame_templates['main'].instructions) < before
+    vm.run()
+    assert capsys.readouterr().out == run(PATHS, False, capsys)
+    assert run(PATHS, False, capsys) == '5 20 9'
+
+def test_cse_invalidated_by_writes(capsys):
+    program = (
+        'struct T { int x; T next; } \n'
+        'void main() { \n'
+        '   T t = new T(1, new T(2, null)); \n'
+        '   int a = t.next.x + t.next.x; \n'
+        '   t.next = new T(5, null); \n'
+        '   int b = t.next.x + t.next.x; \n'
+        '   print(itos(a) + " " + itos(b)); \n'
+        '} \n'
+    )
+    eliminator = PathEliminator()
+    vm = build(program, fold=False, passes=[eliminator])
+    # t.next.x is loaded into a new temporary after t.next changes
+    assert eliminator.temps == 2
+    vm.run()
+    assert capsys.readouterr().out == '4 10'
+
+def test_cse_not_across_calls(capsys):
+    program = (
+        'struct T { int x; T next; } \n'
+        'void bump(T t) { t.next.x = t.next.x + 1; } \n'
+        'void main() { \n'
+        '   T t = new T(1, new T(2, null)); \n'
+        '   int a = t.next.x; \n'
+        '   bump(t); \n'
+        '   int b = t.next.x; \n'
+        '   bump(t); \n'
+        '   int c = t.next.x; \n'
+        '   print(itos(a + b + c)); \n'
+        '} \n'
+    )
+    eliminator = PathEliminator()
+    vm = build(program, fold=False, passes=[eliminator])
+    assert eliminator.temps == 0
+    vm.run()
+    assert capsys.readouterr().out == '9'
+
+
+#----------------------------------------------------------------------
+# Short-circuit and/or
+#----------------------------------------------------------------------
+
+SHORT_CIRCUIT = (
+    'struct T { int x; } \n'
+    'bool f() { print("f"); return true; } \n'
+    'void main() { \n'
+    '   array int a = new int[2]; \n'
+    '   a[0] = 5; \n'
+    '   for (int i = 0; (i < length(a)) and (a[i] != null); i = i + 1) { \n'
+    '      print(itos(a[i]) + " "); \n'
+    '   } \n'
+    '   T t = null; \n'
+    '   if ((t == null) or (t.x > 1)) { print("null "); } \n'
+    '   print(true or f()); \n'
+    '   print(false and f()); \n'
+    '   print(true and f()); \n'
+    '   print(false or f()); \n'
+    '   bool b = false; \n'
+    '   print(not (b and f())); \n'
+    '   print(not (b or f())); \n'
+    '} \n'
+)
+
+def test_short_circuit(capsys):
+    expected = '5 null truefalseftrueftruetrueffalse'
+    assert run(SHORT_CIRCUIT, False, capsys) == expected
+    assert run(SHORT_CIRCUIT, True, capsys) == expected
+    assert OpCode.AND not in opcodes(build(SHORT_CIRCUIT, False))
+    assert OpCode.OR not in opcodes(build(SHORT_CIRCUIT, False))
+
+def test_fold_short_circuit():
+    program = (
+        'bool f() { return true; } \n'
+        'void main() { \n'
+        '   bool x = false and f(); \n'
+        '   bool y = true and f(); \n'
+        '} \n'
+    )
+    vm = build(program)
+    calls = [i.operand for i in vm.frame_templates['main'].instructions
+             if i.opcode == OpCode.CALL]
+    # only the call that can run is kept
+    assert calls == ['f']
+
+def test_licm_skips_right_operand(capsys):
+    program = (
+        'void main() { \n'
+        '   array int a = new int[0]; \n'
+        '   int i = 0; \n'
+        '   while ((i < length(a)) and (a[0] > i)) { i = i + 1; } \n'
+        '   print(itos(i)); \n'
+        '} \n'
+    )
+    mover = LoopInvariantMover()
+    vm = build(program, fold=False, passes=[mover])
+    # length(a) is hoisted, a[0] would fault if loaded before the loop
+    assert mover.hoisted == 1
+    vm.run()
+    assert capsys.readouterr().out == '0'
+
+
+#----------------------------------------------------------------------
+# Type-specialized opcodes
+#----------------------------------------------------------------------
+
+TYPED = (
+    'void main() { \n'
+    '   int i = 7; \n'
+    '   double d = 2.5; \n'
+    '   string s = "a"; \n'
+    '   print(itos(i + 1) + " " + itos(i - 1) + " " + itos(i * 2) + " "); \n'
+    '   print(itos(i / 2) + " " + dtos(d * 2.0 - 1.0) + " " + dtos(d / 2.0)); \n'
+    '   print(" " + s + "b "); \n'
+    '   print((i < 8) and (i <= 7) and (i > 6) and (i >= 7)); \n'
+    '   print(" "); \n'
+    '   print("a" < s); \n'
+    '} \n'
+)
+
+def test_typed_opcodes(capsys):
+    vm = build(TYPED, False)
+    ops = opcodes(vm)
+    for opcode in [OpCode.ADDI, OpCode.SUBI, OpCode.MULI, OpCode.DIVI,
+                   OpCode.MULD, OpCode.SUBD, OpCode.DIVD, OpCode.CONCAT,
+                   OpCode.CMPLTI, OpCode.CMPLEI]:
+        assert opcode in ops
+    # strings compare with the generic opcode
+    assert OpCode.CMPLT in ops
+    assert OpCode.ADD not in ops
+    vm.run()
+    assert capsys.readouterr().out == '8 6 14 3 2.5 1.25 ab true false'
+
+def test_typed_opcodes_null_operand():
+    program = (
+        'void main() { \n'
+        '   int x = null; \n'
+        '   int y = x + 1; \n'
+        '} \n'
+    )
+    vm = build(program)
+    assert OpCode.ADDI in opcodes(vm)
+    with pytest.raises(MyPLError) as e:
+        vm.run()
+    assert str(e.value).startswith('VM Error')
+
+def test_typed_opcodes_division_by_zero():
+    program = (
+        'void main() { \n'
+        '   double x = 0.0; \n'
+        '   double y = 1.0 / x; \n'
+        '} \n'
+    )
+    vm = build(program)
+    assert OpCode.DIVD in opcodes(vm)
+    with pytest.raises(MyPLError) as e:
+        vm.run()
+    assert str(e.value).startswith('VM Error')
+
+def checked(program):
+    ast = ASTParser(Lexer(FileWrapper(io.StringIO(program)))).parse()
+    ast.accept(SemanticChecker())
+    return ast
+
+def test_checker_annotations():
+    program = (
+        'struct P { int x; array double ys; } \n'
+        'int f(int n) { return n; } \n'
+        'void main() { \n'
+        '   P p = new P(1, new double[2]); \n'
+        '   int z = f(p.x) + 1; \n'
+        '   bool b = p.ys[0] < 1.0; \n'
+        '} \n'
+    )
+    stmts = checked(program).fun_defs[1].stmts
+    new_rvalue = stmts[0].expr.first.rvalue
+    assert new_rvalue.type.type_name.lexeme == 'P'
+    assert new_rvalue.struct_params[1].first.rvalue.type.is_array
+    expr = stmts[1].expr
+    call = expr.first.rvalue
+    assert call.target == 'f_int' and call.type.type_name.lexeme == 'int'
+    x = call.args[0].first.rvalue.path[1]
+    assert x.type.type_name.lexeme == 'int' and x.offset == 0
+    assert expr.type.type_name.lexeme == 'int'
+    expr = stmts[2].expr
+    ys = expr.first.rvalue.path[1]
+    assert ys.offset == 1 and not ys.type.is_array
+    assert expr.type.type_name.lexeme == 'bool'
+    assert expr.op_type.type_name.lexeme == 'double'
+
+def test_assign_field_shadowed_by_variable(capsys):
+    program = (
+        'struct S { array int xs; } \n'
+        'void main() { \n'
+        '   S s = new S(new int[1]); \n'
+        '   array int xs = new int[1]; \n'
+        '   xs[0] = 1; \n'
+        '   s.xs[0] = 2; \n'
+        '   print(itos(xs[0]) + " " + itos(s.xs[0])); \n'
+        '} \n'
+    )
+    assert run(program, False, capsys) == '1 2'
+
+
+#----------------------------------------------------------------------
+# Scalar replacement
+#----------------------------------------------------------------------
+
+POINTS = (
+    'struct Point { int x; int y; array int zs; } \n'
+    'int norm1(Point p) { return p.x + p.y; } \n'
+    'void main() { \n'
+    '   int total = 0; \n'
+    '   for (int i = 0; i < 5; i = i + 1) { \n'
+    '      Point p = new Point(i, 2, new int[1]); \n'
+    '      p.y = p.y * i; \n'
+    '      p.zs[0] = p.x; \n'
+    '      total = total + p.x + p.y + p.zs[0]; \n'
+    '   } \n'
+    '   Point q = new Point(1, 2, null); \n'
+    '   print(itos(total) + " " + itos(norm1(q))); \n'
+    '} \n'
+)
+
+def test_scalar_replacement(capsys):
+    replacer = ScalarReplacer()
+    vm = build(POINTS, fold=False, passes=[replacer])
+    # q is passed to norm1, so only p is replaced
+    assert replacer.replaced == 1 and replacer.scalars == 3
+    assert opcodes(vm).count(OpCode.ALLOCS) == 1
+    assert OpCode.SETF in opcodes(vm) and OpCode.GETF not in opcodes(vm)
+    vm.run()
+    assert capsys.readouterr().out == run(POINTS, False, capsys)
+    assert run(POINTS, False, capsys) == '40 3'
+
+def test_scalar_replacement_escapes():
+    program = (
+        'struct Node { int val; Node next; } \n'
+        'Node make() { \n'
+        '   Node n = new Node(1, null); \n'
+        '   return n; \n'
+        '} \n'
+        'void main() { \n'
+        '   Node a = new Node(1, null); \n'
+        '   a.next = a; \n'
+        '   Node b = new Node(2, null); \n'
+        '   if (b == null) { print("null"); } \n'
+        '   Node c = new Node(3, null); \n'
+        '   c = a; \n'
+        '} \n'
+    )
+    replacer = ScalarReplacer()
+    vm = build(program, fold=False, passes=[replacer])
+    assert replacer.replaced == 0
+
+
+#----------------------------------------------------------------------
+# Bounds-check elimination
+#----------------------------------------------------------------------
+
+ARRAYS = (
+    'void main() { \n'
+    '   array int a = new int[5]; \n'
+    '   for (int i = 0; i < length(a); i = i + 1) { a[i] = i * i; } \n'
+    '   int total = 0; \n'
+    '   for (int i = 1; i < length(a); i = i + 2) { \n'
+    '      total = total + a[i] + a[i - 1]; \n'
+    '   } \n'
+    '   for (int i = 0; i < length(a); i = i + 1) { \n'
+    '      a = new int[1]; \n'
+    '      a[i] = 1; \n'
+    '   } \n'
+    '   print(itos(total)); \n'
+    '} \n'
+)
+
+def test_bounds_check_elimination(capsys):
+    eliminator = BoundsCheckEliminator()
+    vm = build(ARRAYS, fold=False, passes=[eliminator])
+    # a[i - 1] and the loop that reassigns a stay checked
+    assert eliminator.loops == 2 and eliminator.unchecked == 2
+    ops = opcodes(vm)
+    assert ops.count(OpCode.SETIU) == 1 and ops.count(OpCode.GETIU) == 1
+    assert ops.count(OpCode.SETI) == 1 and ops.count(OpCode.GETI) == 1
+    vm.run()
+    assert capsys.readouterr().out == run(ARRAYS, False, capsys) == '14'
+
+def test_bounds_check_forced(capsys):
+    eliminator = BoundsCheckEliminator()
+    vm = build(ARRAYS, fold=False, passes=[eliminator], check_bounds=True)
+    vm.run()
+    assert capsys.readouterr().out == '14'
+    assert OpCode.GETIU not in opcodes(vm)
+    assert OpCode.SETIU not in opcodes(vm)
+
+
+#----------------------------------------------------------------------
+# Bytecode verifier
+#----------------------------------------------------------------------
+
+def test_verifier_accepts_generated_code(capsys):
+    vm = build(CONTROL_FLOW, peephole=True)
+    verifier = Verifier()
+    verifier.optimize(vm)
+    assert verifier.verified == len(vm.frame_templates)
+    fib = vm.frame_templates['fib_int']
+    assert fib.var_count == 1
+    vm.run()
+    assert capsys.readouterr().out == '0 1 1 three four 5 8 13 21 34 '
+
+def test_verifier_removes_null_checks(capsys):
+    source = (
+        'Frame main \n'
+        '  0: ALLOCS() \n'
+        '  1: DUP() \n'
+        '  2: PUSH(1) \n'
+        '  3: SETF("x") \n'
+        '  4: GETF("x") \n'
+        '  5: TOSTR() \n'
+        '  6: WRITE() \n'
+        '  7: PUSH() \n'
+        '  8: NOT() \n'
+        '  9: RET() \n'
+    )
+    vm = Assembler(VM()).assemble(source)
+    verifier = Verifier()
+    verifier.optimize(vm)
+    # the SETF and GETF oids are a new object, the TOSTR operand is a
+    # field (may be null), and the NOT operand is null
+    assert verifier.unchecked == 2
+    assert opcodes(vm)[3:5] == [OpCode.SETFU, OpCode.GETFU]
+    assert opcodes(vm)[5] == OpCode.TOSTR and opcodes(vm)[8] == OpCode.NOT
+    with pytest.raises(MyPLError):
+        vm.run()
+    assert capsys.readouterr().out == '1'
+
+@pytest.mark.parametrize('body, problem', [
+    ('  0: POP() \n  1: PUSH() \n  2: RET() \n', 'stack underflow'),
+    ('  0: JMP(7) \n  1: PUSH() \n  2: RET() \n', 'invalid jump offset'),
+    ('  0: CALL("f") \n  1: RET() \n', 'unknown function'),
+    ('  0: LOAD(3) \n  1: RET() \n', 'load of unset variable'),
+    ('  0: PUSH(True) \n  1: JMPF(3) \n  2: PUSH(1) \n'
+     '  3: PUSH() \n  4: RET() \n', 'inconsistent stack depth'),
+])
+def test_verifier_rejects(body, problem):
+    vm = Assembler(VM()).assemble('Frame main \n' + body)
+    with pytest.raises(MyPLError) as e:
+        Verifier().optimize(vm)
+    assert problem in str(e.value)
+
+
+#----------------------------------------------------------------------
+# Dead function and struct elimination
+#----------------------------------------------------------------------
+
+PRELUDE = (
+    'struct Pair { int a; Inner b; } \n'
+    'struct Inner { int c; } \n'
+    'struct Unused { int d; } \n'
+    'int twice(int x) { return helper(x) + helper(x); } \n'
+    'int helper(int x) { return x; } \n'
+    'string twice(string s) { return s + s; } \n'
+    'Unused make() { return new Unused(1); } \n'
+    'void main() { \n'
+    '   Pair p = new Pair(twice(2), null); \n'
+    '   print(itos(p.a)); \n'
+    '} \n'
+)
+
+def test_dead_definitions(capsys):
+    ast = ASTParser(Lexer(FileWrapper(io.StringIO(PRELUDE)))).parse()
+    ast.accept(SemanticChecker())
+    eliminator = DefinitionEliminator()
+    ast.accept(eliminator)
+    assert eliminator.functions == 2 and eliminator.structs == 1
+    assert [s.struct_name.lexeme for s in ast.struct_defs] == ['Pair', 'Inner']
+    vm = VM()
+    ast.accept(CodeGenerator(vm))
+    assert sorted(vm.frame_templates) == ['helper_int', 'main', 'twice_int']
+    vm.run()
+    assert capsys.readouterr().out == '4'
+
+def test_prune_inlined_templates(capsys):
+    vm = build(PRELUDE)
+    Inliner().optimize(vm)
+    pruner = TemplatePruner()
+    pruner.optimize(vm)
+    # helper is inlined into twice (and twice into main)
+    assert list(vm.frame_templates) == ['main']
+    assert pruner.removed == 4
+    vm.run()
+    assert capsys.readouterr().out == '4'
+
+
+#----------------------------------------------------------------------
+# Purity analysis and memoization
+#----------------------------------------------------------------------
+
+MEMO = (
+    'struct P { int x; } \n'
+    'int fib(int n) { \n'
+    '   if (n < 2) { return n; } \n'
+    '   return fib(n - 1) + fib(n - 2); \n'
+    '} \n'
+    'string twice(string s) { return s + s; } \n'
+    'int loud(int n) { print("!"); return n; } \n'
+    'int calls_loud(int n) { return loud(n) + 1; } \n'
+    'int field(P p) { return p.x; } \n'
+    'int sum(int n) { \n'
+    '   array int xs = new int[n]; \n'
+    '   return n; \n'
+    '} \n'
+    'void main() { \n'
+    '   print(itos(fib(15)) + twice(" ") + itos(calls_loud(1))); \n'
+    '   print(itos(field(new P(3))) + itos(sum(2))); \n'
+    '} \n'
+)
+
+def test_purity_analysis():
+    vm = build(MEMO, fold=False, passes=[PurityAnalysis()])
+    pure = [name for name, t in vm.frame_templates.items() if t.pure]
+    assert sorted(pure) == ['fib_int', 'twice_string']
+
+def test_memoization(capsys):
+    vm = build(MEMO, fold=False, passes=[PurityAnalysis()], memo_size=100)
+    vm.run()
+    assert capsys.readouterr().out == '!610  232'
+    # each fib(n) for n in 0..15 runs once
+    assert vm.memo.misses == 17 and vm.memo.hits == 13
+    assert 'eviction' in vm.memo.stats()
+
+def test_memo_cache_evicts_least_recent():
+    cache = MemoCache(2)
+    cache.store('a', 1)
+    cache.store('b', 2)
+    assert cache.lookup('a') == 1
+    cache.store('c', 3)
+    assert cache.lookup('b') is MISSING
+    assert list(cache.entries) == ['a', 'c'] and cache.evictions == 1
@@ -6,6 +6,7 @@ from mypl_iowrapper import *
 from mypl_token import *
 from mypl_lexer import *
 from mypl_ast_parser import *
+from mypl_semantic_checker import *
 from mypl_var_table import *
 from mypl_code_gen import *
 from mypl_vm import *
@@ -15,7 +16,9 @@ def build(program):
     in_stream = FileWrapper(io.StringIO(program))
     vm = VM()
     cg = CodeGenerator(vm)
-    ASTParser(Lexer(FileWrapper(io.StringIO(program)))).parse().accept(cg)
+    ast = ASTParser(Lexer(FileWrapper(io.StringIO(program)))).parse()
+    ast.accept(SemanticChecker())
+    ast.accept(cg)
     return vm
 
 
@@ -234,3 +237,142 @@ def test_diff_arg_types(capsys):
     build(program).run()
     captured = capsys.readouterr()
     assert captured.out == 'Hello6'
+
+def test_expr_values(capsys):
+    program = (
+        'void testOverload(int i) {\n'
+        '   print("int"); \n'
+        '} \n'
+        'void testOverload(string s) {\n'
+        '   print("string"); \n'
+        '} \n'
+        'void main() { \n'
+        '   testOverload(1 + 2); \n'
+        '   testOverload(itos(3) + "a"); \n'
+        '} \n'
+    )
+    build(program).run()
+    captured = capsys.readouterr()
+    assert captured.out == 'intstring'
+
+def test_scoped_var_values(capsys):
+    program = (
+        'void testOverload(int i) {\n'
+        '   print("int"); \n'
+        '} \n'
+        'void testOverload(string s) {\n'
+        '   print("string"); \n'
+        '} \n'
+        'void main() { \n'
+        '   int x = 1; \n'
+        '   if (true) { \n'
+        '      string x = "a"; \n'
+        '      testOverload(x); \n'
+        '   } \n'
+        '   testOverload(x); \n'
+        '} \n'
+    )
+    build(program).run()
+    captured = capsys.readouterr()
+    assert captured.out == 'stringint'
+
+def test_field_and_call_values(capsys):
+    program = (
+        'struct T { \n'
+        '   double d; \n'
+        '} \n'
+        'void testOverload(int i) {\n'
+        '   print("int"); \n'
+        '} \n'
+        'void testOverload(double d) {\n'
+        '   print("double"); \n'
+        '} \n'
+        'int one() { \n'
+        '   return 1; \n'
+        '} \n'
+        'void main() { \n'
+        '   T t = new T(1.5); \n'
+        '   testOverload(t.d); \n'
+        '   testOverload(one()); \n'
+        '} \n'
+    )
+    build(program).run()
+    captured = capsys.readouterr()
+    assert captured.out == 'doubleint'
+
+def test_null_value(capsys):
+    program = (
+        'struct T { \n'
+        '   int x; \n'
+        '} \n'
+        'void testOverload(T t) {\n'
+        '   print("struct"); \n'
+        '} \n'
+        'void testOverload(int i, int j) {\n'
+        '   print("two ints"); \n'
+        '} \n'
+        'void main() { \n'
+        '   testOverload(null); \n'
+        '} \n'
+    )
+    build(program).run()
+    captured = capsys.readouterr()
+    assert captured.out == 'struct'
+
+def test_array_values(capsys):
+    program = (
+        'void testOverload(int i) {\n'
+        '   print("int"); \n'
+        '} \n'
+        'void testOverload(array int xs) {\n'
+        '   print("array"); \n'
+        '} \n'
+        'void main() { \n'
+        '   array int xs = new int[2]; \n'
+        '   testOverload(xs); \n'
+        '   testOverload(xs[0 + 1]); \n'
+        '} \n'
+    )
+    build(program).run()
+    captured = capsys.readouterr()
+    assert captured.out == 'arrayint'
+
+def test_ambiguous_call():
+    program = (
+        'void testOverload(string s) {\n'
+        '} \n'
+        'void testOverload(array int xs) {\n'
+        '} \n'
+        'void main() { \n'
+        '   testOverload(null); \n'
+        '} \n'
+    )
+    with pytest.raises(MyPLError) as e:
+        build(program)
+    assert str(e.value).startswith('Static Error')
+
+def test_no_matching_overload():
+    program = (
+        'void testOverload(string s) {\n'
+        '} \n'
+        'void main() { \n'
+        '   testOverload(1); \n'
+        '} \n'
+    )
+    with pytest.raises(MyPLError) as e:
+        build(program)
+    assert str(e.value).startswith('Static Error')
+
+def test_duplicate_signature():
+    program = (
+        'void testOverload(int i) {\n'
+        '} \n'
+        'int testOverload(int j) {\n'
+        '   return j; \n'
+        '} \n'
+        'void main() { \n'
+        '} \n'
+    )
+    with pytest.raises(MyPLError) as e:
+        build(program)
+    assert str(e.value).startswith('Static Error')